@@ -5,20 +5,48 @@ from flask_migrate import Migrate
 from app.routes.auth_routes import auth_bp
 from app.routes.app_routes import app_bp
 from app.routes.admin_routes import admin_bp
+from app.routes.metrics_routes import metrics_bp
 from app.models.user import User
 from .scheduler.scheduler import start_scheduler
 from flask import render_template
-
+from utils.rate_limit_utils import init_rate_limiter
+from utils.metrics_utils import init_metrics
+from utils.query_audit_utils import init_query_audit
+from utils.profiling_utils import init_profiling
+from utils.template_utils import init_template_cache, init_template_warmup
+from utils.schema_utils import ensure_schema, stamp_baseline
+from utils.cache_utils import init_fragment_cache
+from utils.draft_utils import init_drafts
+from utils.write_queue_utils import init_write_queue
+from utils.idempotency_utils import init_idempotency
+from utils.upload_utils import init_upload_admission
+from utils.deadline_utils import init_request_deadlines
+from utils.search_utils import init_document_search
+from utils.funnel_utils import init_funnel
+from utils.logging_utils import init_logging
+from utils.tracing_utils import init_tracing
+from app.commands import register_commands
 
 
 migrate = Migrate()
 
-def create_app():
+def create_app(config_overrides=None):
+    """
+    Application factory. `config_overrides` replaces any of the defaults
+    below, e.g. an in-memory database for tests:
+
+        create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True,
+                    'SCHEDULER_ENABLED': False, 'QUERY_AUDIT_MODE': 'strict',
+                    'RATE_LIMIT_STORAGE_URL': 'memory://',
+                    'DRAFT_STORAGE_URL': 'memory://', 'IDEMPOTENCY_STORAGE_URL': 'memory://',
+                    'METRICS_DIR': None})
+    """
     app = Flask(__name__)
 
     # --- Configs & Extensions ---
     app.config['SECRET_KEY'] = 'your-secret-key'
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///../database/job_app.db'
+    # DATABASE_URL lets seeding/benchmarks run against a scratch database
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///../database/job_app.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
     app.config['MAIL_SERVER'] = 'smtp.gmail.com'
@@ -27,14 +55,195 @@ def create_app():
     app.config['MAIL_USERNAME'] = 'kenyainchiyetu5@gmail.com'
     app.config['MAIL_PASSWORD'] = 'gcmzsribmuoztrgp'
     app.config['MAIL_DEFAULT_SENDER'] = 'kenyainchiyetu5@gmail.com'
+    if os.environ.get('MAIL_SUPPRESS_SEND') == '1':  # load tests; TESTING suppresses too
+        app.config['MAIL_SUPPRESS_SEND'] = True
+
+    app.config['UPLOAD_FOLDER'] = os.environ.get(
+        'UPLOAD_FOLDER', os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'uploads')
+    )
+
+    # --- Upload admission control (views marked @upload_endpoint) ---
+    # Other requests are capped by MAX_CONTENT_LENGTH; uploads get their own limits,
+    # a few slots per worker (503 + Retry-After when full) and a slow-client timeout.
+    app.config['MAX_CONTENT_LENGTH'] = 1024 * 1024
+    app.config['UPLOAD_MAX_REQUEST_SIZE'] = 25 * 1024 * 1024
+    app.config['UPLOAD_MAX_FILE_SIZE'] = 10 * 1024 * 1024
+    app.config['UPLOAD_MAX_CONCURRENT'] = 2     # per worker: leaves threads for dashboard and login
+    app.config['UPLOAD_RETRY_AFTER'] = 5        # seconds
+    app.config['UPLOAD_IDLE_TIMEOUT'] = 15      # seconds without a byte from the client
+    app.config['UPLOAD_READ_TIMEOUT'] = 300     # seconds for the whole body
+    app.config['UPLOAD_MIN_RATE'] = 8 * 1024    # bytes/s, enforced after the grace period
+    app.config['UPLOAD_MIN_RATE_GRACE'] = 10    # seconds
+
+    # --- Login / password-reset throttling ---
+    # Buckets live in their own SQLite file so all gunicorn workers share them.
+    # Each limit is (burst capacity, seconds to refill it completely).
+    # Login counts per account *and* IP, so nobody can lock an owner out of their account;
+    # the price is that guesses spread over many addresses only meet each address's 'ip' limit.
+    database_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'database')
+    app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+    app.config['RATE_LIMIT_STORAGE_URL'] = 'sqlite:///' + os.path.join(database_dir, 'rate_limits.db')
+    app.config['RATE_LIMIT_PROXY_COUNT'] = 1  # Render puts one proxy in front of gunicorn
+    app.config['RATE_LIMITS'] = {
+        'login': {'ip': (20, 60), 'account_ip': (5, 300)},
+        'forgot_password': {'ip': (5, 600), 'account': (3, 3600)},
+    }
+
+    # --- Metrics (/metrics) ---
+    # Every worker dumps its samples here; clear the folder on a full restart.
+    app.config['METRICS_DIR'] = os.path.join(database_dir, 'metrics')
+    app.config['METRICS_FLUSH_INTERVAL'] = 1.0
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    app.config['METRICS_PUBLIC'] = False   # debugging only: serve /metrics without a token (otherwise 404)
+
+    # --- Query audit (N+1 detection, per-endpoint query budgets) ---
+    # 'warn' logs budget overruns; 'strict' raises QueryBudgetExceeded (tests) and enables the audit.
+    app.config['QUERY_AUDIT_ENABLED'] = False
+    app.config['QUERY_AUDIT_MODE'] = 'warn'
+    app.config['QUERY_AUDIT_REPEAT_THRESHOLD'] = 3
+    app.config['QUERY_BUDGETS'] = {}
+
+    # --- Request deadlines: SQLite interrupts statements once the request's budget is spent ---
+    # @request_deadline(seconds) on a view or REQUEST_DEADLINES ({endpoint: seconds}) override the default.
+    # Upload POSTs get UPLOAD_READ_TIMEOUT on top, since the body is read inside the request.
+    app.config['REQUEST_DEADLINES_ENABLED'] = True
+    app.config['REQUEST_DEADLINE'] = 10               # seconds
+    app.config['REQUEST_DEADLINES'] = {}
+    app.config['REQUEST_DEADLINE_CHECK_OPS'] = 1000   # SQLite VM instructions between checks
+    app.config['REQUEST_DEADLINE_RETRY_AFTER'] = 30   # seconds, sent with the 503
+
+    # --- Per-request profiling (admins: ?_profile=1 or a signed X-Profile-Token) ---
+    app.config['PROFILING_ENABLED'] = True
+    app.config['PROFILE_DIR'] = os.path.join(database_dir, 'profiles')
+    app.config['PROFILE_KEEP'] = 50                  # newest profiles kept on disk
+    app.config['PROFILE_SAMPLE_INTERVAL'] = 0.001    # seconds between stack samples
+    app.config['PROFILE_TOKEN_MAX_AGE'] = 3600       # header tokens expire after an hour
+
+    # --- Templates: shared on-disk bytecode cache + precompile at worker boot ---
+    app.config['TEMPLATE_CACHE_DIR'] = os.path.join(database_dir, 'template_cache')
+    app.config['TEMPLATE_WARMUP'] = os.environ.get('TEMPLATE_WARMUP', '1') != '0'
+    app.config['FRAGMENT_CACHE_SIZE'] = 2048  # rendered fragments kept per worker
+
+    # --- Wizard autosave (write-behind drafts, shared by all workers) ---
+    app.config['DRAFT_STORAGE_URL'] = 'sqlite:///' + os.path.join(database_dir, 'drafts.db')
+    app.config['DRAFT_FLUSH_INTERVAL'] = 2  # seconds between batched flushes into Application
+
+    # --- Idempotent form posts: one-time tokens, completed responses shared by all workers ---
+    app.config['IDEMPOTENCY_STORAGE_URL'] = 'sqlite:///' + os.path.join(database_dir, 'idempotency.db')
+    app.config['IDEMPOTENCY_TTL'] = 86400       # seconds a completed submission can be replayed
+    app.config['IDEMPOTENCY_WAIT'] = 2          # seconds a double-tap waits for the first request before a 409
+    app.config['IDEMPOTENCY_MAX_BODY'] = 65536  # larger response bodies are not stored
+
+    # --- Group commit: one writer thread per worker batches ORM writes into shared transactions ---
+    app.config['WRITE_QUEUE_ENABLED'] = os.environ.get('WRITE_QUEUE_ENABLED', '1') != '0'
+    app.config['WRITE_QUEUE_WINDOW'] = 0.002    # seconds to wait for more writes before committing
+    app.config['WRITE_QUEUE_MAX_BATCH'] = 64    # units of work per transaction
+    app.config['WRITE_QUEUE_TIMEOUT'] = 30.0    # busy timeout, and how long callers wait for their commit
 
-    app.config['UPLOAD_FOLDER'] = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'uploads')
+    # --- Admin review queue: leased claims so reviewers never open the same application ---
+    app.config['REVIEW_LEASE_SECONDS'] = 900  # an unfinished claim goes back to the queue after this
+    app.config['REVIEW_PREFETCH'] = 1         # applications claimed ahead of the one on screen
+
+    # --- Full-text search over uploaded CVs (SQLite FTS5 in the main database) ---
+    app.config['DOCUMENT_INDEX_WORKERS'] = 2          # extraction threads per worker; 0 = index inline
+    app.config['DOCUMENT_INDEX_MAX_CHARS'] = 200000   # text kept per document
+    app.config['DOCUMENT_SEARCH_MAX_HITS'] = 200      # best-ranked documents an admin search considers
+
+    # --- Bulk applicant import (CSV) and the email outbox that sends its invitations ---
+    app.config['IMPORT_BATCH_SIZE'] = 500             # users per transaction
+    app.config['IMPORT_ERRORS_DIR'] = os.path.join(database_dir, 'imports')
+    app.config['PUBLIC_BASE_URL'] = os.environ.get('PUBLIC_BASE_URL', 'https://abroad-application-platform.onrender.com')
+    app.config['PASSWORD_SETUP_TOKEN_MAX_AGE'] = 7 * 86400  # seconds an invitation link stays valid
+    app.config['OUTBOX_INTERVAL'] = 30                # seconds between outbox runs
+    app.config['OUTBOX_BATCH_SIZE'] = 50              # emails claimed per run
+    app.config['OUTBOX_MAX_ATTEMPTS'] = 5             # then the email is marked failed
+    app.config['OUTBOX_CLAIM_SECONDS'] = 600          # a claim older than this is retried
+
+    # --- Retention: `flask storage archive` and the upload garbage collector (`flask storage gc`) ---
+    app.config['ARCHIVE_FINISHED_DAYS'] = 365         # reviewed/approved applications older than this
+    app.config['ARCHIVE_ABANDONED_DAYS'] = 180        # never-submitted applications idle this long
+    app.config['ARCHIVE_BATCH_SIZE'] = 500            # applications moved per transaction
+    app.config['GC_GRACE_SECONDS'] = 86400            # newer files may still be waiting to be attached
+    app.config['GC_BATCH_SIZE'] = 500                 # files removed per batch
+    app.config['GC_QUARANTINE_DIR'] = os.path.join(database_dir, 'quarantine')
+    app.config['GC_QUARANTINE_DAYS'] = 30             # quarantined runs are purged after this
+
+    # --- Online backups (SQLite backup API) and the read-only reporting snapshot ---
+    app.config['BACKUP_ENABLED'] = os.environ.get('BACKUP_ENABLED', '1') != '0'
+    app.config['BACKUP_DIR'] = os.environ.get('BACKUP_DIR', os.path.join(database_dir, 'backups'))
+    app.config['BACKUP_INTERVAL'] = 86400             # seconds between scheduled backups
+    app.config['BACKUP_CHECK_INTERVAL'] = 3600        # how often workers check whether one is due
+    app.config['BACKUP_KEEP'] = 7                     # newest backups kept by rotation
+    app.config['BACKUP_STEP_PAGES'] = 1024            # pages copied per step (4 MB with 4 KB pages)
+    app.config['BACKUP_STEP_PAUSE'] = 0.005           # seconds between steps, for writers to get in
+    app.config['BACKUP_MAX_RESTARTS'] = 3             # then the rest is copied in one step
+    app.config['BACKUP_BUSY_TIMEOUT'] = 30            # seconds to wait for a locked database
+    app.config['SNAPSHOT_ENABLED'] = os.environ.get('SNAPSHOT_ENABLED') == '1'
+    app.config['SNAPSHOT_PATH'] = os.path.join(database_dir, 'reporting_snapshot.db')
+    app.config['SNAPSHOT_INTERVAL'] = 900             # seconds between refreshes
+    app.config['SNAPSHOT_MAX_AGE'] = 3600             # older snapshots are ignored; exports read live
+
+    # --- Online backfills after schema changes (`flask backfill run <name>`) ---
+    app.config['BACKFILL_BATCH_SIZE'] = 1000          # rows per write transaction
+    app.config['BACKFILL_DUTY_CYCLE'] = 0.5           # share of the time a backfill may hold the writer
+    app.config['BACKFILL_MIN_PAUSE'] = 0.01           # seconds between batches, at least
+
+    # --- Applicant funnel analytics (step events -> daily aggregates, /admin/funnel) ---
+    app.config['FUNNEL_FLUSH_SIZE'] = 200             # buffered events written in one INSERT
+    app.config['FUNNEL_FLUSH_INTERVAL'] = 5           # seconds an event may wait in the buffer
+    app.config['FUNNEL_AGGREGATE_INTERVAL'] = 300     # seconds between aggregation runs
+    app.config['FUNNEL_AGGREGATE_BATCH'] = 5000       # events folded per transaction
+    app.config['FUNNEL_REPORT_DAYS'] = 30             # default cohort window of the report
+
+    # --- Logging: JSON lines written by a background thread (QueueHandler/QueueListener) ---
+    app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO')
+    app.config['LOG_FORMAT'] = os.environ.get('LOG_FORMAT', 'json')  # 'json' or 'text'
+    app.config['LOG_MODE'] = 'queue'                  # 'sync' writes on the calling thread
+    app.config['LOG_STDERR'] = True
+    app.config['LOG_FILE'] = os.environ.get('LOG_FILE')  # rotated at LOG_FILE_MAX_BYTES
+    app.config['LOG_FILE_MAX_BYTES'] = 50 * 1024 * 1024
+    app.config['LOG_FILE_BACKUPS'] = 5
+    app.config['LOG_QUEUE_SIZE'] = 10000              # records; further ones are dropped and counted
+    app.config['LOG_DEBUG_SAMPLE_RATE'] = 0.1         # share of DEBUG records (or requests, inside one) kept
+    app.config['LOG_REQUESTS'] = True                 # one summary line per request
+    app.config['LOG_REQUEST_SAMPLE_RATE'] = 1.0       # share of fast, successful requests summarized
+    app.config['LOG_SLOW_REQUEST_SECONDS'] = 1.0      # slower requests (and 5xx) are always logged
+
+    # --- Tracing: nested spans per request/job, exported as OTLP/JSON lines ---
+    app.config['TRACING_ENABLED'] = os.environ.get('TRACING_ENABLED', '1') != '0'
+    app.config['TRACE_FILE'] = os.environ.get('TRACE_FILE', os.path.join(database_dir, 'traces', 'spans.jsonl'))
+    app.config['TRACE_FILE_MAX_BYTES'] = 20 * 1024 * 1024
+    app.config['TRACE_FILE_BACKUPS'] = 5
+    app.config['TRACE_SAMPLE_RATE'] = float(os.environ.get('TRACE_SAMPLE_RATE', '0.05'))  # share of traces kept
+    app.config['TRACE_SLOW_SECONDS'] = 1.0            # slower traces (and failed ones) are always kept
+    app.config['TRACE_MAX_SPANS'] = 500               # per trace; further spans are only counted
+    app.config['TRACE_QUEUE_SIZE'] = 1000             # finished traces waiting for the exporter thread
+    app.config['TRACE_SERVICE_NAME'] = 'abroad-application-platform'
+
+    app.config['SCHEDULER_ENABLED'] = True
+
+    if config_overrides:
+        app.config.update(config_overrides)
+
+    init_template_cache(app)  # before anything creates app.jinja_env
 
     db.init_app(app)
     mail.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
+    init_rate_limiter(app)
+    init_drafts(app)
+    init_idempotency(app)
+    init_metrics(app)
+    init_logging(app)  # after init_metrics: request summaries include the SQL stats
+    init_tracing(app)  # right after init_logging: the request id becomes the trace id
+    init_request_deadlines(app)  # before the first connection is opened
+    init_query_audit(app)
+    init_profiling(app)  # after init_metrics: reuses the request's SQL scope
+    init_write_queue(app)
+    init_funnel(app)  # after init_write_queue: flushes go through the writer
+    init_upload_admission(app)
 
     @login_manager.user_loader
     def load_user(user_id):
@@ -43,11 +252,20 @@ def create_app():
     app.register_blueprint(auth_bp)
     app.register_blueprint(app_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(metrics_bp)
+
+    register_commands(app)
+    init_template_warmup(app)  # after the blueprints so their templates are included
+    init_fragment_cache(app)
 
-    start_scheduler(app)
+    if app.config['SCHEDULER_ENABLED']:
+        start_scheduler(app)
 
     with app.app_context():
         db.create_all()
+        ensure_schema(db, app.logger)
+        stamp_baseline(db, app.logger)
+    init_document_search(app)  # after create_all: the FTS tables live in the same database
 
     # ✅ ✅ ✅ HOMEPAGE ROUTE — must be BEFORE `return app`
     @app.route('/')
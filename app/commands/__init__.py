@@ -0,0 +1,42 @@
+# app/commands/__init__.py
+#
+# Flask CLI commands. Run them through the factory so the scheduler
+# from run.py is not started:
+#
+#     flask --app app seed --users 100000
+#     flask --app app bench
+#     DATABASE_URL=sqlite:////tmp/bench.db flask --app app bench-writes --threads 8
+#     flask --app app templates measure
+#     flask --app app documents index --workers 4
+#     flask --app app users import leads.csv
+#     flask --app app users delete --from-csv leavers.csv --batch-size 500
+#     flask --app app storage archive --dry-run
+#     flask --app app storage gc --quarantine
+#     flask --app app backup create
+#     flask --app app db upgrade
+#     flask --app app backfill run application_updated_at --duty-cycle 0.25
+#     flask --app app funnel aggregate --rebuild
+
+from app.commands.seed import seed_command
+from app.commands.bench import bench_command
+from app.commands.bench_writes import bench_writes_command
+from app.commands.templates import templates_group
+from app.commands.documents import documents_group
+from app.commands.users import users_group
+from app.commands.storage import storage_group
+from app.commands.backup import backup_group
+from app.commands.backfill import backfill_group
+from app.commands.funnel import funnel_group
+
+
+def register_commands(app):
+    app.cli.add_command(seed_command)
+    app.cli.add_command(bench_command)
+    app.cli.add_command(bench_writes_command)
+    app.cli.add_command(templates_group)
+    app.cli.add_command(documents_group)
+    app.cli.add_command(users_group)
+    app.cli.add_command(storage_group)
+    app.cli.add_command(backup_group)
+    app.cli.add_command(backfill_group)
+    app.cli.add_command(funnel_group)
@@ -0,0 +1,75 @@
+# app/commands/backfill.py
+
+import click
+from flask.cli import with_appcontext
+
+from utils.backfill_utils import BACKFILLS, BackfillError, backfill_state, counts, get_backfill, run_backfill
+
+
+@click.group('backfill')
+def backfill_group():
+    """Fill new columns of large tables in small batches while the app serves traffic."""
+
+
+@backfill_group.command('list')
+@with_appcontext
+def list_command():
+    """Registered backfills with their pending rows and saved progress."""
+    for name, backfill in sorted(BACKFILLS.items()):
+        rows, pending = counts(backfill)
+        state = backfill_state(name)
+        progress = 'never run' if state is None else (
+            f"{state.status}, {state.rows_updated:,} rows filled, last id {state.last_id}"
+        )
+        click.echo(f"{name}: {pending:,} of {rows:,} rows pending ({progress})")
+        if backfill.description:
+            click.echo(f"    {backfill.description}")
+
+
+@backfill_group.command('run')
+@click.argument('name')
+@click.option('--batch-size', type=click.IntRange(min=1), default=None,
+              help='Rows per transaction (default: BACKFILL_BATCH_SIZE).')
+@click.option('--duty-cycle', type=click.FloatRange(min=0.01, max=1.0), default=None,
+              help='Share of the time spent writing, e.g. 0.25 (default: BACKFILL_DUTY_CYCLE).')
+@click.option('--max-batches', type=click.IntRange(min=1), default=None,
+              help='Stop after this many batches; run again to continue.')
+@click.option('--restart', is_flag=True, help='Start over instead of resuming the saved position.')
+@click.option('--dry-run', is_flag=True, help='Only count the rows that need a value.')
+@with_appcontext
+def run_command(name, batch_size, duty_cycle, max_batches, restart, dry_run):
+    """
+    Run the backfill NAME, resuming where an interrupted run stopped, then
+    count the table again to verify every row was filled.
+    """
+    try:
+        backfill = get_backfill(name)
+    except BackfillError as e:
+        raise click.ClickException(str(e))
+    if dry_run:
+        rows, pending = counts(backfill)
+        click.echo(f"🔎 {pending:,} of {rows:,} rows would be filled.")
+        return
+
+    def report_progress(report):
+        remaining = max((report.pending_before or 0) - report.rows_updated, 0)
+        eta = remaining / report.rows_per_second if report.rows_per_second else 0
+        click.echo(f"  … {report.rows_updated:,} rows filled, last id {report.last_id} "
+                   f"({report.rows_per_second:,.0f} rows/s, ~{eta:.0f}s left)")
+
+    report = run_backfill(name, batch_size=batch_size, duty_cycle=duty_cycle, max_batches=max_batches,
+                          restart=restart, progress=report_progress)
+    if report.resumed_from is not None:
+        click.echo(f"ℹ️ Resumed a previous run after id {report.resumed_from}.")
+    if report.pending_after is None:
+        click.echo(f"⏸️ Stopped after {report.batches} batches at id {report.last_id}; run again to continue.")
+        return
+
+    click.echo(f"Rows in table: {report.rows_before:,} before, {report.rows_after:,} after. "
+               f"Pending: {report.pending_before:,} before, {report.pending_after:,} after.")
+    if report.rows_after != report.rows_before:
+        click.echo("ℹ️ The table changed size during the run (rows added or deleted by the app).")
+    if not report.verified:
+        raise click.ClickException(f"{report.pending_after:,} rows still have no value; run it again.")
+    click.echo(f"✅ Backfill {name} done: {report.rows_updated:,} rows filled, {report.filled:,} by this run "
+               f"in {report.elapsed:.1f}s ({report.rows_per_second:,.0f} rows/s).")
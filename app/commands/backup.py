@@ -0,0 +1,78 @@
+# app/commands/backup.py
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from utils.backup_utils import (
+    BackupError, copy_database, create_backup, list_backups, refresh_snapshot, verify_backup
+)
+
+
+@click.group('backup')
+def backup_group():
+    """Online copies of the database: rotated backups and the reporting snapshot."""
+
+
+@backup_group.command('create')
+@click.option('--to', 'destination', type=click.Path(dir_okay=False),
+              help='Write a single copy here instead of a rotated backup in BACKUP_DIR.')
+@with_appcontext
+def create_command(destination):
+    """
+    Copy the live database while the app keeps running, check the copy's
+    integrity, and rotate BACKUP_DIR down to BACKUP_KEEP backups.
+    """
+    try:
+        if destination:
+            size, elapsed = copy_database(destination)
+            path = destination
+        else:
+            path, size, elapsed = create_backup()
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"✅ Backed up to {path} ({size:,} bytes in {elapsed:.1f}s, integrity ok).")
+
+
+@backup_group.command('list')
+@with_appcontext
+def list_command():
+    """Show the rotated backups, newest first."""
+    try:
+        backups = list_backups()
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    if not backups:
+        click.echo(f"No backups in {current_app.config['BACKUP_DIR']}.")
+    for path, taken_at, size in backups:
+        click.echo(f"{taken_at:%Y-%m-%d %H:%M:%S} UTC  {size:>14,}  {path}")
+
+
+@backup_group.command('verify')
+@click.argument('path', type=click.Path(dir_okay=False), required=False)
+@with_appcontext
+def verify_command(path):
+    """Run a full integrity check on a backup (default: the newest)."""
+    if path is None:
+        backups = list_backups()
+        if not backups:
+            raise click.ClickException("There is no backup to verify.")
+        path = backups[0][0]
+    try:
+        tables = verify_backup(path)
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"✅ {path}: integrity ok, {tables} tables.")
+
+
+@backup_group.command('snapshot')
+@with_appcontext
+def snapshot_command():
+    """Refresh the read-only reporting snapshot now."""
+    try:
+        size, elapsed = refresh_snapshot()
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"✅ Snapshot refreshed: {current_app.config['SNAPSHOT_PATH']} ({size:,} bytes in {elapsed:.1f}s).")
+    if not current_app.config['SNAPSHOT_ENABLED']:
+        click.echo("ℹ️ SNAPSHOT_ENABLED is off, so exports still read the live database.")
@@ -0,0 +1,191 @@
+# app/commands/bench.py
+
+import json
+import logging
+import os
+import platform
+import time
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.models import db
+from app.models.user import User
+from app.models.application import Application
+from app.scheduler.reminder_scheduler import send_reminder_emails
+from utils.query_audit_utils import audit_queries
+from utils.logging_utils import configure_logging
+
+
+BENCHMARK_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', '..', 'benchmarks')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(timings, query_counts):
+    timings = sorted(timings)
+    return {
+        'iterations': len(timings),
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        'queries_per_call': round(sum(query_counts) / len(query_counts), 2),
+    }
+
+
+def run_case(name, call, iterations, warmup=1):
+    """Times `call` and counts its SQL statements for each iteration"""
+    for _ in range(warmup):
+        call()
+
+    timings, query_counts = [], []
+    for _ in range(iterations):
+        with audit_queries(name) as scope:
+            started = time.perf_counter()
+            call()
+            timings.append(time.perf_counter() - started)
+        query_counts.append(scope.queries)
+    return summarize(timings, query_counts)
+
+
+def logged_in_client(app, user):
+    """Test client with a session for `user`, skipping the password check"""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+        session['user_id'] = user.id
+        session['user_name'] = user.full_name
+    return client
+
+
+def check_status(response, name):
+    if response.status_code != 200:
+        raise click.ClickException(f"{name} returned HTTP {response.status_code}")
+
+
+def build_cases(app):
+    """Returns [(name, callable, is_job)] for the routes and jobs we track"""
+    admin = User.query.filter_by(is_admin=True).order_by(User.id).first()
+    applicant = (
+        User.query.join(Application)
+        .filter(Application.submitted.is_(True))
+        .order_by(User.id.desc())
+        .first()
+    )
+    if not admin or not applicant:
+        raise click.ClickException("Need an admin and a submitted application — run `flask seed` first.")
+
+    admin_client = logged_in_client(app, admin)
+    applicant_client = logged_in_client(app, applicant)
+    total = Application.query.count()
+    middle_page = max(1, total // 10 // 2)
+
+    def get(client, url, name):
+        def call():
+            # Fresh app context per request: the CLI's long-lived one would
+            # carry flask-login's cached user (g._login_user) between clients
+            with app.app_context():
+                response = client.get(url)
+                check_status(response, name)
+                response.close()
+        return call
+
+    return [
+        ('dashboard', get(applicant_client, '/dashboard', 'dashboard'), False),
+        ('application_summary', get(applicant_client, '/application/summary', 'application_summary'), False),
+        ('admin_applications_first_page', get(admin_client, '/admin/applications', 'admin list'), False),
+        ('admin_applications_middle_page',
+         get(admin_client, f'/admin/applications?page={middle_page}&sort_by=name', 'admin list'), False),
+        ('admin_applications_email_search',
+         get(admin_client, '/admin/applications?email=kamau&submitted=yes', 'admin search'), False),
+        ('admin_export_csv', get(admin_client, '/admin/applications/export?submitted=yes', 'export'), True),
+        ('reminder_job', lambda: send_reminder_emails(app), True),
+    ]
+
+
+def compare(results, baseline):
+    """Prints p50/p95/p99 and queries per call against a saved baseline"""
+    click.echo(f"{'case':34} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'queries':>8}  vs baseline p95")
+    for name, stats in results['cases'].items():
+        line = (
+            f"{name:34} {stats['p50_ms']:>10.2f} {stats['p95_ms']:>10.2f} "
+            f"{stats['p99_ms']:>10.2f} {stats['queries_per_call']:>8}"
+        )
+        previous = (baseline or {}).get('cases', {}).get(name)
+        if previous and previous['p95_ms']:
+            change = (stats['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] * 100
+            line += f"  {change:+.1f}%"
+            if stats['queries_per_call'] != previous['queries_per_call']:
+                line += f" (queries {previous['queries_per_call']} → {stats['queries_per_call']})"
+        click.echo(line)
+
+
+@click.command('bench')
+@click.option('--iterations', default=50, show_default=True, help='Timed calls per route.')
+@click.option('--job-iterations', default=3, show_default=True, help='Timed calls for exports and jobs.')
+@click.option('--output', default=os.path.join(BENCHMARK_DIR, 'latest.json'), show_default=True,
+              type=click.Path(dir_okay=False), help='Where to write this run.')
+@click.option('--baseline', default=os.path.join(BENCHMARK_DIR, 'baseline.json'), show_default=True,
+              type=click.Path(dir_okay=False), help='Baseline to compare against.')
+@click.option('--save-baseline', is_flag=True, help='Also store this run as the new baseline.')
+@click.option('--only', multiple=True, help='Run only the named case(s).')
+@click.option('--logging', 'log_mode', type=click.Choice(['queue', 'sync', 'off']), default='queue',
+              show_default=True, help='Write the logs to benchmarks/bench.log through the queue, '
+                                      'synchronously, or not at all.')
+@with_appcontext
+def bench_command(iterations, job_iterations, output, baseline, save_baseline, only, log_mode):
+    """Benchmark key routes and jobs against the current (seeded) database."""
+    app = current_app._get_current_object()
+    app.extensions['mail'].suppress = True  # never email seeded addresses
+    app.config['RATE_LIMIT_ENABLED'] = False
+    # Same records as in production, written to a file so they don't bury the results
+    app.config.update(LOG_STDERR=False, LOG_FILE=os.path.join(BENCHMARK_DIR, 'bench.log'))
+    configure_logging(app, mode='sync' if log_mode == 'off' else log_mode)
+    if log_mode == 'off':
+        # Every logger, not just app.logger: its children (app.request's per-request lines) log on their own
+        logging.disable(logging.CRITICAL)
+
+    results = {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'database': str(db.engine.url),
+        'python': platform.python_version(),
+        'users': User.query.count(),
+        'applications': Application.query.count(),
+        'logging': log_mode,
+        'cases': {},
+    }
+    click.echo(f"🏁 Benchmarking against {results['users']} users / {results['applications']} applications")
+
+    try:
+        for name, call, is_job in build_cases(app):
+            if only and name not in only:
+                continue
+            results['cases'][name] = run_case(
+                name, call, job_iterations if is_job else iterations, warmup=0 if is_job else 1
+            )
+            click.echo(f"  ✔ {name}")
+    finally:
+        logging.disable(logging.NOTSET)
+
+    previous = None
+    if os.path.exists(baseline):
+        with open(baseline) as f:
+            previous = json.load(f)
+    compare(results, previous)
+
+    targets = [output] + ([baseline] if save_baseline else [])
+    for path in targets:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+        click.echo(f"📝 Wrote {path}")
@@ -0,0 +1,133 @@
+# app/commands/bench_writes.py
+
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import text
+
+from app.commands.bench import BENCHMARK_DIR, percentile
+from app.models import db
+from app.models.application import Application
+from utils.write_queue_utils import WriteCoordinator
+
+
+def touch_application(session, app_id):
+    """The unit of work both modes run: a small ORM update, like an admin action"""
+    application = session.get(Application, app_id)
+    application.last_reminder_sent = datetime.utcnow()
+
+
+def run_threads(threads, writes, write_one):
+    """Calls `write_one()` `writes` times from each of `threads` threads"""
+    latencies, errors, lock = [], {}, threading.Lock()
+
+    def worker():
+        for _ in range(writes):
+            started = time.perf_counter()
+            try:
+                write_one()
+            except Exception as e:
+                kind = 'database_is_locked' if 'database is locked' in str(e) else type(e).__name__
+                with lock:
+                    errors[kind] = errors.get(kind, 0) + 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'committed': len(latencies),
+        'lock_errors': errors.pop('database_is_locked', 0),
+        'other_errors': errors,  # e.g. StaleDataError: two threads updated the same row
+        'seconds': round(elapsed, 3),
+        'writes_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+@click.command('bench-writes')
+@click.option('--threads', default=8, show_default=True, help='Concurrent writers (gunicorn threads).')
+@click.option('--writes', default=200, show_default=True, help='Committed writes attempted per thread.')
+@click.option('--window', default=None, type=float, help='Group-commit window in seconds (default: config).')
+@click.option('--output', default=os.path.join(BENCHMARK_DIR, 'writes_latest.json'), show_default=True,
+              type=click.Path(dir_okay=False), help='Where to write this run.')
+@with_appcontext
+def bench_writes_command(threads, writes, window, output):
+    """Compare per-request commits with the group-commit writer on a file database."""
+    app = current_app._get_current_object()
+    url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        raise click.ClickException("Needs a SQLite file database — set DATABASE_URL to a scratch copy.")
+
+    app_ids = [app_id for (app_id,) in db.session.query(Application.id).limit(5000)]
+    if not app_ids:
+        raise click.ClickException("No applications to update — run `flask seed` first.")
+    db.session.remove()
+
+    def direct():
+        # What the routes used to do: their own session, their own COMMIT
+        with app.app_context():
+            try:
+                touch_application(db.session, random.choice(app_ids))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+
+    coordinator = WriteCoordinator(
+        app, url,
+        window=app.config['WRITE_QUEUE_WINDOW'] if window is None else window,
+        max_batch=app.config['WRITE_QUEUE_MAX_BATCH'],
+        timeout=app.config['WRITE_QUEUE_TIMEOUT'],
+    )
+
+    def queued():
+        app_id = random.choice(app_ids)
+        coordinator.run(lambda session: touch_application(session, app_id), name='bench')
+
+    results = {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'database': str(url),
+        'threads': threads,
+        'writes_per_thread': writes,
+        'window_seconds': coordinator.window,
+        'modes': {},
+    }
+    click.echo(f"🏁 {threads} threads × {writes} writes against {url.database}")
+    for mode, write_one in (('per_request_commit', direct), ('group_commit', queued)):
+        journal_mode = db.session.execute(text("PRAGMA journal_mode")).scalar()
+        db.session.remove()
+        stats = run_threads(threads, writes, write_one)
+        stats['journal_mode'] = journal_mode
+        results['modes'][mode] = stats
+        click.echo(
+            f"  {mode:20} {stats['writes_per_second']:>9.1f} writes/s  "
+            f"locked={stats['lock_errors']:<5} other={sum(stats['other_errors'].values()):<5} "
+            f"p50={stats['p50_ms']:.2f}ms p95={stats['p95_ms']:.2f}ms ({journal_mode})"
+        )
+    coordinator.close()
+    coordinator.engine.dispose()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    click.echo(f"📝 Wrote {output}")
@@ -0,0 +1,81 @@
+# app/commands/documents.py
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import text
+
+from app.models import db
+from utils.search_utils import extract_document, indexed_names, is_indexable, store_extracts
+
+
+@click.group('documents')
+def documents_group():
+    """Full-text index of uploaded documents."""
+
+
+def _require_search(app):
+    if not app.extensions.get('document_search'):
+        raise click.ClickException("This SQLite build has no FTS5; document search is disabled.")
+
+
+def _extract_in_context(app, name):
+    with app.app_context():
+        return extract_document(name)
+
+
+@documents_group.command('index')
+@click.option('--batch-size', default=50, show_default=True, help='Documents stored per transaction.')
+@click.option('--workers', default=4, show_default=True, help='Extraction threads.')
+@click.option('--retry-failed', is_flag=True, help='Also retry documents whose extraction failed before.')
+@click.option('--limit', type=int, default=None, help='Stop after this many documents.')
+@with_appcontext
+def index_command(batch_size, workers, retry_failed, limit):
+    """
+    Index every stored document that is not in the index yet. Each batch is
+    committed on its own, so an interrupted run simply resumes.
+    """
+    app = current_app._get_current_object()
+    _require_search(app)
+
+    folder = app.config['UPLOAD_FOLDER']
+    done = indexed_names(include_failed=not retry_failed)
+    db.session.remove()  # nothing below needs the request-style session
+    todo = sorted(name for name in os.listdir(folder) if is_indexable(name) and name not in done)
+    if limit is not None:
+        todo = todo[:limit]
+    if not todo:
+        click.echo("✅ Every document is already indexed.")
+        return
+
+    click.echo(f"📄 Indexing {len(todo)} documents with {workers} workers...")
+    started = time.perf_counter()
+    outcomes = {}
+    with ThreadPoolExecutor(max(1, workers), thread_name_prefix='document-index') as pool:
+        for offset in range(0, len(todo), batch_size):
+            extracts = list(pool.map(lambda name: _extract_in_context(app, name), todo[offset:offset + batch_size]))
+            store_extracts(extracts)
+            for _, status, _, _ in extracts:
+                outcomes[status] = outcomes.get(status, 0) + 1
+            click.echo(f"   {offset + len(extracts)}/{len(todo)}")
+
+    summary = ', '.join(f"{count} {status}" for status, count in sorted(outcomes.items()))
+    click.echo(f"✅ Done in {time.perf_counter() - started:.1f}s: {summary}")
+
+
+@documents_group.command('status')
+@with_appcontext
+def status_command():
+    """How many stored documents are indexed, and why the rest are not."""
+    app = current_app._get_current_object()
+    _require_search(app)
+
+    rows = db.session.execute(text("SELECT status, COUNT(*) FROM document_index GROUP BY status")).all()
+    stored = sum(1 for name in os.listdir(app.config['UPLOAD_FOLDER']) if is_indexable(name))
+    click.echo(f"📁 {stored} indexable documents in {app.config['UPLOAD_FOLDER']}")
+    for status, count in rows:
+        click.echo(f"   {status:<12} {count}")
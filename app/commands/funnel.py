@@ -0,0 +1,26 @@
+# app/commands/funnel.py
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from utils.funnel_utils import aggregate_funnel, reset_funnel_aggregates
+
+
+@click.group('funnel')
+def funnel_group():
+    """Applicant funnel analytics."""
+
+
+@funnel_group.command('aggregate')
+@click.option('--rebuild', is_flag=True, help='Drop the aggregates and fold every event again.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=None,
+              help='Events per transaction (default: FUNNEL_AGGREGATE_BATCH).')
+@with_appcontext
+def aggregate_command(rebuild, batch_size):
+    """Fold new funnel events into the daily aggregates the admin report reads."""
+    if rebuild:
+        reset_funnel_aggregates()
+        click.echo("🧹 Dropped the funnel aggregates; folding every event again.")
+    folded, days = aggregate_funnel(batch_size or current_app.config['FUNNEL_AGGREGATE_BATCH'])
+    click.echo(f"✅ Folded {folded:,} events into {len(days):,} cohort days.")
@@ -0,0 +1,113 @@
+# app/commands/storage.py
+
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from utils.retention_utils import (
+    ARCHIVE_REASONS, archive_batch, collect_garbage, count_archivable, purge_quarantine
+)
+
+
+@click.group('storage')
+def storage_group():
+    """Keep the application table and upload storage small."""
+
+
+def _size(num_bytes):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num_bytes < 1024 or unit == 'GB':
+            return f"{num_bytes:.0f} {unit}" if unit == 'B' else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
+
+@storage_group.command('archive')
+@click.option('--finished-days', type=click.IntRange(min=1), default=None,
+              help='Archive reviewed/approved applications older than this (default: ARCHIVE_FINISHED_DAYS).')
+@click.option('--abandoned-days', type=click.IntRange(min=1), default=None,
+              help='Archive never-submitted applications idle this long (default: ARCHIVE_ABANDONED_DAYS).')
+@click.option('--only', type=click.Choice(ARCHIVE_REASONS), help='Archive just one kind.')
+@click.option('--batch-size', default=None, type=click.IntRange(min=1), help='Applications per transaction.')
+@click.option('--dry-run', is_flag=True, help='Only count what would be archived.')
+@with_appcontext
+def archive_command(finished_days, abandoned_days, only, batch_size, dry_run):
+    """
+    Move finished and abandoned applications to the archive table. Each
+    batch commits on its own, so an interrupted run simply resumes.
+    """
+    config = current_app.config
+    days = {
+        'finished': finished_days or config['ARCHIVE_FINISHED_DAYS'],
+        'abandoned': abandoned_days or config['ARCHIVE_ABANDONED_DAYS'],
+    }
+    batch_size = batch_size or config['ARCHIVE_BATCH_SIZE']
+
+    for reason in ARCHIVE_REASONS:
+        if only and reason != only:
+            continue
+        due = count_archivable(reason, days[reason])
+        if dry_run or not due:
+            click.echo(f"🔎 {due} {reason} applications (older than {days[reason]} days) would be archived.")
+            continue
+
+        started = time.perf_counter()
+        archived = documents = 0
+        while True:
+            moved, removed = archive_batch(reason, days[reason], batch_size)
+            if not moved:
+                break
+            archived += moved
+            documents += removed
+            click.echo(f"  … {archived}/{due} {reason} applications archived")
+        click.echo(f"✅ Archived {archived} {reason} applications in {time.perf_counter() - started:.1f}s "
+                   f"({documents} stored documents removed).")
+
+
+@storage_group.command('gc')
+@click.option('--dry-run', is_flag=True, help='Only report what would be reclaimed.')
+@click.option('--quarantine', is_flag=True, help='Move files to GC_QUARANTINE_DIR instead of deleting them.')
+@click.option('--grace-hours', type=click.FloatRange(min=0), default=None,
+              help='Leave files modified this recently alone (default: GC_GRACE_SECONDS).')
+@click.option('--batch-size', default=None, type=click.IntRange(min=1), help='Files per batch.')
+@with_appcontext
+def gc_command(dry_run, quarantine, grace_hours, batch_size):
+    """
+    Remove upload files that no live or archived application references.
+    Quarantine folders older than GC_QUARANTINE_DAYS are purged afterwards.
+    """
+    config = current_app.config
+    grace_seconds = None if grace_hours is None else grace_hours * 3600
+
+    def report_progress(report):
+        click.echo(f"  … {report.removed} files, {_size(report.reclaimed_bytes)} reclaimed")
+
+    report = collect_garbage(
+        dry_run=dry_run, quarantine=quarantine, grace_seconds=grace_seconds,
+        batch_size=batch_size or config['GC_BATCH_SIZE'], progress=report_progress,
+    )
+    click.echo(f"🔎 {report.scanned} files scanned: {report.referenced} referenced, "
+               f"{report.recent} within the grace period, {report.candidates} unreferenced "
+               f"({_size(report.candidate_bytes)}).")
+    for name, size in report.samples:
+        click.echo(f"   {size:>12,}  {name}")
+    if report.candidates > len(report.samples):
+        click.echo(f"   … and {report.candidates - len(report.samples)} more")
+
+    if dry_run:
+        click.echo(f"🔎 Dry run: {_size(report.candidate_bytes)} would be reclaimed.")
+        folders, purged = purge_quarantine(config['GC_QUARANTINE_DAYS'], dry_run=True)
+        if folders:
+            click.echo(f"🔎 {folders} old quarantine folders ({_size(purged)}) would be purged.")
+        return
+
+    action = 'quarantined' if quarantine else 'deleted'
+    click.echo(f"✅ {report.removed} files {action}, {_size(report.reclaimed_bytes)} reclaimed "
+               f"in {report.elapsed:.1f}s.")
+    if report.kept:
+        click.echo(f"ℹ️ {report.kept} files were referenced again during the run and kept.")
+    folders, purged = purge_quarantine(config['GC_QUARANTINE_DAYS'])
+    if folders:
+        click.echo(f"🧹 Purged {folders} quarantine folders older than {config['GC_QUARANTINE_DAYS']} days "
+                   f"({_size(purged)}).")
@@ -0,0 +1,107 @@
+# app/commands/templates.py
+
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from utils.template_utils import prune_bytecode_cache, warm_templates
+
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Runs in a fresh interpreter, like a newly forked gunicorn worker
+COLD_START_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app(json.loads(sys.argv[1]))
+booted = time.perf_counter()
+client = app.test_client()
+first_requests = {}
+for path in sys.argv[2:]:
+    request_started = time.perf_counter()
+    client.get(path).close()
+    first_requests[path] = time.perf_counter() - request_started
+print(json.dumps({'boot': booted - started, 'first_requests': first_requests}))
+"""
+
+PROBE_CONFIG = {
+    'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+    'SCHEDULER_ENABLED': False,
+    'METRICS_DIR': None,
+    'RATE_LIMIT_STORAGE_URL': 'memory://',
+}
+
+
+@click.group('templates')
+def templates_group():
+    """Jinja bytecode cache and template warm-up."""
+
+
+@templates_group.command('warm')
+@with_appcontext
+def warm_command():
+    """Drop stale bytecode and precompile every template."""
+    app = current_app._get_current_object()
+    removed = prune_bytecode_cache(app)
+    count, elapsed = warm_templates(app)
+    click.echo(f"🔥 {count} templates ready in {elapsed * 1000:.1f}ms ({removed} stale cache entries removed)")
+
+
+@templates_group.command('clear-cache')
+@with_appcontext
+def clear_cache_command():
+    """Delete the on-disk bytecode cache (workers rebuild it on boot)."""
+    cache = current_app.jinja_env.bytecode_cache
+    if cache is None:
+        raise click.ClickException("TEMPLATE_CACHE_DIR is not set; there is no bytecode cache.")
+    cache.clear()
+    click.echo(f"🧹 Cleared {cache.directory}")
+
+
+def _probe(overrides, paths):
+    result = subprocess.run(
+        [sys.executable, '-c', COLD_START_PROBE, json.dumps({**PROBE_CONFIG, **overrides}), *paths],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise click.ClickException(f"Probe worker failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@templates_group.command('measure')
+@click.option('--runs', default=5, show_default=True, help='Fresh workers booted per setup.')
+@click.option('--path', 'paths', multiple=True, default=('/', '/login', '/register', '/forgot-password'),
+              show_default=True, help='Pages requested, in order, by each fresh worker.')
+def measure_command(runs, paths):
+    """Compare worker boot time and first-request latency with and without warm-up."""
+    cache_dir = tempfile.mkdtemp(prefix='jinja-bytecode-')
+    setups = [
+        ('lazy, no cache', {'TEMPLATE_WARMUP': False, 'TEMPLATE_CACHE_DIR': None}),
+        ('lazy, bytecode cache', {'TEMPLATE_WARMUP': False, 'TEMPLATE_CACHE_DIR': cache_dir}),
+        ('warm-up, bytecode cache', {'TEMPLATE_WARMUP': True, 'TEMPLATE_CACHE_DIR': cache_dir}),
+    ]
+
+    try:
+        # Fill the cache once so the cached setups measure the steady state after a deploy
+        _probe({'TEMPLATE_WARMUP': True, 'TEMPLATE_CACHE_DIR': cache_dir}, [])
+
+        click.echo(f"{'setup':26} {'boot ms':>9} " + ' '.join(f"{path:>16}" for path in paths))
+        for label, overrides in setups:
+            samples = [_probe(overrides, paths) for _ in range(runs)]
+            boot = statistics.median(sample['boot'] for sample in samples) * 1000
+            firsts = [
+                statistics.median(sample['first_requests'][path] for sample in samples) * 1000 for path in paths
+            ]
+            click.echo(f"{label:26} {boot:>9.1f} " + ' '.join(f"{value:>16.2f}" for value in firsts))
+        click.echo("Median of each setup; first-request columns are milliseconds.")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
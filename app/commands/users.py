@@ -0,0 +1,147 @@
+# app/commands/users.py
+
+import time
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+
+from app.models import db
+from utils.import_utils import RowError, import_applicants
+from utils.user_lifecycle_utils import (
+    anonymize_users, delete_users, read_email_file, select_users, user_id_batches
+)
+
+
+YES_NO = click.Choice(['yes', 'no'])
+
+
+@click.group('users')
+def users_group():
+    """Import, delete or anonymize many users at once."""
+
+
+def selection_options(command):
+    """Options shared by every command that picks users"""
+    options = [
+        click.option('--email', 'emails', multiple=True, help='Email address (repeatable).'),
+        click.option('--from-csv', 'csv_path', type=click.Path(exists=True, dir_okay=False),
+                     help="CSV of emails: an 'email' column, or the first column."),
+        click.option('--submitted', type=YES_NO, help='Only users whose application is (not) submitted.'),
+        click.option('--approved', type=YES_NO, help='Only users whose application is (not) approved.'),
+        click.option('--idle-days', type=click.IntRange(min=1),
+                     help='Only users whose application has not changed for this many days (or who have none).'),
+        click.option('--without-application', is_flag=True, help='Only users who never started an application.'),
+        click.option('--include-admins', is_flag=True, help='Allow admin accounts to match.'),
+        click.option('--batch-size', default=500, show_default=True, help='Users per transaction.'),
+        click.option('--dry-run', is_flag=True, help='Only count the matching users.'),
+        click.option('--yes', is_flag=True, help='Do not ask for confirmation.'),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+def _criteria(emails, csv_path, submitted, approved, idle_days, without_application, include_admins):
+    if csv_path:
+        emails = list(emails) + read_email_file(csv_path)
+    criteria = {
+        'emails': list(emails) if emails else None,
+        'submitted': None if submitted is None else submitted == 'yes',
+        'approved': None if approved is None else approved == 'yes',
+        'idle_days': idle_days,
+        'without_application': without_application,
+    }
+    if not any(value not in (None, False) for value in criteria.values()):
+        raise click.UsageError("Select users with --email, --from-csv or a criterion; refusing to match everyone.")
+    criteria['include_admins'] = include_admins
+    return criteria
+
+
+def _count(criteria):
+    emails = criteria['emails']
+    if emails is None:
+        return db.session.execute(select(func.count()).select_from(select_users(**criteria).subquery())).scalar()
+    return sum(len(batch) for batch in user_id_batches(10000, **criteria))
+
+
+def _run(past_tense, apply, batch_size, dry_run, yes, selection):
+    """Select, confirm, then `apply` batch by batch"""
+    criteria = _criteria(**selection)
+    matching = _count(criteria)
+    db.session.rollback()
+    if not matching:
+        click.echo("✅ No matching users.")
+        return
+    if dry_run:
+        click.echo(f"🔎 {matching} users would be {past_tense}.")
+        return
+    if not yes:
+        click.confirm(f"⚠️ {matching} users will be {past_tense}. This cannot be undone. Continue?", abort=True)
+
+    started = time.perf_counter()
+    done = documents = 0
+    for user_ids in user_id_batches(batch_size, **criteria):
+        users, removed = apply(user_ids)
+        done += users
+        documents += removed
+        click.echo(f"  … {done}/{matching} users {past_tense}, {documents} documents removed")
+
+    click.echo(f"✅ {past_tense.capitalize()} {done} users in {time.perf_counter() - started:.1f}s "
+               f"({documents} stored documents removed).")
+
+
+@users_group.command('delete')
+@selection_options
+@with_appcontext
+def delete_command(batch_size, dry_run, yes, **selection):
+    """
+    Delete the selected users, their applications, drafts and documents.
+    Each batch commits on its own; if interrupted, run it again to finish.
+    """
+    _run('deleted', delete_users, batch_size, dry_run, yes, selection)
+
+
+@users_group.command('anonymize')
+@selection_options
+@with_appcontext
+def anonymize_command(batch_size, dry_run, yes, **selection):
+    """
+    Replace the selected users' names and emails with placeholders and strip
+    their applications of personal details and documents. Status and dates
+    are kept for reporting. Safe to re-run after an interruption.
+    """
+    _run('anonymized', anonymize_users, batch_size, dry_run, yes, selection)
+
+
+@users_group.command('import')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False),
+              help='Where to write rejected rows (default: <file>.errors.csv).')
+@click.option('--batch-size', default=500, show_default=True, help='Users per transaction.')
+@click.option('--no-invites', is_flag=True, help='Do not queue password-setup emails.')
+@with_appcontext
+def import_command(csv_path, errors_path, batch_size, no_invites):
+    """
+    Create applicants from a CSV (email, full_name, optional step 1-2 fields).
+    Existing emails are skipped, so a re-run only adds what is missing.
+    """
+    errors_path = errors_path or f"{csv_path.rsplit('.', 1)[0]}.errors.csv"
+
+    def report_progress(report):
+        click.echo(f"  … {report.rows} rows read, {report.users} users created ({report.rows_per_second:,.0f} rows/s)")
+
+    with open(csv_path, newline='', encoding='utf-8-sig') as source, \
+            open(errors_path, 'w', newline='', encoding='utf-8') as error_file:
+        try:
+            report = import_applicants(source, error_file, batch_size=batch_size,
+                                       send_invites=not no_invites, progress=report_progress)
+        except RowError as e:
+            raise click.ClickException(str(e))
+
+    click.echo(
+        f"✅ Imported {report.users} users and {report.applications} applications from {report.rows} rows "
+        f"in {report.elapsed:.1f}s ({report.rows_per_second:,.0f} rows/s); {report.invites} invitations queued."
+    )
+    if report.skipped:
+        click.echo(f"⚠️ {report.skipped} rows rejected, see {errors_path}")
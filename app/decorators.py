@@ -2,10 +2,40 @@ from functools import wraps
 from flask import abort
 from flask_login import current_user
 
+
+def is_admin_user(user=None):
+    """True when `user` (default: the logged-in user) is an admin"""
+    user = current_user if user is None else user
+    return bool(user and user.is_authenticated and user.is_admin)
+
+
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated or not current_user.is_admin:
+        if not is_admin_user():
             abort(403)  # Forbidden access if not admin
         return f(*args, **kwargs)
     return decorated_function
+
+
+def query_budget(max_queries):
+    """
+    Declares how many SQL statements a view may issue per request.
+    Enforced by the query audit (see utils/query_audit_utils.py).
+    """
+    def decorator(f):
+        f.query_budget = max_queries
+        return f
+    return decorator
+
+
+def request_deadline(seconds):
+    """
+    Overrides REQUEST_DEADLINE for a view: SQL still running `seconds` after
+    the request started is interrupted (see utils/deadline_utils.py).
+    None disables the deadline.
+    """
+    def decorator(f):
+        f.request_deadline = seconds
+        return f
+    return decorator
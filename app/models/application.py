@@ -13,6 +13,7 @@ class Application(db.Model):
     # -------------------------
     # Core Identifiers
     # -------------------------
+    # AUTOINCREMENT (see __table_args__): archived ids must never be reused
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     user = db.relationship('User', backref='applications')
@@ -105,6 +106,62 @@ class Application(db.Model):
         comment="Timestamp when last reminder email was sent"
     )
 
+    reviewed_at = db.Column(
+        db.DateTime,
+        nullable=True,
+        comment="Timestamp when an admin approved or rejected the application"
+    )
+
+    # -------------------------
+    # Review Queue (leased claims, see utils/review_queue_utils.py)
+    # -------------------------
+    claimed_by = db.Column(
+        db.Integer,
+        nullable=True,
+        comment="User id of the admin currently reviewing this application (no FK: keeps joins to User unambiguous)"
+    )
+    claimed_at = db.Column(
+        db.DateTime,
+        nullable=True,
+        comment="When the claim was taken or renewed; it lapses after REVIEW_LEASE_SECONDS"
+    )
+    skipped_by = db.Column(
+        db.Integer,
+        nullable=True,
+        comment="User id of the admin who last skipped this application; not handed back to them for REVIEW_LEASE_SECONDS"
+    )
+    skipped_at = db.Column(
+        db.DateTime,
+        nullable=True,
+        comment="When it was skipped"
+    )
+
+    # -------------------------
+    # Versioning (ETags, fragment cache, optimistic concurrency)
+    # -------------------------
+    version_id = db.Column(
+        db.Integer,
+        nullable=False,
+        default=1,
+        server_default='1',
+        comment="Bumped on every ORM update; stale writes raise StaleDataError"
+    )
+    updated_at = db.Column(
+        db.DateTime,
+        nullable=True,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        comment="Timestamp of the last change to this application"
+    )
+
+    __mapper_args__ = {'version_id_col': version_id}
+    __table_args__ = (
+        db.Index('ix_application_review_queue', 'submitted', 'approved', 'reviewed_at', 'submitted_at'),
+        # Without it SQLite hands out max(id)+1, i.e. the id of a freshly
+        # archived row, and the next archive batch hits application_archive's PK
+        {'sqlite_autoincrement': True},
+    )
+
     # -------------------------
     # Instance Methods
     # -------------------------
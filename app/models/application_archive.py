@@ -0,0 +1,44 @@
+# app/models/application_archive.py
+
+from app.models import db
+from app.models.application import Application
+
+
+class ArchivedApplication(db.Model):
+    """
+    An application moved out of the hot `application` table by
+    `flask storage archive` (see utils/retention_utils.py): every column of
+    Application, same id, plus when and why it was archived. Document
+    columns still count as references for the storage garbage collector.
+    """
+    __table__ = db.Table(
+        'application_archive',
+        *(
+            db.Column(
+                column.name,
+                column.type,
+                primary_key=column.primary_key,
+                autoincrement=False,  # keeps the original application id
+                nullable=column.nullable,
+                comment=column.comment,
+            )
+            # user_id has no FK here: `flask users delete` purges archived rows explicitly
+            for column in Application.__table__.columns
+        ),
+        db.Column(
+            'archived_at',
+            db.DateTime,
+            nullable=False,
+            comment="When the application was moved to the archive"
+        ),
+        db.Column(
+            'archive_reason',
+            db.String(20),
+            nullable=False,
+            comment="'finished' (reviewed or approved) or 'abandoned' (never submitted)"
+        ),
+        db.Index('ix_application_archive_user', 'user_id'),
+    )
+
+    def __repr__(self):
+        return f'<ArchivedApplication {self.id} for User {self.user_id} ({self.archive_reason})>'
@@ -0,0 +1,44 @@
+# app/models/backfill.py
+
+from app.models import db
+from datetime import datetime
+
+
+class BackfillRun(db.Model):
+    """
+    Progress of one registered backfill (see utils/backfill_utils.py),
+    updated in the same transaction as each batch so an interrupted run
+    resumes after the last committed row.
+    """
+    __tablename__ = 'backfill_progress'
+
+    name = db.Column(db.String(80), primary_key=True)
+    status = db.Column(
+        db.String(10),
+        nullable=False,
+        default='running',
+        comment="running -> done, or failed when verification finds rows left behind"
+    )
+    last_id = db.Column(
+        db.Integer,
+        nullable=False,
+        default=0,
+        comment="Highest primary key processed; the next batch starts after it"
+    )
+    rows_updated = db.Column(db.Integer, nullable=False, default=0)
+    rows_before = db.Column(
+        db.Integer,
+        nullable=True,
+        comment="Table row count when the backfill started, for verification"
+    )
+    pending_before = db.Column(
+        db.Integer,
+        nullable=True,
+        comment="Rows that needed a value when the backfill started"
+    )
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<BackfillRun {self.name} {self.status} after id {self.last_id}>'
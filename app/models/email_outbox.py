@@ -0,0 +1,58 @@
+# app/models/email_outbox.py
+
+from app.models import db
+from datetime import datetime
+
+
+class OutboxEmail(db.Model):
+    """
+    An email waiting to be sent by the outbox job (see utils/outbox_utils.py).
+    Rows are written in the same transaction as the change that calls for
+    the email, so bulk operations never wait on SMTP.
+    """
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(
+        db.String(40),
+        nullable=False,
+        comment="Which renderer builds the message, e.g. 'password_setup'"
+    )
+    recipient = db.Column(db.String(120), nullable=False)
+    user_id = db.Column(
+        db.Integer,
+        nullable=True,
+        comment="User the email is about (no FK: deleting the user just orphans the row)"
+    )
+
+    # -------------------------
+    # Delivery state
+    # -------------------------
+    status = db.Column(
+        db.String(10),
+        nullable=False,
+        default='pending',
+        comment="pending -> sending -> sent, or failed after OUTBOX_MAX_ATTEMPTS"
+    )
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        comment="Not sent before this time (retries back off)"
+    )
+    claimed_at = db.Column(
+        db.DateTime,
+        nullable=True,
+        comment="When a worker took the row; a stale claim is retried after OUTBOX_CLAIM_SECONDS"
+    )
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_due', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<OutboxEmail {self.id} {self.kind} to {self.recipient} ({self.status})>'
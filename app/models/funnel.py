@@ -0,0 +1,91 @@
+# app/models/funnel.py
+
+from app.models import db
+from datetime import datetime
+
+
+# Wizard milestones in order; 'rejected' is the other outcome after 'submitted'
+FUNNEL_STEPS = ('registered', 'passport', 'details', 'documents', 'submitted', 'approved')
+FUNNEL_OUTCOMES = ('rejected',)
+
+
+class FunnelEvent(db.Model):
+    """
+    One step an applicant completed. Append-only: rows are buffered per
+    worker and inserted in batches (see utils/funnel_utils.py), then folded
+    into the aggregates below by the funnel job.
+    """
+    __tablename__ = 'funnel_event'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, comment="No FK: `flask users delete` purges the events explicitly")
+    step = db.Column(db.String(20), nullable=False, comment="One of FUNNEL_STEPS or FUNNEL_OUTCOMES")
+    occurred_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_funnel_event_user', 'user_id'),
+        # Ids only grow, even after `flask users delete` purges the newest
+        # rows: the aggregation cursor must never see an id twice.
+        {'sqlite_autoincrement': True},
+    )
+
+    def __repr__(self):
+        return f'<FunnelEvent {self.id} user {self.user_id} {self.step}>'
+
+
+class FunnelUser(db.Model):
+    """
+    When each user first reached each step, and the day they entered the
+    funnel (their cohort). Maintained incrementally from FunnelEvent.
+    """
+    __tablename__ = 'funnel_user'
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    cohort_day = db.Column(db.Date, nullable=False, comment="Day of the user's first event")
+    registered_at = db.Column(db.DateTime, nullable=True)
+    passport_at = db.Column(db.DateTime, nullable=True)
+    details_at = db.Column(db.DateTime, nullable=True)
+    documents_at = db.Column(db.DateTime, nullable=True)
+    submitted_at = db.Column(db.DateTime, nullable=True)
+    approved_at = db.Column(db.DateTime, nullable=True)
+    rejected_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_funnel_user_cohort', 'cohort_day'),
+    )
+
+
+class FunnelDaily(db.Model):
+    """
+    Per cohort day and step: how many users got there, how many came from
+    the step before, and how long that took. The admin funnel report reads
+    only this table.
+    """
+    __tablename__ = 'funnel_daily'
+
+    day = db.Column(db.Date, primary_key=True)
+    step = db.Column(db.String(20), primary_key=True)
+    users = db.Column(db.Integer, nullable=False, default=0, comment="Cohort users who reached the step")
+    converted = db.Column(
+        db.Integer,
+        nullable=False,
+        default=0,
+        comment="Of those, users who had reached the previous step first"
+    )
+    p50_seconds = db.Column(db.Float, nullable=True, comment="Median time from the previous step")
+    p90_seconds = db.Column(db.Float, nullable=True)
+    duration_histogram = db.Column(
+        db.Text,
+        nullable=True,
+        comment="JSON counts per DURATION_BUCKETS bucket, so date ranges can be merged"
+    )
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class FunnelCursor(db.Model):
+    """Highest FunnelEvent id already folded into the aggregates"""
+    __tablename__ = 'funnel_cursor'
+
+    name = db.Column(db.String(40), primary_key=True)
+    last_event_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -2,18 +2,41 @@
 
 from flask import (
     Blueprint, render_template, redirect, url_for, flash,
-    session, request, Response
+    session, request, Response, current_app, send_from_directory, abort
 )
 from flask_login import login_required, current_user
+from werkzeug.utils import secure_filename
 from app.models.user import User
 from app.models.application import Application
-from app.models import db
 # Add this import at the top of admin_routes.py
 from utils.email_utils import send_acceptance_email
-from datetime import datetime
+from utils.rate_limit_utils import get_rate_limiter
+from utils.profiling_utils import generate_profile_token, list_profiles, load_profile
+from utils.cache_utils import page_etag, etag_response
+from utils.write_queue_utils import run_write
+from utils.deadline_utils import recent_aborts
+from utils.search_utils import search_documents
+from utils.document_utils import DOCUMENT_KINDS
+from utils.zip_stream_utils import stream_zip
+from utils.backup_utils import BackupError, list_backups, reporting_session, snapshot_age
+from utils.import_utils import RowError, import_applicants
+from utils.funnel_utils import REPORT_STEPS, funnel_report, report_window
+from utils.upload_utils import upload_endpoint
+from utils.idempotency_utils import idempotent
+from utils.review_queue_utils import (
+    REVIEW_DECISIONS, claim_review_items, holds_claim, lease_cutoff, next_claimed_id,
+    pending_review_count, record_decision, release_claim
+)
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, or_
+from sqlalchemy.orm import contains_eager
+from app.decorators import query_budget, request_deadline
 
 import csv
-from io import StringIO
+import os
+import re
+import uuid
+from io import StringIO, TextIOWrapper
 
 admin_bp = Blueprint('admin_bp', __name__)
 
@@ -31,6 +54,28 @@ def is_admin():
     return user and user.is_admin
 
 
+# Rejected-row files of /admin/import have random names; nothing else in the folder is served
+IMPORT_ERRORS_NAME = re.compile(r'^[0-9a-f]{32}\.csv$')
+
+# Application columns naming stored documents, searched by `q` on the list
+DOCUMENT_COLUMNS = (Application.cv_filename, Application.cert_filename, Application.id_filename)
+
+
+STALE_APPLICATION_MESSAGE = (
+    "⚠️ This application was changed since you opened it (by another admin or the auto-approver). "
+    "Review the current details and try again."
+)
+
+
+def is_stale(application):
+    """
+    True when the approve/reject form was rendered from an older version of
+    the application than the one in the database.
+    """
+    expected = request.args.get('version', type=int)
+    return expected is not None and expected != application.version_id
+
+
 @admin_bp.route('/admin/dashboard')
 @login_required  # ✅ Requires login
 def admin_dashboard():
@@ -46,11 +91,112 @@ def admin_dashboard():
 
 
 
+@admin_bp.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    """
+    Operational counters for admins (login / password-reset throttling)
+    and the SQL most recently cancelled by a request deadline.
+    Counters are shared by all workers.
+    """
+    if not current_user.is_admin:
+        flash("Access denied. Admins only.", "danger")
+        return redirect(url_for('auth.dashboard'))
+
+    throttle_counters = get_rate_limiter().counters()
+    try:
+        backups = list_backups()
+    except BackupError:
+        backups = []  # not a file-based SQLite database
+
+    return render_template(
+        'admin/metrics.html', throttle_counters=throttle_counters, aborted_queries=recent_aborts(),
+        backups=backups, snapshot_age=snapshot_age() if current_app.config['SNAPSHOT_ENABLED'] else None
+    )
+
+
+@admin_bp.route('/admin/funnel')
+@login_required
+@query_budget(2)
+def admin_funnel():
+    """
+    Applicant funnel for the cohorts of the last ?days=N days (default
+    FUNNEL_REPORT_DAYS): users per step, conversion and time between
+    steps. Reads only the daily aggregates, which the funnel job refreshes
+    every FUNNEL_AGGREGATE_INTERVAL seconds.
+    """
+    if not current_user.is_admin:
+        flash("Access denied. Admins only.", "danger")
+        return redirect(url_for('auth.dashboard'))
+
+    days = request.args.get('days', current_app.config['FUNNEL_REPORT_DAYS'], type=int)
+    days = min(max(days, 1), 366)
+    start, end = report_window(days)
+    summary, daily = funnel_report(start, end)
+    return render_template(
+        'admin/funnel.html', summary=summary, daily=daily, steps=REPORT_STEPS,
+        days=days, start=start, end=end, refresh_seconds=current_app.config['FUNNEL_AGGREGATE_INTERVAL']
+    )
+
+
+@admin_bp.route('/admin/profiles')
+@login_required
+def admin_profiles():
+    """
+    Recent per-request profiles. Add ?_profile=1 (or ?_profile=cprofile) to
+    any URL while logged in as admin, or send the X-Profile-Token shown here.
+    """
+    if not current_user.is_admin:
+        flash("Access denied. Admins only.", "danger")
+        return redirect(url_for('auth.dashboard'))
+
+    return render_template(
+        'admin/profiles.html',
+        profiles=list_profiles(),
+        profile_token=generate_profile_token(current_user),
+        token_max_age=current_app.config['PROFILE_TOKEN_MAX_AGE'],
+    )
+
+
+@admin_bp.route('/admin/profiles/<profile_id>')
+@login_required
+def view_profile(profile_id):
+    """SQL timeline, template timings and hot functions of one profiled request"""
+    if not current_user.is_admin:
+        flash("Access denied. Admins only.", "danger")
+        return redirect(url_for('auth.dashboard'))
+
+    profile = load_profile(profile_id)
+    if profile is None:
+        abort(404)
+
+    return render_template('admin/profile_detail.html', profile=profile)
+
+
+@admin_bp.route('/admin/profiles/<profile_id>/download/<kind>')
+@login_required
+def download_profile(profile_id, kind):
+    """Raw output: folded stacks (flamegraph.pl / speedscope), .prof (snakeviz) or the JSON summary"""
+    if not current_user.is_admin:
+        flash("Access denied. Admins only.", "danger")
+        return redirect(url_for('auth.dashboard'))
+
+    if kind not in ('folded', 'prof', 'json') or load_profile(profile_id) is None:
+        abort(404)
+
+    return send_from_directory(
+        current_app.config['PROFILE_DIR'], f"{profile_id}.{kind}", as_attachment=True
+    )
+
+
 @admin_bp.route('/admin/applications')
 @login_required
+@query_budget(5)
 def view_all_applications():
     """
     View all applications with filters, sorting, and pagination.
+    `q` searches the text of uploaded documents (CVs, certificates); matches
+    are ranked by relevance unless another sort is chosen.
     Accessible to admin users only.
     """
 
@@ -58,11 +204,12 @@ def view_all_applications():
         flash("Access denied. Admins only.", "danger")
         return redirect(url_for('auth.dashboard'))
 
-    # --- Filter Parameters from Query ---
-    email = request.args.get('email')
-    submitted = request.args.get('submitted')
-    approved = request.args.get('approved')
-    passport_status = request.args.get('passport_status')
+    # --- Full-text search over document contents ---
+    document_text = request.args.get('q', '').strip()
+    hits = []
+    if document_text:
+        hits = search_documents(document_text, limit=current_app.config['DOCUMENT_SEARCH_MAX_HITS'])
+    snippets = dict(hits)
 
     # --- Pagination Parameters ---
     page = request.args.get('page', 1, type=int)
@@ -72,22 +219,14 @@ def view_all_applications():
     sort_by = request.args.get('sort_by', 'id')  # Default: sort by ID
     sort_dir = request.args.get('sort_dir', 'asc')  # Default: ascending order
 
-    # --- Begin Query ---
-    query = Application.query.join(User)
-
-    # Apply filters if provided
-    if email:
-        query = query.filter(User.email.ilike(f"%{email}%"))
-    if passport_status:
-        query = query.filter(Application.passport_status == passport_status)
-    if submitted == 'yes':
-        query = query.filter(Application.submitted.is_(True))
-    elif submitted == 'no':
-        query = query.filter(Application.submitted.is_(False))
-    if approved == 'yes':
-        query = query.filter(Application.approved.is_(True))
-    elif approved == 'no':
-        query = query.filter(Application.approved.is_(False))
+    # --- Begin Query (filters shared with the exports) ---
+    query = filter_applications(Application.query.join(User).options(contains_eager(Application.user)), hits)
+    if hits and 'sort_by' not in request.args:
+        # Best match first: the rank of whichever of the application's documents matched
+        ranks = {name: position for position, (name, _) in enumerate(hits)}
+        query = query.order_by(func.min(*(
+            case(ranks, value=column, else_=len(ranks)) for column in DOCUMENT_COLUMNS
+        )))
 
     # --- Allowed Sorting Columns (Prevent SQL injection) ---
     allowed_sort_columns = {
@@ -112,13 +251,23 @@ def view_all_applications():
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     applications = pagination.items  # Get only current page's applications
 
+    # Highlighted excerpt of the matching document for each row
+    matches = {}
+    for application in applications:
+        for column in DOCUMENT_COLUMNS:
+            name = getattr(application, column.key)
+            if name in snippets:
+                matches[application.id] = snippets[name]
+                break
+
     # --- Render Template with Required Data ---
     return render_template(
         'admin/view_all_applications.html',
         applications=applications,
         pagination=pagination,      # ✅ Needed for pagination controls
         sort_by=sort_by,            # ✅ For sorting arrows in template
-        sort_dir=sort_dir           # ✅ For toggling asc/desc
+        sort_dir=sort_dir,          # ✅ For toggling asc/desc
+        matches=matches             # ✅ Document-text snippets when searching with q
     )
 
 
@@ -131,13 +280,31 @@ def approve_application(app_id):
         return redirect(url_for('auth.dashboard'))
 
     application = Application.query.get_or_404(app_id)
-    
-    if not application.approved:
-        application.approved = True
-        application.approved_at = datetime.utcnow()
-        db.session.commit()
+
+    if is_stale(application):
+        flash(STALE_APPLICATION_MESSAGE, "warning")
+        return redirect(url_for('admin_bp.view_application', app_id=app_id))
+
+    expected_version = application.version_id
+
+    def approve(session):
+        application = session.get(Application, app_id)
+        if application.version_id != expected_version:
+            return False  # changed between our SELECT and the writer's
+        record_decision(application, approve=True)
+        return True
+
+    if not run_write(approve):
+        flash(STALE_APPLICATION_MESSAGE, "warning")
+        return redirect(url_for('admin_bp.view_application', app_id=app_id))
 
     # Always send acceptance email, even if already approved
+    flash_acceptance_email(application)
+    return redirect(url_for('admin_bp.view_application', app_id=app_id))
+
+
+def flash_acceptance_email(application):
+    """Sends the acceptance email for a just-approved application and flashes the outcome"""
     registration_number = f"2025{application.id:06d}"
     success, message = send_acceptance_email(
         to_email=application.user.email,
@@ -150,8 +317,6 @@ def approve_application(app_id):
     else:
         flash(f"⚠️ Approved but email failed: {message}", "warning")
 
-    return redirect(url_for('admin_bp.view_application', app_id=app_id))
-
 @admin_bp.route('/admin/application/<int:app_id>/send-acceptance')
 @login_required
 def send_acceptance_letter(app_id):
@@ -195,8 +360,9 @@ def send_reminder_letter(app_id):
     )
 
     if success:
-        application.last_reminder_sent = datetime.utcnow()
-        db.session.commit()
+        sent_at = datetime.utcnow()
+        run_write(lambda session: setattr(session.get(Application, app_id), 'last_reminder_sent', sent_at),
+                  name='record_reminder')
         flash("✅ Reminder sent", "success")
     else:
         flash(f"❌ Failed to send: {message}", "danger")
@@ -282,9 +448,23 @@ def reject_application(app_id):
         return redirect(url_for('auth.dashboard'))
 
     application = Application.query.get_or_404(app_id)
-    application.approved = False
-    application.approved_at = None
-    db.session.commit()
+
+    if is_stale(application):
+        flash(STALE_APPLICATION_MESSAGE, "warning")
+        return redirect(url_for('admin_bp.view_application', app_id=app_id))
+
+    expected_version = application.version_id
+
+    def reject(session):
+        application = session.get(Application, app_id)
+        if application.version_id != expected_version:
+            return False
+        record_decision(application, approve=False)
+        return True
+
+    if not run_write(reject):
+        flash(STALE_APPLICATION_MESSAGE, "warning")
+        return redirect(url_for('admin_bp.view_application', app_id=app_id))
 
     flash("❌ Application rejected/unapproved.", "info")
     return redirect(url_for('admin_bp.view_application', app_id=app_id))
@@ -292,6 +472,7 @@ def reject_application(app_id):
 
 @admin_bp.route('/admin/application/<int:app_id>')
 @login_required
+@query_budget(3)
 def view_application(app_id):
     """
     View full details of a single application.
@@ -304,28 +485,117 @@ def view_application(app_id):
     application = Application.query.get_or_404(app_id)
     user = application.user  # Related user object
 
-    return render_template('admin/view_application_detail.html', application=application, user=user)
+    etag = page_etag('admin_application', application.id, application.version_id, user.full_name, user.email)
+    return etag_response(etag, lambda: render_template(
+        'admin/view_application_detail.html', application=application, user=user
+    ))
 
 
-@admin_bp.route('/admin/applications/export')
+# ---------------------- REVIEW QUEUE ----------------------
+@admin_bp.route('/admin/review')
 @login_required
-def export_applications_csv():
+@query_budget(6)
+def review_queue():
     """
-    Export applications as CSV with applied filters.
-    Only accessible to admins.
+    Review-queue mode: hands the admin the next pending application (plus a
+    prefetched one) under a lease, so several admins can work through the
+    queue without opening the same records.
     """
     if not current_user.is_admin:
         flash("Access denied. Admins only.", "danger")
         return redirect(url_for('auth.dashboard'))
 
-    # Same filters as list view
+    held = claim_review_items(current_user.id)
+    if held:
+        return redirect(url_for('admin_bp.review_application', app_id=held[0]))
+
+    return render_template('admin/review_queue.html', application=None, pending=pending_review_count())
+
+
+@admin_bp.route('/admin/review/<int:app_id>')
+@login_required
+@query_budget(6)
+def review_application(app_id):
+    """One claimed application, with approve / reject / skip buttons that move on to the next"""
+    if not current_user.is_admin:
+        flash("Access denied. Admins only.", "danger")
+        return redirect(url_for('auth.dashboard'))
+
+    application = Application.query.get_or_404(app_id)
+    if not holds_claim(application, current_user.id):
+        flash("⌛ That application is no longer assigned to you. Here is the next one.", "info")
+        return redirect(url_for('admin_bp.review_queue'))
+
+    lease = current_app.config['REVIEW_LEASE_SECONDS']
+    return render_template(
+        'admin/review_queue.html',
+        application=application,
+        user=application.user,
+        next_id=next_claimed_id(current_user.id, app_id),
+        pending=pending_review_count(),
+        lease_minutes=lease // 60,
+        lease_expires_at=application.claimed_at + timedelta(seconds=lease),
+    )
+
+
+@admin_bp.route('/admin/review/<int:app_id>', methods=['POST'])
+@idempotent
+@login_required
+def decide_review(app_id):
+    """Approves, rejects or skips a claimed application, then moves on to the next one"""
+    if not current_user.is_admin:
+        flash("Access denied. Admins only.", "danger")
+        return redirect(url_for('auth.dashboard'))
+
+    decision = request.form.get('decision')
+    if decision not in ('approve', 'reject', 'release'):
+        abort(400)
+
+    admin_id = current_user.id
+    if decision == 'release':
+        release_claim(admin_id, app_id)
+        flash("↩️ Application returned to the queue.", "info")
+        return redirect(url_for('admin_bp.review_queue'))
+
+    expected_version = request.form.get('version', type=int)
+    cutoff = lease_cutoff()
+
+    def decide(session):
+        application = session.get(Application, app_id)
+        if application is None or application.version_id != expected_version:
+            return 'stale'
+        if application.claimed_by not in (None, admin_id) and application.claimed_at >= cutoff:
+            return 'taken'  # our lease ran out and another admin picked it up
+        record_decision(application, approve=(decision == 'approve'))
+        return 'done'
+
+    outcome = run_write(decide, name='review_decision')
+    if outcome != 'done':
+        REVIEW_DECISIONS.inc(decision=outcome)
+        flash(STALE_APPLICATION_MESSAGE, "warning")
+        return redirect(url_for('admin_bp.review_queue'))
+
+    REVIEW_DECISIONS.inc(decision=decision)
+    if decision == 'approve':
+        flash_acceptance_email(Application.query.get(app_id))
+    else:
+        flash("❌ Application rejected.", "info")
+    return redirect(url_for('admin_bp.review_queue'))
+
+
+def filter_applications(query, hits=None):
+    """
+    Applies the list view's email / passport / submitted / approved filters
+    and its `q` document search from the query string. `query` must already
+    be joined to User; `hits` is search_documents()' result when the caller
+    has already run the search.
+    """
     email = request.args.get('email')
+    document_text = request.args.get('q', '').strip()
     submitted = request.args.get('submitted')
     approved = request.args.get('approved')
     passport_status = request.args.get('passport_status')
 
-    query = Application.query.join(User)
-
     if email:
         query = query.filter(User.email.ilike(f"%{email}%"))
     if passport_status:
@@ -338,8 +608,45 @@ def export_applications_csv():
         query = query.filter(Application.approved.is_(True))
     elif approved == 'no':
         query = query.filter(Application.approved.is_(False))
+    if document_text:
+        if hits is None:
+            hits = search_documents(document_text, limit=current_app.config['DOCUMENT_SEARCH_MAX_HITS'])
+        names = [name for name, _ in hits]
+        query = query.filter(or_(*(column.in_(names) for column in DOCUMENT_COLUMNS)))
+    return query
+
 
-    applications = query.all()
+def snapshot_headers(age):
+    """Tells the client how old the exported data is when it came from the reporting snapshot"""
+    if age is None:
+        return {}
+    as_of = datetime.utcnow() - timedelta(seconds=age)
+    return {'X-Data-As-Of': as_of.strftime('%Y-%m-%dT%H:%M:%SZ')}
+
+
+@admin_bp.route('/admin/applications/export')
+@login_required
+@request_deadline(60)
+@query_budget(3)
+def export_applications_csv():
+    """
+    Export applications as CSV with applied filters.
+    Reads the reporting snapshot when one is enabled and fresh.
+    Only accessible to admins.
+    """
+    if not current_user.is_admin:
+        flash("Access denied. Admins only.", "danger")
+        return redirect(url_for('auth.dashboard'))
+
+    # Same filters as list view
+    reporting, snapshot = reporting_session()
+    try:
+        query = filter_applications(
+            reporting.query(Application).join(User).options(contains_eager(Application.user))
+        )
+        applications = query.all()
+    finally:
+        reporting.close()
 
     # Create CSV in-memory
     si = StringIO()
@@ -361,12 +668,128 @@ def export_applications_csv():
     return Response(
         output,
         mimetype='text/csv',
-        headers={"Content-Disposition": "attachment;filename=applications_export.csv"}
+        headers={"Content-Disposition": "attachment;filename=applications_export.csv",
+                 **snapshot_headers(snapshot)}
     )
 
 
+@admin_bp.route('/admin/applications/export/documents')
+@login_required
+@query_budget(3)
+def export_documents_bundle():
+    """
+    Download the CVs, IDs and certificates of the filtered applications as
+    one ZIP, with a manifest.csv. The archive is built while it downloads:
+    files are read from storage in chunks and nothing is staged on disk or
+    held in memory, however large the bundle. The list of applications
+    comes from the reporting snapshot when one is enabled and fresh.
+    Only accessible to admins.
+    """
+    if not current_user.is_admin:
+        flash("Access denied. Admins only.", "danger")
+        return redirect(url_for('auth.dashboard'))
+
+    # Plain rows: the archive is streamed after this request's session is gone
+    reporting, snapshot = reporting_session()
+    try:
+        rows = filter_applications(reporting.query(Application).join(User)).with_entities(
+            Application.id, User.full_name, User.email, Application.passport_status,
+            Application.submitted, Application.approved,
+            *(getattr(Application, column) for column in DOCUMENT_KINDS.values())
+        ).order_by(Application.id).all()
+    finally:
+        reporting.close()
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+
+    def members():
+        manifest = StringIO()
+        writer = csv.writer(manifest)
+        writer.writerow(['Application ID', 'Applicant Name', 'Email', 'Passport Status',
+                         'Submitted', 'Approved', 'Document', 'File in Bundle'])
+        for row in rows:
+            folder = f"{row.id:05d}_{secure_filename(row.full_name or '') or 'applicant'}"
+            for kind, column in DOCUMENT_KINDS.items():
+                stored_name = getattr(row, column)
+                path = os.path.join(upload_folder, stored_name) if stored_name else None
+                if path and os.path.isfile(path):
+                    arcname = f"{folder}/{kind}{os.path.splitext(stored_name)[1]}"
+                    yield arcname, path
+                else:
+                    arcname = 'not uploaded' if not stored_name else 'missing from storage'
+                writer.writerow([
+                    row.id, row.full_name, row.email,
+                    row.passport_status.capitalize() if row.passport_status else '',
+                    'Yes' if row.submitted else 'No', 'Yes' if row.approved else 'No',
+                    kind, arcname,
+                ])
+        yield 'manifest.csv', manifest.getvalue().encode('utf-8')
+
+    return Response(
+        stream_zip(members()),
+        mimetype='application/zip',
+        headers={"Content-Disposition": "attachment;filename=application_documents.zip",
+                 **snapshot_headers(snapshot)}
+    )
+
+
+@admin_bp.route('/admin/import', methods=['GET', 'POST'])
+@idempotent
+@upload_endpoint()
+@login_required
+@request_deadline(300)
+def import_applicants_csv():
+    """
+    Bulk-create applicants from an uploaded CSV (same format as
+    `flask users import`). Rejected rows can be downloaded as a CSV.
+    Only accessible to admins.
+    """
+    if not current_user.is_admin:
+        flash("Access denied. Admins only.", "danger")
+        return redirect(url_for('auth.dashboard'))
+
+    report = errors_name = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename.lower().endswith('.csv'):
+            flash("Please choose a .csv file.", "warning")
+            return redirect(url_for('admin_bp.import_applicants_csv'))
+
+        errors_dir = current_app.config['IMPORT_ERRORS_DIR']
+        os.makedirs(errors_dir, exist_ok=True)
+        errors_name = f"{uuid.uuid4().hex}.csv"
+        source = TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        try:
+            with open(os.path.join(errors_dir, errors_name), 'w', newline='', encoding='utf-8') as error_file:
+                report = import_applicants(
+                    source, error_file,
+                    batch_size=current_app.config['IMPORT_BATCH_SIZE'],
+                    send_invites=bool(request.form.get('send_invites')),
+                )
+        except (RowError, UnicodeDecodeError) as e:
+            flash(f"❌ Import failed: {e}", "danger")
+            return redirect(url_for('admin_bp.import_applicants_csv'))
+        if not report.skipped:
+            errors_name = None
+
+    return render_template('admin/import_applicants.html', report=report, errors_name=errors_name)
+
+
+@admin_bp.route('/admin/import/errors/<name>')
+@login_required
+def import_errors(name):
+    """Download the rejected rows of an import"""
+    if not current_user.is_admin:
+        flash("Access denied. Admins only.", "danger")
+        return redirect(url_for('auth.dashboard'))
+    if not IMPORT_ERRORS_NAME.match(name):
+        abort(404)
+    return send_from_directory(current_app.config['IMPORT_ERRORS_DIR'], name,
+                               as_attachment=True, download_name='import_errors.csv')
+
+
 @admin_bp.route('/admin/users')
 @login_required
+@query_budget(2)
 def manage_users():
     """
     Admin view to manage all users (promote/demote).
@@ -392,10 +815,10 @@ def promote_user(user_id):
         return redirect(url_for('auth.dashboard'))
 
     user = User.query.get_or_404(user_id)
-    user.is_admin = True
-    db.session.commit()
+    full_name = user.full_name
+    run_write(lambda session: setattr(session.get(User, user_id), 'is_admin', True), name='promote_user')
 
-    flash(f"✅ {user.full_name} promoted to admin.", "success")
+    flash(f"✅ {full_name} promoted to admin.", "success")
     return redirect(url_for('admin_bp.manage_users'))
 
 
@@ -417,8 +840,8 @@ def demote_user(user_id):
         flash("⚠️ You cannot demote yourself.", "warning")
         return redirect(url_for('admin_bp.manage_users'))
 
-    user.is_admin = False
-    db.session.commit()
+    full_name = user.full_name
+    run_write(lambda session: setattr(session.get(User, user_id), 'is_admin', False), name='demote_user')
 
-    flash(f"🧹 {user.full_name} demoted from admin.", "info")
+    flash(f"🧹 {full_name} demoted from admin.", "info")
     return redirect(url_for('admin_bp.manage_users'))
\ No newline at end of file
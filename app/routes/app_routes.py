@@ -1,12 +1,21 @@
 from flask import (
     Blueprint, render_template, request, redirect, 
-    url_for, session, flash, current_app, send_from_directory
+    url_for, session, flash, current_app, send_from_directory, jsonify
 )
 from werkzeug.utils import secure_filename
 from datetime import datetime
 from app.models.application import Application
 from app.models.user import User
-from app.models import db
+from app.decorators import query_budget
+from utils.cache_utils import page_etag, etag_response
+from utils.draft_utils import get_draft_store, save_draft, form_with_draft, merge_drafts
+from utils.write_queue_utils import run_write
+from utils.idempotency_utils import idempotent
+from utils.document_utils import DOCUMENT_KINDS, DocumentError, find_document, store_document
+from utils.search_utils import queue_document_indexing
+from utils.upload_utils import format_size, upload_endpoint
+from utils.funnel_utils import record_step
+from utils.retention_utils import archived_application
 import os
 
 # Define Blueprint for application-related routes
@@ -20,6 +29,26 @@ def get_current_user():
     return None
 
 
+def attach_documents(application_id, names):
+    """
+    Points the application's document columns ({column: stored name}) at
+    stored files. Whichever path attaches the last of the three (form POST,
+    per-document upload or handshake) records the 'documents' funnel step.
+    """
+    def save_document_names(session):
+        application = session.get(Application, application_id)
+        for column, name in names.items():
+            setattr(application, column, name)
+        if all(getattr(application, column) for column in DOCUMENT_KINDS.values()):
+            return application.user_id
+        return None
+
+    completed_by = run_write(save_document_names)
+    queue_document_indexing(names.values())  # full-text search for admins, off the request path
+    if completed_by is not None:
+        record_step(completed_by, 'documents')
+
+
 # ---------------------- PASSPORT APPLICATION ROUTES ----------------------
 @app_bp.route('/passport-application')
 def show_passport_options():
@@ -32,6 +61,8 @@ def show_passport_options():
     return render_template('application/passport_options.html')
 
 @app_bp.route('/express-passport', methods=['GET', 'POST'])
+@idempotent
+@upload_endpoint()
 def express_passport_application():
     """Handle express passport applications with fast processing"""
     user = get_current_user()
@@ -78,6 +109,8 @@ def express_passport_application():
 
 # ---------------------- APPLICATION STEP ROUTES ----------------------
 @app_bp.route('/application/step1', methods=['GET', 'POST'])
+@idempotent
+@query_budget(4)  # a first POST also checks the archive before creating the application
 def application_step1():
     """First step: Passport status check"""
     user = get_current_user()
@@ -92,15 +125,25 @@ def application_step1():
             flash('Please select your passport status.', 'warning')
             return redirect(url_for('app_bp.application_step1'))
 
-        # Create or update the application
-        application = Application.query.filter_by(user_id=user.id).first()
-        if not application:
-            application = Application(user_id=user.id, passport_status=passport_status)
-            db.session.add(application)
-        else:
-            application.passport_status = passport_status
-
-        db.session.commit()
+        # Create or update the application (read and written under the writer's lock)
+        user_id = user.id  # an inline commit expires `user`
+        store = get_draft_store()
+
+        def save_passport_status(session):
+            store.discard(user_id, 1)  # in the writer's order: a flush queued behind this skips the draft
+            application = session.query(Application).filter_by(user_id=user_id).first()
+            if application:
+                application.passport_status = passport_status
+            elif archived_application(user_id, session) is not None:
+                return False
+            else:
+                session.add(Application(user_id=user_id, passport_status=passport_status))
+            return True
+
+        if not run_write(save_passport_status):
+            flash('Your application has been archived and can no longer be changed.', 'info')
+            return redirect(url_for('app_bp.application_summary'))
+        record_step(user_id, 'passport')
 
         # Redirect based on passport status
         if passport_status == 'no_passport':
@@ -108,9 +151,15 @@ def application_step1():
         else:
             return redirect(url_for('app_bp.application_step2'))
 
-    return render_template('application/step1.html')
+    application = Application.query.filter_by(user_id=user.id).first()
+    if not application and archived_application(user.id) is not None:
+        flash('Your application has been archived and can no longer be changed.', 'info')
+        return redirect(url_for('app_bp.application_summary'))
+    return render_template('application/step1.html', form=form_with_draft(application, user.id, 1))
 
 @app_bp.route('/application/step2', methods=['GET', 'POST'])
+@idempotent
+@query_budget(3)
 def application_step2():
     """Second step: Personal information collection"""
     user = get_current_user()
@@ -143,20 +192,31 @@ def application_step2():
             return redirect(url_for('app_bp.application_step2'))
 
         # Save updated information
-        application.phone_number = phone_number
-        application.date_of_birth = date_of_birth
-        application.education_level = education_level
-        application.occupation = occupation
-        application.marital_status = marital_status
+        user_id, application_id = user.id, application.id  # an inline commit expires both
+
+        store = get_draft_store()
+
+        def save_personal_details(session):
+            store.discard(user_id, 2)  # in the writer's order: a flush queued behind this skips the draft
+            application = session.get(Application, application_id)
+            application.phone_number = phone_number
+            application.date_of_birth = date_of_birth
+            application.education_level = education_level
+            application.occupation = occupation
+            application.marital_status = marital_status
 
-        db.session.commit()
+        run_write(save_personal_details)
+        record_step(user_id, 'details')
 
         flash('Step 2 completed successfully!', 'success')
         return redirect(url_for('app_bp.application_step3'))
 
-    return render_template('application/step2.html')
+    return render_template('application/step2.html', form=form_with_draft(application, user.id, 2))
 
 @app_bp.route('/application/step3', methods=['GET', 'POST'])
+@idempotent
+@upload_endpoint()
+@query_budget(3)
 def application_step3():
     """Third step: Document uploads"""
     user = get_current_user()
@@ -170,41 +230,34 @@ def application_step3():
         return redirect(url_for('app_bp.application_step2'))
 
     if request.method == 'POST':
-        cv = request.files.get('cv')
-        national_id = request.files.get('national_id')
-        certificate = request.files.get('certificate')
+        # Each document can be replaced on its own; all three are needed overall
+        uploads = {kind: request.files.get(kind) for kind in DOCUMENT_KINDS}
+        uploads = {kind: upload for kind, upload in uploads.items() if upload and upload.filename}
 
         # Validate uploaded files
-        if not cv or not national_id or not certificate:
+        if any(kind not in uploads and not getattr(application, column) for kind, column in DOCUMENT_KINDS.items()):
             flash('Please upload all required documents.', 'warning')
             return redirect(url_for('app_bp.application_step3'))
 
-        # Create uploads folder if it doesn't exist
-        upload_path = current_app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_path, exist_ok=True)
-
-        # Save each file with a secure name
-        cv_filename = secure_filename(cv.filename)
-        id_filename = secure_filename(national_id.filename)
-        cert_filename = secure_filename(certificate.filename)
-
-        cv.save(os.path.join(upload_path, cv_filename))
-        national_id.save(os.path.join(upload_path, id_filename))
-        certificate.save(os.path.join(upload_path, cert_filename))
-
-        # Store file names in database
-        application.cv_filename = cv_filename
-        application.id_filename = id_filename
-        application.cert_filename = cert_filename
+        # Store each file under its content hash
+        application_id = application.id
+        try:
+            names = {DOCUMENT_KINDS[kind]: store_document(kind, upload)[0] for kind, upload in uploads.items()}
+        except DocumentError as e:
+            flash(f'❌ {e}', 'danger')
+            return redirect(url_for('app_bp.application_step3'))
 
-        db.session.commit()
+        if names:  # the handshake may already have attached every file
+            attach_documents(application_id, names)
 
         flash('Step 3 completed successfully! Documents uploaded.', 'success')
         return redirect(url_for('app_bp.application_step4'))
 
-    return render_template('application/step3.html')
+    return render_template('application/step3.html', application=application)
 
 @app_bp.route('/application/step4', methods=['GET', 'POST'])
+@idempotent
+@query_budget(3)
 def application_step4():
     """Fourth step: Final submission"""
     user = get_current_user()
@@ -223,17 +276,33 @@ def application_step4():
         return redirect(url_for('app_bp.application_summary'))
 
     if request.method == 'POST':
-        # Mark application as submitted
-        application.submitted = True
-        application.submitted_at = datetime.utcnow()
-        db.session.commit()
-        
+        # Autosaved edits not flushed yet go in with the submission
+        user_id, application_id = user.id, application.id
+        store = get_draft_store()
+        drafts = store.take_dirty(user_ids=[user_id])
+
+        def submit_application(session):
+            application = session.get(Application, application_id)
+            merge_drafts(drafts, {user_id: application})
+
+            # Mark application as submitted
+            application.submitted = True
+            application.submitted_at = datetime.utcnow()
+
+        try:
+            run_write(submit_application)
+        except Exception:
+            store.mark_dirty([(user_id, step) for _, step, _ in drafts])
+            raise
+        record_step(user_id, 'submitted')
+
         flash('Application submitted successfully! Thank you.', 'success')
         return redirect(url_for('auth.dashboard'))
 
     return render_template('application/step4.html', user=user, application=application)
 
 @app_bp.route('/application/summary')
+@query_budget(3)
 def application_summary():
     """Application summary view"""
     user = get_current_user()
@@ -241,12 +310,100 @@ def application_summary():
         flash('Please log in to continue.', 'warning')
         return redirect(url_for('auth.login'))
 
-    application = Application.query.filter_by(user_id=user.id).first()
+    application = Application.query.filter_by(user_id=user.id).first() or archived_application(user.id)
     if not application:
         flash('No application found.', 'danger')
         return redirect(url_for('app_bp.application_step1'))
 
-    return render_template('application/summary.html', user=user, application=application)
+    etag = page_etag('summary', user.id, user.full_name, user.email, application.id, application.version_id)
+    return etag_response(etag, lambda: render_template(
+        'application/summary.html', user=user, application=application
+    ))
+
+
+# ---------------------- DRAFT AUTOSAVE ROUTE ----------------------
+@app_bp.route('/application/draft/<int:step>', methods=['POST'])
+@query_budget(1)
+def save_application_draft(step):
+    """
+    Autosave for steps 1-2: buffers partial form state in the draft store.
+    The draft flusher job copies it to the application in batches.
+    """
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'Please log in to continue.'}), 401
+
+    saved = save_draft(user.id, step, request.form)
+    if saved is None:
+        return jsonify({'error': f'Step {step} does not autosave.'}), 404
+
+    return jsonify({'saved': saved})
+
+
+# ---------------------- DOCUMENT UPLOAD HANDSHAKE ----------------------
+@app_bp.route('/application/documents/<kind>/check', methods=['POST'])
+@query_budget(3)
+def check_document(kind):
+    """
+    Step 3 handshake: the browser sends a document's SHA-256, size and
+    filename. If that content is already one of this user's documents it is
+    attached right away ('stored'); otherwise the browser uploads just that
+    file ('send'), even when someone else stored the same content.
+    """
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'Please log in to continue.'}), 401
+
+    application = Application.query.filter_by(user_id=user.id).first()
+    if not application:
+        return jsonify({'error': 'Please complete Step 2 first.'}), 404
+
+    data = request.get_json(silent=True) or request.form
+    try:
+        size = int(data.get('size', ''))
+        owned = {getattr(application, column) for column in DOCUMENT_KINDS.values()}
+        name = find_document(kind, data.get('sha256'), size, data.get('filename'), owned=owned)
+    except DocumentError as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError:
+        return jsonify({'error': 'Invalid size.'}), 400
+
+    if name is None:
+        # Refuse oversized files before the browser starts sending them
+        max_size = current_app.config['UPLOAD_MAX_FILE_SIZE']
+        if size > max_size:
+            return jsonify({'error': f"Each file must be at most {format_size(max_size)}."}), 413
+        return jsonify({'status': 'send'})
+
+    attach_documents(application.id, {DOCUMENT_KINDS[kind]: name})
+    return jsonify({'status': 'stored'})
+
+
+@app_bp.route('/application/documents/<kind>', methods=['POST'])
+@upload_endpoint(json=True)
+@query_budget(3)
+def upload_document(kind):
+    """Uploads or replaces one step 3 document (multipart field 'file')"""
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'Please log in to continue.'}), 401
+
+    application = Application.query.filter_by(user_id=user.id).first()
+    if not application:
+        return jsonify({'error': 'Please complete Step 2 first.'}), 404
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'error': 'No file was sent.'}), 400
+
+    application_id = application.id
+    try:
+        name, size = store_document(kind, upload, expected_sha256=request.form.get('sha256'))
+    except DocumentError as e:
+        return jsonify({'error': str(e)}), 400
+
+    attach_documents(application_id, {DOCUMENT_KINDS[kind]: name})
+    return jsonify({'status': 'uploaded', 'size': size})
 
 
 # ---------------------- FILE SERVING ROUTE ----------------------
@@ -2,16 +2,35 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_user, logout_user, login_required, current_user
 from app.models.user import User
 from app.models.application import Application
-from app.models import db
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
 from datetime import datetime
 from utils.email_utils import send_email  
 from flask import render_template 
 from utils.token_utils import generate_reset_token, verify_reset_token
+from utils.rate_limit_utils import check_rate_limit
+from utils.cache_utils import page_etag, etag_response
+from app.decorators import query_budget
+from utils.write_queue_utils import run_write
+from utils.idempotency_utils import idempotent
+from utils.funnel_utils import record_step
+from utils.retention_utils import archived_application
 from datetime import datetime
 
 
 auth_bp = Blueprint('auth', __name__)
 
+
+def throttled_response(template, retry_after):
+    """
+    Re-renders the form with a 429 and Retry-After header
+    when a rate limit bucket is empty.
+    """
+    retry_after = max(1, int(retry_after + 0.999))
+    flash(f'Too many attempts. Please try again in {retry_after} seconds.', 'danger')
+    return render_template(template), 429, {'Retry-After': str(retry_after)}
+
 def after_login_redirect():
     """
     Helper function to redirect the logged-in user
@@ -51,6 +70,7 @@ def after_login_redirect():
         # ✅ Send welcome email
         # 
 @auth_bp.route('/register', methods=['GET', 'POST'])
+@idempotent
 def register():
     if request.method == 'POST':
         full_name = request.form.get('full_name')
@@ -66,10 +86,15 @@ def register():
             flash('Email already registered. Please login.', 'warning')
             return redirect(url_for('auth.login'))
 
+        # Hash here, not on the writer: it is the slow part of registering
         new_user = User(full_name=full_name, email=email)
         new_user.set_password(password)
-        db.session.add(new_user)
-        db.session.commit()
+        try:
+            run_write(lambda session: session.add(new_user), name='register_user')
+        except IntegrityError:  # registered by a parallel request since the check above
+            flash('Email already registered. Please login.', 'warning')
+            return redirect(url_for('auth.login'))
+        record_step(new_user.id, 'registered')
 
         # ✅ Properly indented email sending
         subject = "🎉 Welcome to the Work Abroad Application Platform"
@@ -116,6 +141,11 @@ def login():
             flash('Please fill out both email and password.', 'warning')
             return redirect(url_for('auth.login'))
 
+        # 🚦 Reject floods before paying for a password hash check
+        allowed, retry_after = check_rate_limit('login', account=email)
+        if not allowed:
+            return throttled_response('login.html', retry_after)
+
         user = User.query.filter_by(email=email).first()
         if user and user.check_password(password):
             # ✅ Flask-Login session
@@ -136,13 +166,20 @@ def login():
     return render_template('login.html')
 
 @auth_bp.route('/forgot-password', methods=['GET', 'POST'])
+@idempotent
 def forgot_password():
     if request.method == 'POST':
         email = request.form.get('email')
+
+        # 🚦 Every accepted request may cost an SMTP send
+        allowed, retry_after = check_rate_limit('forgot_password', account=email)
+        if not allowed:
+            return throttled_response('forgot_password.html', retry_after)
+
         user = User.query.filter_by(email=email).first()
 
         if user:
-            token = generate_reset_token(user.email)
+            token = generate_reset_token(user)
             reset_url = url_for('auth.reset_password', token=token, _external=True)
 
             subject = "🔐 Reset Your Password"
@@ -168,20 +205,30 @@ If you didn’t request this, please ignore this email.
 
     return render_template('forgot_password.html')
 @auth_bp.route('/reset-password/<token>', methods=['GET', 'POST'])
+@idempotent
 def reset_password(token):
-    email = verify_reset_token(token)
-    if not email:
+    user = verify_reset_token(token)
+    if not user:
         flash("❌ Invalid or expired token.", "danger")
         return redirect(url_for('auth.forgot_password'))
 
     if request.method == 'POST':
         new_password = request.form.get('password')
-        user = User.query.filter_by(email=email).first()
-        if user:
-            user.set_password(new_password)
-            db.session.commit()
-            flash("✅ Password updated successfully. You can now log in.", "success")
-            return redirect(url_for('auth.login'))
+        user_id, old_hash = user.id, user.password_hash
+        password_hash = generate_password_hash(new_password)
+
+        def set_password(session):
+            # Only against the hash the token was checked with: two submits of one token can't both win
+            return session.execute(
+                update(User).where(User.id == user_id, User.password_hash == old_hash)
+                .values(password_hash=password_hash)
+            ).rowcount
+
+        if not run_write(set_password, name='reset_password'):
+            flash("❌ Invalid or expired token.", "danger")
+            return redirect(url_for('auth.forgot_password'))
+        flash("✅ Password updated successfully. You can now log in.", "success")
+        return redirect(url_for('auth.login'))
 
     return render_template('reset_password.html', token=token)
 
@@ -191,6 +238,7 @@ def reset_password(token):
 
 @auth_bp.route('/dashboard')
 @login_required
+@query_budget(3)
 def dashboard():
     """
     Dashboard after login: shows progress and links to next step.
@@ -202,6 +250,11 @@ def dashboard():
 
     user = User.query.get(user_id)
     application = Application.query.filter_by(user_id=user_id).first()
+    archived = False
+    if not application:
+        # Finished and abandoned applications move to the archive; they still count
+        application = archived_application(user_id)
+        archived = application is not None
 
     # Track step progress
     steps = {
@@ -227,7 +280,9 @@ def dashboard():
         ])
         steps['step4'] = getattr(application, 'submitted', False)
 
-    if not steps['step1']:
+    if archived:
+        next_step_url = url_for('app_bp.application_summary')
+    elif not steps['step1']:
         next_step_url = url_for('app_bp.application_step1')
     elif not steps['step2']:
         next_step_url = url_for('app_bp.application_step2')
@@ -238,15 +293,21 @@ def dashboard():
     else:
         next_step_url = url_for('app_bp.application_summary')
 
-    return render_template(
+    # 304 on repeat views until the application (or the user's name) changes
+    current_year = datetime.now().year
+    etag = page_etag(
+        'dashboard', user.id, user.full_name, current_year,
+        application.id if application else None,
+        application.version_id if application else None,
+    )
+    return etag_response(etag, lambda: render_template(
         'dashboard.html',
         user=user,
         application=application,
         steps=steps,
-        current_year=datetime.now().year,
+        current_year=current_year,
         next_step_url=next_step_url,
-         
-    )
+    ))
 
 
 @auth_bp.route('/logout')
@@ -0,0 +1,25 @@
+# app/routes/metrics_routes.py
+
+import hmac
+
+from flask import Blueprint, Response, abort, current_app, request
+from utils.metrics_utils import render_prometheus
+
+metrics_bp = Blueprint('metrics_bp', __name__)
+
+
+@metrics_bp.route('/metrics')
+def prometheus_metrics():
+    """
+    Prometheus scrape endpoint, merged across all gunicorn workers.
+    Needs METRICS_TOKEN as a bearer token; without one configured it does
+    not exist (404) unless METRICS_PUBLIC is set for debugging.
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    if not token:
+        if not current_app.config.get('METRICS_PUBLIC'):
+            abort(404)
+    elif not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        abort(401)
+
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
@@ -1,9 +1,15 @@
 from datetime import datetime, timedelta
 from app.models.application import Application
-from app.models import db
 from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload
+from utils.metrics_utils import track_job
 from utils.email_utils import send_acceptance_email
+from utils.write_queue_utils import run_write
+from utils.funnel_utils import add_step_events
+from utils.review_queue_utils import lease_cutoff, unclaimed
 
+@track_job('auto_approval')
 def auto_approve_submitted_applications(app):
     """
     Automatically approves submitted applications that are over 24 hours old
@@ -13,40 +19,74 @@ def auto_approve_submitted_applications(app):
         current_app.logger.info("⏳ Running auto-approval job...")
         now = datetime.utcnow()
         
-        # Find applications ready for auto-approval
-        applications = Application.query.filter(
+        # Find applications ready for auto-approval (users loaded in the same query).
+        # Ones an admin rejected or is reviewing right now are left alone.
+        applications = Application.query.options(joinedload(Application.user)).filter(
             Application.submitted == True,
             Application.approved == False,
+            Application.reviewed_at.is_(None),
+            unclaimed(lease_cutoff(now)),
             Application.submitted_at <= now - timedelta(hours=24)
         ).all()
 
+        # Copy what we need before the commit below expires the ORM objects
+        # (touching them afterwards would reload every row one by one)
+        candidates = {a.id: (a.user_id, a.user.email, a.user.full_name) for a in applications}
+        pending = []
+
+        # Approve the whole batch in one statement and one commit. The filters
+        # are repeated in the UPDATE: an admin may have claimed, rejected or
+        # approved one of these since the SELECT, and only the rows it really
+        # changed get an email and a funnel event.
+        if candidates:
+            def approve_batch(session):
+                approved_ids = session.execute(
+                    update(Application)
+                    .where(
+                        Application.id.in_(list(candidates)),
+                        Application.submitted == True,
+                        Application.approved == False,
+                        Application.reviewed_at.is_(None),
+                        unclaimed(lease_cutoff(now)),
+                    )
+                    .values(
+                        approved=True,
+                        approved_at=now,
+                        last_reminder_sent=now,  # Initialize reminder tracking
+                        version_id=Application.version_id + 1  # bulk UPDATEs skip the ORM's version counter
+                    )
+                    .returning(Application.id)
+                    .execution_options(synchronize_session=False)
+                ).scalars().all()
+                add_step_events(session, [candidates[app_id][0] for app_id in approved_ids], 'approved', now)
+                return approved_ids
+
+            approved_ids = run_write(approve_batch)
+            pending = [(app_id, candidates[app_id][1], candidates[app_id][2]) for app_id in sorted(approved_ids)]
+            skipped = len(candidates) - len(pending)
+            if skipped:
+                current_app.logger.info("⏭️ %s applications changed before approval and were skipped", skipped)
+
         approval_count = 0
         
-        for app_obj in applications:
+        for app_id, email, full_name in pending:
             try:
-                # Approve application
-                app_obj.approved = True
-                app_obj.approved_at = now
-                app_obj.last_reminder_sent = now  # Initialize reminder tracking
-                db.session.commit()
-                
                 # Send acceptance email
-                registration_number = f"2025{app_obj.id:06d}"
+                registration_number = f"2025{app_id:06d}"
                 success, message = send_acceptance_email(
-                    to_email=app_obj.user.email,
-                    user_name=app_obj.user.full_name,
+                    to_email=email,
+                    user_name=full_name,
                     registration_number=registration_number
                 )
                 
                 if success:
-                    current_app.logger.info(f"✅ Sent acceptance email to {app_obj.user.email}")
+                    current_app.logger.info("✅ Sent acceptance email to %s", email)
                     approval_count += 1
                 else:
-                    current_app.logger.error(f"❌ Failed to send email to {app_obj.user.email}: {message}")
+                    current_app.logger.error("❌ Failed to send email to %s: %s", email, message)
                     
             except Exception as e:
-                current_app.logger.error(f"❌ Error processing application {app_obj.id}: {str(e)}")
-                db.session.rollback()
+                current_app.logger.error("❌ Error processing application %s: %s", app_id, e)
 
         current_app.logger.info(f"✅ Auto-approval job completed. Approved {approval_count} applications.")
         return f"Approved {approval_count} applications"
\ No newline at end of file
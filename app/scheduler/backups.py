@@ -0,0 +1,30 @@
+from flask import current_app
+from utils.backup_utils import backup_due, create_backup, refresh_snapshot, snapshot_age
+from utils.metrics_utils import track_job
+
+
+@track_job('db_backup')
+def take_scheduled_backup(app):
+    """
+    Online backup of the main database into BACKUP_DIR, rotated to
+    BACKUP_KEEP copies. Every worker schedules it; a worker that finds a
+    recent enough backup skips its turn.
+    """
+    with app.app_context():
+        if not backup_due(current_app.config['BACKUP_INTERVAL']):
+            return None
+        path, size, elapsed = create_backup()
+        current_app.logger.info(f"💾 Backed up the database to {path} ({size} bytes in {elapsed:.1f}s)")
+        return path
+
+
+@track_job('db_snapshot')
+def refresh_reporting_snapshot(app):
+    """Re-copies the read-only reporting snapshot unless another worker just did"""
+    with app.app_context():
+        age = snapshot_age()
+        if age is not None and age < current_app.config['SNAPSHOT_INTERVAL'] * 0.9:
+            return None
+        size, elapsed = refresh_snapshot()
+        current_app.logger.info(f"📸 Refreshed the reporting snapshot ({size} bytes in {elapsed:.1f}s)")
+        return size
@@ -0,0 +1,46 @@
+from app.models.application import Application
+from flask import current_app
+from utils.metrics_utils import Counter, track_job
+from utils.draft_utils import get_draft_store, merge_drafts
+from utils.write_queue_utils import run_write
+
+
+DRAFT_FLUSHED = Counter('application_draft_flushed_total', 'Autosaved drafts copied to applications', ['outcome'])
+
+
+@track_job('draft_flush')
+def flush_drafts(app, limit=500):
+    """
+    Write-behind for wizard autosaves: claims dirty drafts from the shared
+    store and writes them to their applications in one transaction.
+    """
+    with app.app_context():
+        store = get_draft_store()
+        drafts = store.take_dirty(limit)
+        if not drafts:
+            return 0
+
+        user_ids = {user_id for user_id, _, _ in drafts}
+
+        def apply_drafts(session):
+            # Re-checked in the writer's order: a step posted since the drafts
+            # were claimed has discarded its draft, and its newer values must
+            # not be overwritten with the autosaved ones.
+            live = store.existing([(user_id, step) for user_id, step, _ in drafts])
+            applications_by_user = {
+                application.user_id: application
+                for application in session.query(Application).filter(Application.user_id.in_(user_ids)).all()
+            }
+            return merge_drafts([draft for draft in drafts if draft[:2] in live], applications_by_user)
+
+        try:
+            changed = run_write(apply_drafts)
+        except Exception as e:
+            store.mark_dirty([(user_id, step) for user_id, step, _ in drafts])
+            current_app.logger.error(f"❌ Draft flush failed: {str(e)}")
+            raise
+
+        DRAFT_FLUSHED.inc(len(drafts), outcome='flushed')
+        if changed:
+            current_app.logger.info(f"💾 Flushed {len(drafts)} drafts into {changed} applications")
+        return changed
@@ -0,0 +1,16 @@
+from flask import current_app
+from utils.metrics_utils import track_job
+from utils.outbox_utils import deliver_outbox
+
+
+@track_job('email_outbox')
+def send_outbox_emails(app):
+    """
+    Drains the email outbox in batches of OUTBOX_BATCH_SIZE. Every worker
+    runs it; rows are claimed atomically, so each email goes out once.
+    """
+    with app.app_context():
+        sent = deliver_outbox(current_app.config['OUTBOX_BATCH_SIZE'])
+        if sent:
+            current_app.logger.info(f"📤 Sent {sent} outbox emails")
+        return sent
@@ -0,0 +1,24 @@
+from flask import current_app
+from utils.funnel_utils import aggregate_funnel
+from utils.metrics_utils import track_job
+
+
+@track_job('funnel_flush')
+def flush_funnel_events(app):
+    """Writes this worker's buffered funnel events, so quiet workers don't hold them back"""
+    with app.app_context():
+        return app.extensions['funnel_events'].flush()
+
+
+@track_job('funnel_aggregate')
+def aggregate_funnel_events(app):
+    """
+    Folds new funnel events into the daily aggregates. Every worker runs
+    it; the shared cursor makes a batch another worker already folded a
+    no-op.
+    """
+    with app.app_context():
+        folded, days = aggregate_funnel(current_app.config['FUNNEL_AGGREGATE_BATCH'])
+        if folded:
+            current_app.logger.info(f"📊 Folded {folded} funnel events into {len(days)} cohort days")
+        return folded
@@ -1,11 +1,16 @@
 from datetime import datetime, timedelta
 from app.models.application import Application
-from app.models import db
+from app.models.application_archive import ArchivedApplication
 from flask import current_app, render_template
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload
+from utils.metrics_utils import track_job
 from utils.email_utils import send_acceptance_email, send_email
+from utils.write_queue_utils import run_write
 from app.models.user import User
 
 
+@track_job('reminder_emails')
 def send_reminder_emails(app):
     with app.app_context():
         current_app.logger.info("🔄 Running reminder email job...")
@@ -18,9 +23,22 @@ def send_reminder_emails(app):
         }
 
         users = User.query.all()
+
+        # One query for every user's application instead of one per user
+        applications_by_user = {}
+        for application in Application.query.order_by(Application.id).all():
+            applications_by_user.setdefault(application.user_id, application)
+        # Archived applications are finished or abandoned: no reminders for those users
+        archived_user_ids = {
+            user_id for (user_id,) in ArchivedApplication.query.with_entities(ArchivedApplication.user_id).distinct()
+        }
+
         for user in users:
             try:
-                application = Application.query.filter_by(user_id=user.id).first()
+                application = applications_by_user.get(user.id)
+
+                if not application and user.id in archived_user_ids:
+                    continue
 
                 # CASE 1: No application at all
                 if not application:
@@ -45,10 +63,10 @@ Resume here: https://abroad-application-platform.onrender.com/login
 
                     success, msg = send_email(subject, recipients, text_body, html=html_body)
                     if success:
-                        current_app.logger.info(f"✅ Sent no-application reminder to {user.email}")
+                        current_app.logger.info("✅ Sent no-application reminder to %s", user.email)
                         reminder_stats['no_application'] += 1
                     else:
-                        current_app.logger.error(f"❌ Failed to send no-application reminder to {user.email}: {msg}")
+                        current_app.logger.error("❌ Failed to send no-application reminder to %s: %s", user.email, msg)
                         reminder_stats['errors'] += 1
 
                     continue  # Move to next user after sending
@@ -96,51 +114,67 @@ Resume here: https://abroad-application-platform.onrender.com/login
 
                     success, msg = send_email(subject, [user.email], text_body, html=html_body)
                     if success:
-                        current_app.logger.info(f"✅ Sent incomplete reminder to {user.email}")
+                        current_app.logger.info("✅ Sent incomplete reminder to %s", user.email)
                         reminder_stats['incomplete'] += 1
                     else:
-                        current_app.logger.error(f"❌ Failed to send incomplete reminder to {user.email}: {msg}")
+                        current_app.logger.error("❌ Failed to send incomplete reminder to %s: %s", user.email, msg)
                         reminder_stats['errors'] += 1
 
             except Exception as e:
-                current_app.logger.error(f"❌ Error processing user {user.email}: {str(e)}")
+                current_app.logger.error("❌ Error processing user %s: %s", user.email, e)
                 reminder_stats['errors'] += 1
 
         # CASE 3: Weekly reminder for approved applications
-        approved_apps = Application.query.filter(
+        approved_apps = Application.query.options(joinedload(Application.user)).filter(
             Application.approved == True,
             Application.last_reminder_sent <= now - timedelta(days=7)
         ).all()
 
-        for app_obj in approved_apps:
-            try:
-                registration_number = f"2025{app_obj.id:06d}"
-                success, message = send_acceptance_email(
-                    to_email=app_obj.user.email,
-                    user_name=app_obj.user.full_name,
-                    registration_number=registration_number,
-                    is_reminder=True
-                )
-
-                if success:
-                    app_obj.last_reminder_sent = now
-                    db.session.commit()
-                    current_app.logger.info(f"✅ Sent weekly approval reminder to {app_obj.user.email}")
-                    reminder_stats['approved'] += 1
-                else:
-                    current_app.logger.error(f"❌ Failed to send approval reminder to {app_obj.user.email}: {message}")
-                    reminder_stats['errors'] += 1
-            except Exception as e:
-                current_app.logger.error(f"❌ Error sending weekly reminder: {str(e)}")
-                db.session.rollback()
-                reminder_stats['errors'] += 1
+        # Copied up front so sending never reloads expired ORM objects (N+1)
+        due = [(a.id, a.user.email, a.user.full_name) for a in approved_apps]
+        reminded_ids = []
+
+        try:
+            for app_id, email, full_name in due:
+                try:
+                    registration_number = f"2025{app_id:06d}"
+                    success, message = send_acceptance_email(
+                        to_email=email,
+                        user_name=full_name,
+                        registration_number=registration_number,
+                        is_reminder=True
+                    )
 
-        # ✅ Summary log
+                    if success:
+                        reminded_ids.append(app_id)
+                        current_app.logger.info("✅ Sent weekly approval reminder to %s", email)
+                        reminder_stats['approved'] += 1
+                    else:
+                        current_app.logger.error("❌ Failed to send approval reminder to %s: %s", email, message)
+                        reminder_stats['errors'] += 1
+                except Exception as e:
+                    current_app.logger.error("❌ Error sending weekly reminder: %s", e)
+                    reminder_stats['errors'] += 1
+        finally:
+            # One UPDATE for every reminder sent, even if the loop was interrupted
+            if reminded_ids:
+                try:
+                    def record_reminders(session):
+                        session.execute(
+                            update(Application)
+                            .where(Application.id.in_(reminded_ids))
+                            .values(last_reminder_sent=now, version_id=Application.version_id + 1)
+                        )
+
+                    run_write(record_reminders)
+                except Exception as e:
+                    current_app.logger.error(f"❌ Error recording weekly reminders: {str(e)}")
+
+        # ✅ Summary log (the counts also go out as fields of the JSON record)
         current_app.logger.info(
-            f"✅ Reminder job completed.\n"
-            f"🔹 No Application: {reminder_stats['no_application']}\n"
-            f"🔹 Incomplete: {reminder_stats['incomplete']}\n"
-            f"🔹 Approved Weekly: {reminder_stats['approved']}\n"
-            f"🔺 Errors: {reminder_stats['errors']}"
+            "✅ Reminder job completed. No application: %d, incomplete: %d, approved weekly: %d, errors: %d",
+            reminder_stats['no_application'], reminder_stats['incomplete'],
+            reminder_stats['approved'], reminder_stats['errors'],
+            extra={'event': 'reminder_job', 'stats': reminder_stats}
         )
         return reminder_stats
@@ -1,7 +1,13 @@
+import atexit
+
 from apscheduler.schedulers.background import BackgroundScheduler
 from flask import current_app
 
 from app.scheduler.auto_approver import auto_approve_submitted_applications
+from app.scheduler.draft_flusher import flush_drafts
+from app.scheduler.email_outbox import send_outbox_emails
+from app.scheduler.backups import refresh_reporting_snapshot, take_scheduled_backup
+from app.scheduler.funnel import aggregate_funnel_events, flush_funnel_events
 
 # Create a BackgroundScheduler instance globally
 scheduler = BackgroundScheduler()
@@ -21,6 +27,81 @@ def start_scheduler(app):
             replace_existing=True    # replace job if it already exists
         )
 
+        # 💾 Write-behind for wizard autosaves (every worker runs it; drafts are claimed atomically)
+        scheduler.add_job(
+            func=lambda: flush_drafts(app),
+            trigger='interval',
+            seconds=app.config['DRAFT_FLUSH_INTERVAL'],
+            id='draft_flush_job',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+
+        # 🧹 Forget drafts nobody came back to
+        scheduler.add_job(
+            func=lambda: app.extensions['drafts'].prune(),
+            trigger='interval',
+            hours=24,
+            id='draft_prune_job',
+            replace_existing=True
+        )
+
+        # 📤 Emails queued by bulk operations (every worker runs it; rows are claimed atomically)
+        scheduler.add_job(
+            func=lambda: send_outbox_emails(app),
+            trigger='interval',
+            seconds=app.config['OUTBOX_INTERVAL'],
+            id='email_outbox_job',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+
+        # 💾 Online backups (every worker checks; the first to find one due takes it)
+        if app.config['BACKUP_ENABLED']:
+            scheduler.add_job(
+                func=lambda: take_scheduled_backup(app),
+                trigger='interval',
+                seconds=app.config['BACKUP_CHECK_INTERVAL'],
+                id='db_backup_job',
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True
+            )
+
+        # 📸 Read-only copy for heavy admin reads
+        if app.config['SNAPSHOT_ENABLED']:
+            scheduler.add_job(
+                func=lambda: refresh_reporting_snapshot(app),
+                trigger='interval',
+                seconds=app.config['SNAPSHOT_INTERVAL'],
+                id='db_snapshot_job',
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True
+            )
+
+        # 📊 Funnel analytics: write buffered step events, then fold them into the daily aggregates
+        scheduler.add_job(
+            func=lambda: flush_funnel_events(app),
+            trigger='interval',
+            seconds=app.config['FUNNEL_FLUSH_INTERVAL'],
+            id='funnel_flush_job',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        scheduler.add_job(
+            func=lambda: aggregate_funnel_events(app),
+            trigger='interval',
+            seconds=app.config['FUNNEL_AGGREGATE_INTERVAL'],
+            id='funnel_aggregate_job',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+
         # TODO: Add other scheduled jobs like reminder emails here if needed
 
         # Start the scheduler if not already running
@@ -28,9 +109,9 @@ def start_scheduler(app):
             scheduler.start()
             current_app.logger.info("Scheduler started - auto-approval job scheduled every hour")
 
-        # Optional: Cleanly shutdown scheduler when app context tears down
-        @app.teardown_appcontext
-        def shutdown_scheduler(exception=None):
-            if scheduler.running:
-                scheduler.shutdown(wait=False)
-                current_app.logger.info("Scheduler shut down on app context teardown")
+            # Shut down with the process. (A teardown_appcontext hook used to
+            # do this, which stopped every job after the first request.)
+            atexit.register(lambda: scheduler.shutdown(wait=False) if scheduler.running else None)
+
+            # Flush pending drafts on a clean worker exit
+            atexit.register(lambda: flush_drafts(app))
@@ -0,0 +1,356 @@
+# loadtest.py
+#
+# Self-contained load generator for the applicant funnel and admin pages.
+# Standard library only, so it runs offline against a local gunicorn:
+#
+#     flask --app app seed --users 50000          # with the same DATABASE_URL
+#     export METRICS_TOKEN=load
+#     MAIL_SUPPRESS_SEND=1 RATE_LIMIT_ENABLED=0 DATABASE_URL=sqlite:////tmp/load.db \
+#         UPLOAD_FOLDER=/tmp/load_uploads gunicorn -w 4 --threads 4 -b 127.0.0.1:8000 'app:create_app()'
+#     python loadtest.py --applicants 40 --admins 2 --duration 60
+#
+# "database is locked" errors are read from db_lock_errors_total on /metrics
+# before and after the run (METRICS_TOKEN: /metrics is 404 without one).
+#
+# Each run is saved as JSON under loadtest_results/ and can be compared
+# with an earlier one via --compare.
+
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import string
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+
+RESULTS_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'loadtest_results')
+LOCKED_METRIC = re.compile(r'^db_lock_errors_total(?:\{[^}]*\})? ([0-9.e+]+)$', re.MULTILINE)
+IDEMPOTENCY_FIELD = re.compile(rb'name="_idempotency_key" value="([0-9a-f]+)"')
+
+
+# ---------------------- HTTP CLIENT ----------------------
+class Session:
+    """One virtual user: keep-alive connection plus the Flask session cookie"""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.timeout = timeout
+        self.cookies = {}
+        self.conn = None
+
+    def _connection(self):
+        if self.conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self.conn = cls(self.host, self.port, timeout=self.timeout)
+        return self.conn
+
+    def request(self, method, path, body=None, headers=None):
+        """Returns (status, body_bytes). Redirects are not followed."""
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f"{k}={v}" for k, v in self.cookies.items())
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+        for header in response.headers.get_all('Set-Cookie') or []:
+            cookie = SimpleCookie(header)
+            for key, morsel in cookie.items():
+                self.cookies[key] = morsel.value
+        return response.status, data
+
+    def get(self, path):
+        return self.request('GET', path)
+
+    def post_form(self, path, fields):
+        return self.request('POST', path, urlencode(fields).encode(),
+                            {'Content-Type': 'application/x-www-form-urlencoded'})
+
+    def post_multipart(self, path, fields, files):
+        boundary = uuid.uuid4().hex
+        chunks = []
+        for name, value in fields.items():
+            chunks.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            )
+        for name, (filename, content, content_type) in files.items():
+            chunks.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f'Content-Type: {content_type}\r\n\r\n'.encode() + content + b'\r\n'
+            )
+        chunks.append(f'--{boundary}--\r\n'.encode())
+        return self.request('POST', path, b''.join(chunks),
+                            {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+# ---------------------- RESULTS ----------------------
+class Recorder:
+    """Thread-safe latency and error bookkeeping per funnel step"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+
+    def record(self, step, elapsed, status, ok):
+        with self.lock:
+            self.latencies.setdefault(step, []).append(elapsed)
+            self.statuses.setdefault(step, {}).setdefault(str(status), 0)
+            self.statuses[step][str(status)] += 1
+            if not ok:
+                self.errors[step] = self.errors.get(step, 0) + 1
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def timed(recorder, step, call, expect=(200, 302)):
+    started = time.perf_counter()
+    try:
+        status, body = call()
+    except Exception:
+        status, body = 'exception', b''
+    recorder.record(step, time.perf_counter() - started, status, status in expect)
+    return status, body
+
+
+# ---------------------- SCENARIOS ----------------------
+def form_token(body):
+    """The one-time idempotency token from a rendered form, as POST fields"""
+    match = IDEMPOTENCY_FIELD.search(body or b'')
+    return {'_idempotency_key': match.group(1).decode()} if match else {}
+
+
+def random_document(size_kb, extension):
+    header = b'%PDF-1.4\n' if extension == 'pdf' else b'PK\x03\x04'
+    return header + os.urandom(max(0, size_kb * 1024 - len(header)))
+
+
+def applicant_journey(base_url, recorder, args, rng):
+    """register → login → dashboard → step1..step4 → summary"""
+    session = Session(base_url, args.timeout)
+    email = f"load.{uuid.uuid4().hex[:12]}@example.test"
+    password = ''.join(rng.choice(string.ascii_letters) for _ in range(12))
+    try:
+        _, form = timed(recorder, 'register_form', lambda: session.get('/register'))
+        timed(recorder, 'register', lambda: session.post_form(
+            '/register', {'full_name': 'Load Tester', 'email': email, 'password': password, **form_token(form)}))
+        timed(recorder, 'login', lambda: session.post_form(
+            '/login', {'email': email, 'password': password}))
+        timed(recorder, 'dashboard', lambda: session.get('/dashboard'))
+
+        _, form = timed(recorder, 'step1_form', lambda: session.get('/application/step1'))
+        timed(recorder, 'step1_submit', lambda: session.post_form(
+            '/application/step1', {'passport_status': 'valid', **form_token(form)}))
+
+        _, form = timed(recorder, 'step2_form', lambda: session.get('/application/step2'))
+        timed(recorder, 'step2_submit', lambda: session.post_form('/application/step2', {
+            **form_token(form),
+            'phone_number': f"+2547{rng.randint(10000000, 99999999)}",
+            'date_of_birth': f"{rng.randint(1970, 2004)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+            'education_level': 'Diploma', 'occupation': rng.choice(['Nurse', 'Welder', 'Driver']),
+            'marital_status': 'single',
+        }))
+
+        _, form = timed(recorder, 'step3_form', lambda: session.get('/application/step3'))
+        tag = uuid.uuid4().hex[:8]
+        token = form_token(form)
+        documents = {
+            'cv': (f"cv_{tag}.pdf", random_document(args.upload_kb, 'pdf'), 'application/pdf'),
+            'national_id': (f"id_{tag}.pdf", random_document(args.upload_kb, 'pdf'), 'application/pdf'),
+            'certificate': (f"cert_{tag}.pdf", random_document(args.upload_kb, 'pdf'), 'application/pdf'),
+        }
+        timed(recorder, 'step3_upload', lambda: session.post_multipart('/application/step3', token, documents))
+        if args.double_submit:
+            # The same form sent twice, like a double-tapped submit button
+            timed(recorder, 'step3_upload_replay',
+                  lambda: session.post_multipart('/application/step3', token, documents))
+
+        _, form = timed(recorder, 'step4_form', lambda: session.get('/application/step4'))
+        timed(recorder, 'step4_submit', lambda: session.post_form('/application/step4', form_token(form)))
+        timed(recorder, 'summary', lambda: session.get('/application/summary'))
+    finally:
+        session.close()
+
+
+def admin_session(base_url, recorder, args):
+    session = Session(base_url, args.timeout)
+    timed(recorder, 'admin_login', lambda: session.post_form(
+        '/login', {'email': args.admin_email, 'password': args.admin_password}))
+    return session
+
+
+def admin_browse(session, recorder, rng):
+    """List pages, a filtered search and a detail view"""
+    status, body = timed(recorder, 'admin_list', lambda: session.get(
+        f"/admin/applications?page={rng.randint(1, 20)}"), expect=(200,))
+    timed(recorder, 'admin_search', lambda: session.get(
+        '/admin/applications?' + urlencode({'email': 'load.', 'submitted': 'yes'})), expect=(200,))
+    ids = re.findall(rb'/admin/application/(\d+)"', body or b'')
+    if ids:
+        app_id = rng.choice(ids).decode()
+        timed(recorder, 'admin_view', lambda: session.get(f"/admin/application/{app_id}"), expect=(200,))
+
+
+def worker(kind, base_url, recorder, args, deadline, seed):
+    rng = random.Random(seed)
+    session = admin_session(base_url, recorder, args) if kind == 'admin' else None
+    try:
+        while time.time() < deadline:
+            if kind == 'admin':
+                admin_browse(session, recorder, rng)
+                time.sleep(args.admin_think)
+            else:
+                applicant_journey(base_url, recorder, args, rng)
+    finally:
+        if session is not None:
+            session.close()
+
+
+# ---------------------- SERVER SIDE COUNTERS ----------------------
+def scrape_lock_errors(base_url, token, timeout):
+    """Sum of db_lock_errors_total from /metrics (None if unavailable)"""
+    session = Session(base_url, timeout)
+    headers = {'Authorization': f"Bearer {token}"} if token else {}
+    try:
+        status, body = session.request('GET', '/metrics', headers=headers)
+    except OSError:
+        return None
+    finally:
+        session.close()
+    if status != 200:
+        return None
+    return sum(float(value) for value in LOCKED_METRIC.findall(body.decode()))
+
+
+# ---------------------- REPORT ----------------------
+def build_report(args, recorder, elapsed, locked_before, locked_after):
+    steps = {}
+    total_requests = total_errors = 0
+    for step, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        errors = recorder.errors.get(step, 0)
+        total_requests += len(values)
+        total_errors += errors
+        steps[step] = {
+            'requests': len(values),
+            'errors': errors,
+            'error_rate': round(errors / len(values), 4),
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'max_ms': round(values[-1] * 1000, 2),
+            'statuses': recorder.statuses.get(step, {}),
+        }
+
+    locked = None
+    if locked_before is not None and locked_after is not None:
+        locked = int(locked_after - locked_before)
+
+    return {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'config': {key: value for key, value in vars(args).items() if key not in ('admin_password', 'compare')},
+        'duration_s': round(elapsed, 2),
+        'requests': total_requests,
+        'throughput_rps': round(total_requests / elapsed, 2) if elapsed else 0,
+        'error_rate': round(total_errors / total_requests, 4) if total_requests else 0,
+        'database_locked_errors': locked,
+        'steps': steps,
+    }
+
+
+def print_report(report, previous=None):
+    print(f"\n⏱  {report['duration_s']}s, {report['requests']} requests, "
+          f"{report['throughput_rps']} req/s, error rate {report['error_rate'] * 100:.2f}%, "
+          f"'database is locked': {report['database_locked_errors']}")
+    print(f"{'step':18} {'reqs':>7} {'err%':>7} {'p50 ms':>9} {'p99 ms':>9}  vs previous p99")
+    for step, stats in report['steps'].items():
+        line = (f"{step:18} {stats['requests']:>7} {stats['error_rate'] * 100:>6.2f}% "
+                f"{stats['p50_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+        old = (previous or {}).get('steps', {}).get(step)
+        if old and old['p99_ms']:
+            line += f"  {(stats['p99_ms'] - old['p99_ms']) / old['p99_ms'] * 100:+.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Applicant funnel + admin load test')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--applicants', type=int, default=20, help='Concurrent applicant journeys')
+    parser.add_argument('--admins', type=int, default=2, help='Concurrent admin sessions')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds to run')
+    parser.add_argument('--ramp-up', type=float, default=5, help='Seconds over which users start')
+    parser.add_argument('--upload-kb', type=int, default=200, help='Size of each uploaded document')
+    parser.add_argument('--admin-email', default='admin@example.test')
+    parser.add_argument('--admin-password', default='password123')
+    parser.add_argument('--admin-think', type=float, default=0.5, help='Pause between admin page views')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--double-submit', action='store_true',
+                        help='Send every step 3 upload twice with the same idempotency token')
+    parser.add_argument('--metrics-token', default=os.environ.get('METRICS_TOKEN'))
+    parser.add_argument('--label', default='', help='Free text stored with the results')
+    parser.add_argument('--compare', help='Earlier results JSON to compare with')
+    args = parser.parse_args()
+
+    recorder = Recorder()
+    locked_before = scrape_lock_errors(args.base_url, args.metrics_token, args.timeout)
+    started = time.time()
+    deadline = started + args.duration
+
+    kinds = ['admin'] * args.admins + ['applicant'] * args.applicants
+    threads = []
+    for index, kind in enumerate(kinds):
+        thread = threading.Thread(
+            target=worker, args=(kind, args.base_url, recorder, args, deadline, index), daemon=True
+        )
+        threads.append(thread)
+        thread.start()
+        time.sleep(args.ramp_up / max(1, len(kinds)))
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.time() - started
+    locked_after = scrape_lock_errors(args.base_url, args.metrics_token, args.timeout)
+    report = build_report(args, recorder, elapsed, locked_before, locked_after)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(report, previous)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{datetime.utcnow():%Y%m%d-%H%M%S}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Saved {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Baseline: the schema as of the switch from db.create_all() to migrations
+
+Databases created by create_app() are stamped with this revision
+automatically (utils/schema_utils.py); `flask db upgrade` on an empty
+database builds the same tables. The document search tables (FTS5) are
+created at startup by utils/search_utils.py and are not managed here.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19 14:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('full_name', sa.String(length=120), nullable=False),
+        sa.Column('password_hash', sa.String(length=128), nullable=False),
+        sa.Column('is_admin', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email')
+    )
+
+    op.create_table('application',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('passport_status', sa.String(length=20), nullable=False, comment="Passport status: 'has_passport', 'needs_passport', or 'applied_for_passport'"),
+        sa.Column('phone_number', sa.String(length=20), nullable=True, comment="User's contact phone number"),
+        sa.Column('date_of_birth', sa.Date(), nullable=True, comment="User's date of birth in YYYY-MM-DD format"),
+        sa.Column('education_level', sa.String(length=50), nullable=True, comment='Highest education level completed'),
+        sa.Column('occupation', sa.String(length=100), nullable=True, comment='Current or most recent occupation'),
+        sa.Column('marital_status', sa.String(length=20), nullable=True, comment='Marital status: single, married, divorced, etc.'),
+        sa.Column('cv_filename', sa.String(length=255), nullable=True, comment='Filename of uploaded CV/resume'),
+        sa.Column('id_filename', sa.String(length=255), nullable=True, comment='Filename of uploaded ID document'),
+        sa.Column('cert_filename', sa.String(length=255), nullable=True, comment='Filename of uploaded education certificate'),
+        sa.Column('submitted', sa.Boolean(), nullable=False, comment='Whether application has been submitted'),
+        sa.Column('submitted_at', sa.DateTime(), nullable=True, comment='Timestamp when application was submitted'),
+        sa.Column('approved', sa.Boolean(), nullable=False, comment='Whether application has been approved'),
+        sa.Column('approved_at', sa.DateTime(), nullable=True, comment='Timestamp when application was approved'),
+        sa.Column('last_reminder_sent', sa.DateTime(), nullable=True, comment='Timestamp when last reminder email was sent'),
+        sa.Column('reviewed_at', sa.DateTime(), nullable=True, comment='Timestamp when an admin approved or rejected the application'),
+        sa.Column('claimed_by', sa.Integer(), nullable=True, comment='User id of the admin currently reviewing this application (no FK: keeps joins to User unambiguous)'),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True, comment='When the claim was taken or renewed; it lapses after REVIEW_LEASE_SECONDS'),
+        sa.Column('version_id', sa.Integer(), server_default='1', nullable=False, comment='Bumped on every ORM update; stale writes raise StaleDataError'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True, comment='Timestamp of the last change to this application'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_application_review_queue', 'application', ['submitted', 'approved', 'reviewed_at', 'submitted_at'], unique=False)
+
+    op.create_table('application_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('passport_status', sa.String(length=20), nullable=False, comment="Passport status: 'has_passport', 'needs_passport', or 'applied_for_passport'"),
+        sa.Column('phone_number', sa.String(length=20), nullable=True, comment="User's contact phone number"),
+        sa.Column('date_of_birth', sa.Date(), nullable=True, comment="User's date of birth in YYYY-MM-DD format"),
+        sa.Column('education_level', sa.String(length=50), nullable=True, comment='Highest education level completed'),
+        sa.Column('occupation', sa.String(length=100), nullable=True, comment='Current or most recent occupation'),
+        sa.Column('marital_status', sa.String(length=20), nullable=True, comment='Marital status: single, married, divorced, etc.'),
+        sa.Column('cv_filename', sa.String(length=255), nullable=True, comment='Filename of uploaded CV/resume'),
+        sa.Column('id_filename', sa.String(length=255), nullable=True, comment='Filename of uploaded ID document'),
+        sa.Column('cert_filename', sa.String(length=255), nullable=True, comment='Filename of uploaded education certificate'),
+        sa.Column('submitted', sa.Boolean(), nullable=False, comment='Whether application has been submitted'),
+        sa.Column('submitted_at', sa.DateTime(), nullable=True, comment='Timestamp when application was submitted'),
+        sa.Column('approved', sa.Boolean(), nullable=False, comment='Whether application has been approved'),
+        sa.Column('approved_at', sa.DateTime(), nullable=True, comment='Timestamp when application was approved'),
+        sa.Column('last_reminder_sent', sa.DateTime(), nullable=True, comment='Timestamp when last reminder email was sent'),
+        sa.Column('reviewed_at', sa.DateTime(), nullable=True, comment='Timestamp when an admin approved or rejected the application'),
+        sa.Column('claimed_by', sa.Integer(), nullable=True, comment='User id of the admin currently reviewing this application (no FK: keeps joins to User unambiguous)'),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True, comment='When the claim was taken or renewed; it lapses after REVIEW_LEASE_SECONDS'),
+        sa.Column('version_id', sa.Integer(), nullable=False, comment='Bumped on every ORM update; stale writes raise StaleDataError'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True, comment='Timestamp of the last change to this application'),
+        sa.Column('archived_at', sa.DateTime(), nullable=False, comment='When the application was moved to the archive'),
+        sa.Column('archive_reason', sa.String(length=20), nullable=False, comment="'finished' (reviewed or approved) or 'abandoned' (never submitted)"),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_application_archive_user', 'application_archive', ['user_id'], unique=False)
+
+    op.create_table('email_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=40), nullable=False, comment="Which renderer builds the message, e.g. 'password_setup'"),
+        sa.Column('recipient', sa.String(length=120), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True, comment='User the email is about (no FK: deleting the user just orphans the row)'),
+        sa.Column('status', sa.String(length=10), nullable=False, comment='pending -> sending -> sent, or failed after OUTBOX_MAX_ATTEMPTS'),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False, comment='Not sent before this time (retries back off)'),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True, comment='When a worker took the row; a stale claim is retried after OUTBOX_CLAIM_SECONDS'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_email_outbox_due', 'email_outbox', ['status', 'next_attempt_at'], unique=False)
+
+    op.create_table('backfill_progress',
+        sa.Column('name', sa.String(length=80), nullable=False),
+        sa.Column('status', sa.String(length=10), nullable=False, comment='running -> done, or failed when verification finds rows left behind'),
+        sa.Column('last_id', sa.Integer(), nullable=False, comment='Highest primary key processed; the next batch starts after it'),
+        sa.Column('rows_updated', sa.Integer(), nullable=False),
+        sa.Column('rows_before', sa.Integer(), nullable=True, comment='Table row count when the backfill started, for verification'),
+        sa.Column('pending_before', sa.Integer(), nullable=True, comment='Rows that needed a value when the backfill started'),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('backfill_progress')
+    op.drop_index('ix_email_outbox_due', table_name='email_outbox')
+    op.drop_table('email_outbox')
+    op.drop_index('ix_application_archive_user', table_name='application_archive')
+    op.drop_table('application_archive')
+    op.drop_index('ix_application_review_queue', table_name='application')
+    op.drop_table('application')
+    op.drop_table('user')
@@ -0,0 +1,80 @@
+"""Funnel analytics: step events and their daily aggregates
+
+Databases created by create_app() after this revision already have the
+tables (db.create_all() builds them before the baseline stamp), so each
+table is only created when it is missing.
+
+Revision ID: 0002_funnel_analytics
+Revises: 0001_baseline
+Create Date: 2026-10-19 16:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_funnel_analytics'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'funnel_event' not in existing:
+        op.create_table('funnel_event',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False, comment='No FK: `flask users delete` purges the events explicitly'),
+            sa.Column('step', sa.String(length=20), nullable=False, comment='One of FUNNEL_STEPS or FUNNEL_OUTCOMES'),
+            sa.Column('occurred_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sqlite_autoincrement=True
+        )
+        op.create_index('ix_funnel_event_user', 'funnel_event', ['user_id'], unique=False)
+
+    if 'funnel_user' not in existing:
+        op.create_table('funnel_user',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('cohort_day', sa.Date(), nullable=False, comment="Day of the user's first event"),
+            sa.Column('registered_at', sa.DateTime(), nullable=True),
+            sa.Column('passport_at', sa.DateTime(), nullable=True),
+            sa.Column('details_at', sa.DateTime(), nullable=True),
+            sa.Column('documents_at', sa.DateTime(), nullable=True),
+            sa.Column('submitted_at', sa.DateTime(), nullable=True),
+            sa.Column('approved_at', sa.DateTime(), nullable=True),
+            sa.Column('rejected_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('user_id')
+        )
+        op.create_index('ix_funnel_user_cohort', 'funnel_user', ['cohort_day'], unique=False)
+
+    if 'funnel_daily' not in existing:
+        op.create_table('funnel_daily',
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('step', sa.String(length=20), nullable=False),
+            sa.Column('users', sa.Integer(), nullable=False, comment='Cohort users who reached the step'),
+            sa.Column('converted', sa.Integer(), nullable=False, comment='Of those, users who had reached the previous step first'),
+            sa.Column('p50_seconds', sa.Float(), nullable=True, comment='Median time from the previous step'),
+            sa.Column('p90_seconds', sa.Float(), nullable=True),
+            sa.Column('duration_histogram', sa.Text(), nullable=True, comment='JSON counts per DURATION_BUCKETS bucket, so date ranges can be merged'),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('day', 'step')
+        )
+
+    if 'funnel_cursor' not in existing:
+        op.create_table('funnel_cursor',
+            sa.Column('name', sa.String(length=40), nullable=False),
+            sa.Column('last_event_id', sa.Integer(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('name')
+        )
+
+
+def downgrade():
+    op.drop_table('funnel_cursor')
+    op.drop_table('funnel_daily')
+    op.drop_index('ix_funnel_user_cohort', table_name='funnel_user')
+    op.drop_table('funnel_user')
+    op.drop_index('ix_funnel_event_user', table_name='funnel_event')
+    op.drop_table('funnel_event')
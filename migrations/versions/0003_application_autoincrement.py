@@ -0,0 +1,59 @@
+"""Application ids: AUTOINCREMENT, so archived ids are never reused
+
+Without it SQLite assigns max(id)+1, which after an archive batch is the
+id of a row that now lives in application_archive; archiving the new row
+then fails on the archive's primary key.
+
+SQLite cannot add AUTOINCREMENT in place, so the table is rebuilt (one
+copy of `application` in a single write transaction - run it while the
+app is stopped). Databases created by create_app() after this revision
+already have it and skip the rebuild. Either way the sequence starts
+above every live and archived id.
+
+Revision ID: 0003_application_autoincrement
+Revises: 0002_funnel_analytics
+Create Date: 2026-10-19 21:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_application_autoincrement'
+down_revision = '0002_funnel_analytics'
+branch_labels = None
+depends_on = None
+
+
+def _table_sql(bind):
+    return bind.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'application'"
+    ).scalar() or ''
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if 'AUTOINCREMENT' not in _table_sql(bind).upper():
+        with op.batch_alter_table('application', recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': True}):
+            pass
+
+    high = bind.exec_driver_sql(
+        "SELECT max(coalesce((SELECT max(id) FROM application), 0), "
+        "coalesce((SELECT max(id) FROM application_archive), 0))"
+    ).scalar()
+    updated = bind.exec_driver_sql(
+        "UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = 'application'", (high,)
+    ).rowcount
+    if not updated:
+        bind.exec_driver_sql(
+            "INSERT INTO sqlite_sequence (name, seq) VALUES ('application', ?)", (high,)
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('application', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': False}):
+        pass
@@ -0,0 +1,45 @@
+"""Review queue: remember who skipped an application
+
+create_app() adds these columns to existing databases at startup
+(utils/schema_utils.py ADDED_COLUMNS), so each one is only added when it
+is missing. ALTER TABLE ADD COLUMN does not copy the table.
+
+Revision ID: 0004_review_skips
+Revises: 0003_application_autoincrement
+Create Date: 2026-10-19 22:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_review_skips'
+down_revision = '0003_application_autoincrement'
+branch_labels = None
+depends_on = None
+
+TABLES = ('application', 'application_archive')
+
+
+def _columns():
+    return [
+        sa.Column('skipped_by', sa.Integer(), nullable=True, comment='User id of the admin who last skipped this application; not handed back to them for REVIEW_LEASE_SECONDS'),
+        sa.Column('skipped_at', sa.DateTime(), nullable=True, comment='When it was skipped'),
+    ]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        existing = {column['name'] for column in inspector.get_columns(table)}
+        for column in _columns():
+            if column.name not in existing:
+                op.add_column(table, column)
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('skipped_at')
+            batch_op.drop_column('skipped_by')
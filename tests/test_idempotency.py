@@ -0,0 +1,58 @@
+"""Form tokens: a double-tap replays, an edited resubmit is refused"""
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from app.extensions import db
+from app.models.user import User
+from utils.idempotency_utils import FORM_FIELD
+
+TOKEN = 'a' * 32
+
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SCHEDULER_ENABLED': False,
+        'TESTING': True,
+        'RATE_LIMIT_STORAGE_URL': 'memory://',
+        'DRAFT_STORAGE_URL': 'memory://',
+        'IDEMPOTENCY_STORAGE_URL': 'memory://',
+        'METRICS_DIR': None,
+        'TRACING_ENABLED': False,
+    })
+    with app.app_context():
+        db.session.add(User(full_name='Amina Njoroge', email='amina@example.test',
+                            password_hash=generate_password_hash('secret1')))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'  # flask-login
+        session['user_id'] = 1
+    return client
+
+
+def test_form_page_is_not_cached(client):
+    response = client.get('/application/step1')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-store'
+
+
+def test_same_body_replays(client):
+    first = client.post('/application/step1', data={'passport_status': 'has_passport', FORM_FIELD: TOKEN})
+    second = client.post('/application/step1', data={'passport_status': 'has_passport', FORM_FIELD: TOKEN})
+    assert second.status_code == first.status_code == 302
+    assert second.headers['Idempotent-Replay'] == 'true'
+
+
+def test_different_body_is_refused(client):
+    client.post('/application/step1', data={'passport_status': 'has_passport', FORM_FIELD: TOKEN})
+    response = client.post('/application/step1', data={'passport_status': 'no_passport', FORM_FIELD: TOKEN})
+    assert response.status_code == 422
+    assert 'Idempotent-Replay' not in response.headers
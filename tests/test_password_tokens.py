@@ -0,0 +1,53 @@
+"""Password setup/reset links work once: choosing a password voids them"""
+import pytest
+from itsdangerous import URLSafeTimedSerializer
+
+from app import create_app
+from app.extensions import db
+from app.models.user import User
+from utils.token_utils import generate_setup_token
+from utils.user_lifecycle_utils import UNUSABLE_PASSWORD
+
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SCHEDULER_ENABLED': False,
+        'TESTING': True,
+        'RATE_LIMIT_STORAGE_URL': 'memory://',
+        'DRAFT_STORAGE_URL': 'memory://',
+        'IDEMPOTENCY_STORAGE_URL': 'memory://',
+        'METRICS_DIR': None,
+        'TRACING_ENABLED': False,
+    })
+    with app.app_context():
+        # An account created by an admin import, waiting for its owner to choose a password
+        db.session.add(User(full_name='Amina Njoroge', email='amina@example.test', password_hash=UNUSABLE_PASSWORD))
+        db.session.commit()
+    return app
+
+
+def set_password(client, token, password):
+    return client.post(f'/reset-password/{token}', data={'password': password})
+
+
+def test_setup_token_is_single_use(app):
+    with app.test_request_context():
+        token = generate_setup_token(db.session.get(User, 1))
+    client = app.test_client()
+
+    assert set_password(client, token, 'first-secret').headers['Location'].endswith('/login')
+    assert set_password(client, token, 'second-secret').headers['Location'].endswith('/forgot-password')
+    with app.app_context():
+        assert db.session.get(User, 1).check_password('first-secret')
+
+
+def test_legacy_setup_token_only_until_password_is_set(app):
+    with app.app_context():
+        serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'])
+        token = serializer.dumps('amina@example.test', salt='password-setup')
+    client = app.test_client()
+
+    assert set_password(client, token, 'first-secret').headers['Location'].endswith('/login')
+    assert set_password(client, token, 'second-secret').headers['Location'].endswith('/forgot-password')
@@ -0,0 +1,122 @@
+"""Strict query audit: budgeted endpoints pass, over-budget ones raise QueryBudgetExceeded"""
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from app.extensions import db
+from app.models.application import Application
+from app.models.user import User
+from app.scheduler.auto_approver import auto_approve_submitted_applications
+from app.scheduler.reminder_scheduler import send_reminder_emails
+from utils.query_audit_utils import QueryBudgetExceeded, audit_queries
+
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'QUERY_AUDIT_MODE': 'strict',
+        'SCHEDULER_ENABLED': False,
+        'TESTING': True,  # let the test client raise instead of answering 500
+        'RATE_LIMIT_STORAGE_URL': 'memory://',
+        'DRAFT_STORAGE_URL': 'memory://',
+        'IDEMPOTENCY_STORAGE_URL': 'memory://',
+        'METRICS_DIR': None,
+        'TRACING_ENABLED': False,
+    })
+    with app.app_context():
+        db.session.add(User(full_name='Amina Njoroge', email='amina@example.test',
+                            password_hash=generate_password_hash('secret1')))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'  # flask-login
+        session['user_id'] = 1
+    return client
+
+
+def test_endpoint_within_budget(client):
+    # auth.dashboard declares @query_budget(3)
+    response = client.get('/dashboard')
+    assert response.status_code == 200
+
+
+def test_endpoint_over_budget_raises(app, client):
+    app.config['QUERY_BUDGETS'] = {'auth.dashboard': 1}
+    with pytest.raises(QueryBudgetExceeded, match=r'auth\.dashboard issued \d+ queries \(budget 1\)'):
+        client.get('/dashboard')
+
+
+# ---------------------- N+1 regressions: query counts must not grow with the data ----------------------
+def seed_applicants(app, count, **fields):
+    """Adds `count` users, each with an application built from `fields`"""
+    with app.app_context():
+        first = db.session.query(db.func.count(User.id)).scalar()
+        for number in range(first, first + count):
+            user = User(full_name=f'Applicant {number}', email=f'applicant{number}@example.test',
+                        password_hash='!')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Application(user_id=user.id, passport_status='has_passport', **fields))
+        db.session.commit()
+
+
+def seed_reminder_cases(app, count):
+    """Users in every reminder branch: no application, incomplete, approved and due weekly"""
+    week_ago = datetime.utcnow() - timedelta(days=8)
+    seed_applicants(app, count, submitted=False, approved=False)
+    seed_applicants(app, count, submitted=True, approved=True, approved_at=week_ago, last_reminder_sent=week_ago)
+    with app.app_context():
+        first = db.session.query(db.func.count(User.id)).scalar()
+        for number in range(first, first + count):
+            db.session.add(User(full_name=f'Newcomer {number}', email=f'newcomer{number}@example.test',
+                                password_hash='!'))
+        db.session.commit()
+
+
+def queries_for(run):
+    with audit_queries('test') as scope:
+        run()
+    return scope.queries
+
+
+def test_export_csv_query_count_is_constant(app):
+    with app.app_context():
+        db.session.get(User, 1).is_admin = True
+        db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['user_id'] = 1
+
+    def export():
+        response = client.get('/admin/applications/export')
+        assert response.status_code == 200
+
+    seed_applicants(app, 2, submitted=True, approved=False)
+    few = queries_for(export)
+    seed_applicants(app, 20, submitted=True, approved=False)
+    assert queries_for(export) == few
+
+
+def test_auto_approver_query_count_is_constant(app):
+    submitted_at = datetime.utcnow() - timedelta(days=2)
+
+    seed_applicants(app, 2, submitted=True, approved=False, submitted_at=submitted_at)
+    few = queries_for(lambda: auto_approve_submitted_applications(app))
+    seed_applicants(app, 20, submitted=True, approved=False, submitted_at=submitted_at)
+    assert queries_for(lambda: auto_approve_submitted_applications(app)) == few
+
+
+def test_reminder_query_count_is_constant(app):
+    seed_reminder_cases(app, 2)
+    few = queries_for(lambda: send_reminder_emails(app))
+    seed_reminder_cases(app, 10)
+    assert queries_for(lambda: send_reminder_emails(app)) == few
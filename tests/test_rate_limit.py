@@ -0,0 +1,43 @@
+"""Login throttling: failed attempts from one address don't lock the account everywhere"""
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from app.extensions import db
+from app.models.user import User
+
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SCHEDULER_ENABLED': False,
+        'TESTING': True,
+        'RATE_LIMIT_STORAGE_URL': 'memory://',
+        'RATE_LIMIT_PROXY_COUNT': 0,  # the test client connects directly
+        'DRAFT_STORAGE_URL': 'memory://',
+        'IDEMPOTENCY_STORAGE_URL': 'memory://',
+        'METRICS_DIR': None,
+        'TRACING_ENABLED': False,
+    })
+    with app.app_context():
+        db.session.add(User(full_name='Amina Njoroge', email='amina@example.test',
+                            password_hash=generate_password_hash('secret1')))
+        db.session.commit()
+    return app
+
+
+def log_in(app, address, password):
+    client = app.test_client()
+    return client.post('/login', data={'email': 'amina@example.test', 'password': password},
+                       environ_base={'REMOTE_ADDR': address})
+
+
+def test_guessing_from_one_address_does_not_lock_out_the_owner(app):
+    capacity, _ = app.config['RATE_LIMITS']['login']['account_ip']
+    for _ in range(capacity):
+        assert log_in(app, '203.0.113.7', 'wrong').status_code == 302
+    assert log_in(app, '203.0.113.7', 'secret1').status_code == 429
+
+    response = log_in(app, '198.51.100.20', 'secret1')
+    assert response.headers['Location'].endswith('/dashboard')
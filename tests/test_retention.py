@@ -0,0 +1,53 @@
+"""Archival: archived application ids are never handed out again"""
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from app.extensions import db
+from app.models.application import Application
+from app.models.application_archive import ArchivedApplication
+from app.models.user import User
+from utils.retention_utils import archive_batch
+
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SCHEDULER_ENABLED': False,
+        'TESTING': True,
+        'RATE_LIMIT_STORAGE_URL': 'memory://',
+        'DRAFT_STORAGE_URL': 'memory://',
+        'IDEMPOTENCY_STORAGE_URL': 'memory://',
+        'METRICS_DIR': None,
+        'TRACING_ENABLED': False,
+    })
+    with app.app_context():
+        db.session.add(User(full_name='Amina Njoroge', email='amina@example.test',
+                            password_hash=generate_password_hash('secret1')))
+        db.session.commit()
+        yield app
+
+
+def add_finished_application():
+    reviewed = datetime.utcnow() - timedelta(days=400)
+    application = Application(user_id=1, passport_status='has_passport', submitted=True,
+                              approved=True, submitted_at=reviewed, reviewed_at=reviewed)
+    db.session.add(application)
+    db.session.commit()
+    return application.id
+
+
+def test_archive_new_application_after_archiving(app):
+    first_id = add_finished_application()
+    assert archive_batch('finished', days=365) == (1, 0)
+
+    second_id = add_finished_application()
+    assert second_id != first_id
+    assert archive_batch('finished', days=365) == (1, 0)
+
+    archived = db.session.query(ArchivedApplication.id).order_by(ArchivedApplication.id).all()
+    assert [row.id for row in archived] == [first_id, second_id]
+    assert db.session.query(Application).count() == 0
@@ -0,0 +1,57 @@
+"""Review queue: skipping an application moves the admin on to the next one"""
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from app.extensions import db
+from app.models.application import Application
+from app.models.user import User
+
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SCHEDULER_ENABLED': False,
+        'TESTING': True,
+        'RATE_LIMIT_STORAGE_URL': 'memory://',
+        'DRAFT_STORAGE_URL': 'memory://',
+        'IDEMPOTENCY_STORAGE_URL': 'memory://',
+        'METRICS_DIR': None,
+        'TRACING_ENABLED': False,
+    })
+    with app.app_context():
+        db.session.add(User(full_name='Admin', email='admin@example.test',
+                            password_hash=generate_password_hash('secret1'), is_admin=True))
+        submitted = datetime.utcnow() - timedelta(days=2)
+        for number in (1, 2):
+            user = User(full_name=f'Applicant {number}', email=f'applicant{number}@example.test',
+                        password_hash=generate_password_hash('secret1'))
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Application(user_id=user.id, passport_status='has_passport', submitted=True,
+                                       approved=False, submitted_at=submitted + timedelta(hours=number)))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'  # flask-login
+        session['user_id'] = 1
+    return client
+
+
+def test_skip_moves_on_to_the_next_application(client):
+    response = client.get('/admin/review')
+    assert response.headers['Location'].endswith('/admin/review/1')
+
+    response = client.post('/admin/review/1', data={'decision': 'release'})
+    assert response.status_code == 302
+
+    response = client.get('/admin/review')
+    assert response.headers['Location'].endswith('/admin/review/2')
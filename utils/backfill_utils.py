@@ -0,0 +1,224 @@
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, literal, select, update
+
+from app.models.application import Application
+from app.models.backfill import BackfillRun
+from utils.metrics_utils import Counter
+from utils.write_queue_utils import run_write
+
+
+BACKFILL_ROWS = Counter(
+    'backfill_rows_total', 'Rows given a value by online backfills', ['backfill']
+)
+
+
+class BackfillError(RuntimeError):
+    """A backfill that is unknown or did not leave every row filled"""
+
+
+class Backfill:
+    """
+    Fills `column` of `table` for the rows matching `pending` (by default:
+    the column IS NULL) with `value`, an SQL expression over the same row
+    or a callable returning one (evaluated once per run).
+
+    Schema changes on SQLite should add the new column as nullable with a
+    plain ALTER TABLE ADD COLUMN (instant, no table rebuild), let the app
+    write it for new rows, and register a Backfill for the old ones.
+    """
+
+    def __init__(self, name, table, column, value, pending=None, description=''):
+        self.name = name
+        self.table = table
+        self.column = table.c[column]
+        self.value = value
+        self.pending = self.column.is_(None) if pending is None else pending
+        self.description = description
+        (self.key,) = table.primary_key.columns  # keyset paging needs a single-column key
+
+    def expression(self):
+        return self.value() if callable(self.value) else self.value
+
+
+BACKFILLS = {}
+
+
+def register_backfill(backfill):
+    BACKFILLS[backfill.name] = backfill
+    return backfill
+
+
+def get_backfill(name):
+    try:
+        return BACKFILLS[name]
+    except KeyError:
+        raise BackfillError(f"Unknown backfill '{name}' (known: {', '.join(sorted(BACKFILLS)) or 'none'}).")
+
+
+# ---------------------- RUNNING ----------------------
+class BackfillReport:
+    """Counts of one run, plus the before/after verification"""
+
+    def __init__(self, state):
+        self.name = state.name
+        self.rows_before = state.rows_before
+        self.pending_before = state.pending_before
+        self.rows_updated = state.rows_updated  # including earlier, interrupted runs
+        self.last_id = state.last_id
+        self.resumed_from = state.last_id if state.last_id else None
+        self.filled = 0  # by this run
+        self.rows_after = None
+        self.pending_after = None
+        self.batches = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.filled / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def verified(self):
+        return self.pending_after == 0
+
+
+def counts(backfill):
+    """(rows in the table, rows still pending), read in a transaction of their own"""
+    from app.extensions import db
+
+    rows, pending = db.session.execute(select(
+        select(func.count()).select_from(backfill.table).scalar_subquery(),
+        select(func.count()).select_from(backfill.table).where(backfill.pending).scalar_subquery(),
+    )).one()
+    db.session.rollback()
+    return rows, pending
+
+
+def backfill_state(name):
+    from app.extensions import db
+
+    state = db.session.get(BackfillRun, name)
+    if state is not None:
+        db.session.expunge(state)
+    db.session.rollback()
+    return state
+
+
+def _start(backfill, restart):
+    """Loads the saved progress, or records the before-counts of a fresh run"""
+    state = backfill_state(backfill.name)
+    if state is not None and state.status == 'running' and not restart:
+        return state
+
+    rows, pending = counts(backfill)
+    now = datetime.utcnow()
+
+    def record_start(session):
+        session.merge(BackfillRun(
+            name=backfill.name, status='running', last_id=0, rows_updated=0,
+            rows_before=rows, pending_before=pending, started_at=now, updated_at=now, finished_at=None,
+        ))
+
+    run_write(record_start, name='backfill_start')
+    return backfill_state(backfill.name)
+
+
+def _run_batch(backfill, value, last_id, batch_size):
+    """
+    Fills the next `batch_size` pending rows after `last_id` and saves the
+    position in the same short transaction. Returns the ids filled.
+    """
+    key = backfill.key
+    batch = (
+        select(key).where(key > last_id, backfill.pending)
+        .order_by(key).limit(batch_size).scalar_subquery()
+    )
+
+    def fill_batch(session):
+        filled = session.execute(
+            update(backfill.table).where(key.in_(batch)).values({backfill.column: value}).returning(key)
+        ).scalars().all()
+        if filled:
+            session.execute(
+                update(BackfillRun).where(BackfillRun.name == backfill.name)
+                .values(last_id=max(filled), rows_updated=BackfillRun.rows_updated + len(filled),
+                        updated_at=datetime.utcnow())
+            )
+        return filled
+
+    return run_write(fill_batch, name=f'backfill_{backfill.name}')
+
+
+def run_backfill(name, batch_size=None, duty_cycle=None, max_batches=None, restart=False, progress=None):
+    """
+    Runs (or resumes) a registered backfill while the app keeps serving:
+    each batch is its own short write transaction through the write queue,
+    and after each one the loop sleeps so the backfill holds the database
+    at most `duty_cycle` of the time. Rows that became pending behind the
+    cursor are picked up by a final pass from the start. Afterwards the
+    table is counted again; the run is 'done' only if no row is pending.
+    Returns a BackfillReport.
+    """
+    config = current_app.config
+    batch_size = batch_size or config['BACKFILL_BATCH_SIZE']
+    duty_cycle = duty_cycle or config['BACKFILL_DUTY_CYCLE']
+    backfill = get_backfill(name)
+    value = backfill.expression()
+    state = _start(backfill, restart)
+    report = BackfillReport(state)
+
+    last_id = pass_start = state.last_id
+    while True:
+        if max_batches is not None and report.batches >= max_batches:
+            report.elapsed = time.perf_counter() - report.started
+            return report  # stopped early: the saved position is kept, nothing is verified yet
+
+        started = time.perf_counter()
+        filled = _run_batch(backfill, value, last_id, batch_size)
+        if not filled:
+            if pass_start == 0 or counts(backfill)[1] == 0:
+                break
+            last_id = pass_start = 0  # rows behind the cursor became pending meanwhile
+            continue
+
+        report.batches += 1
+        report.rows_updated += len(filled)
+        report.filled += len(filled)
+        last_id = report.last_id = max(filled)
+        BACKFILL_ROWS.inc(len(filled), backfill=name)
+        report.elapsed = time.perf_counter() - report.started
+        if progress:
+            progress(report)
+        busy = time.perf_counter() - started
+        time.sleep(max(config['BACKFILL_MIN_PAUSE'], busy * (1 - duty_cycle) / duty_cycle))
+
+    report.elapsed = time.perf_counter() - report.started
+    report.rows_after, report.pending_after = counts(backfill)
+    now = datetime.utcnow()
+
+    def record_finish(session):
+        session.execute(
+            update(BackfillRun).where(BackfillRun.name == name)
+            .values(status='done' if report.verified else 'failed', finished_at=now, updated_at=now)
+        )
+
+    run_write(record_finish, name='backfill_finish')
+    return report
+
+
+# ---------------------- REGISTERED BACKFILLS ----------------------
+register_backfill(Backfill(
+    'application_updated_at',
+    Application.__table__,
+    'updated_at',
+    # Best known last change; rows with no timestamp at all start counting from the backfill
+    lambda: func.coalesce(
+        Application.reviewed_at, Application.approved_at, Application.submitted_at,
+        Application.last_reminder_sent, literal(datetime.utcnow()),
+    ),
+    description="application.updated_at for rows from before the column existed "
+                "(idle-user selection and archival skip rows without it)",
+))
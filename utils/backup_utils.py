@@ -0,0 +1,237 @@
+import glob
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from utils.metrics_utils import Counter, Gauge
+
+
+DB_BACKUPS = Counter(
+    'db_backups_total', 'Online copies of the main database, by kind and outcome', ['kind', 'outcome']
+)
+DB_BACKUP_SIZE = Gauge(
+    'db_backup_size_bytes', 'Size of the latest good copy of the main database', ['kind']
+)
+DB_BACKUP_RESTARTS = Counter(
+    'db_backup_restarts_total', 'Incremental copies restarted because the database was written meanwhile',
+    ['kind']
+)
+
+BACKUP_TIME_FORMAT = '%Y%m%d-%H%M%S'
+
+
+class BackupError(RuntimeError):
+    """A copy that could not be made or failed its integrity check"""
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def database_path():
+    """File behind SQLALCHEMY_DATABASE_URI; backups only make sense for file-based SQLite"""
+    from app.extensions import db
+
+    url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        raise BackupError(f"Online backups need a file-based SQLite database, not {url.render_as_string()}.")
+    return os.path.abspath(url.database)
+
+
+def _copy_pages(source, target, kind):
+    """
+    sqlite3 online backup API: BACKUP_STEP_PAGES pages per step with a
+    pause in between, so the copy never holds the database for long and
+    writers keep committing. A write from another connection makes SQLite
+    restart the copy; after BACKUP_MAX_RESTARTS the rest is copied in a
+    single step (one read transaction, which WAL lets writers work around).
+    """
+    config = current_app.config
+    pause = config['BACKUP_STEP_PAUSE']
+    restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            DB_BACKUP_RESTARTS.inc(kind=kind)
+            if restarts > config['BACKUP_MAX_RESTARTS']:
+                raise _TooManyRestarts()
+        last_remaining = remaining
+        if remaining and pause:
+            time.sleep(pause)
+
+    source_conn = sqlite3.connect(source, timeout=config['BACKUP_BUSY_TIMEOUT'])
+    try:
+        try:
+            source_conn.backup(target, pages=config['BACKUP_STEP_PAGES'], progress=progress)
+        except _TooManyRestarts:
+            source_conn.backup(target, pages=-1)
+    finally:
+        source_conn.close()
+    return restarts
+
+
+def _check_integrity(conn, full=True):
+    """integrity_check (every page and index) or quick_check; raises BackupError on a bad copy"""
+    pragma = 'integrity_check' if full else 'quick_check'
+    problems = [row[0] for row in conn.execute(f"PRAGMA {pragma}(20)")]
+    if problems != ['ok']:
+        raise BackupError(f"{pragma} failed: {'; '.join(problems)}")
+
+
+def copy_database(destination, kind='backup', full_check=True):
+    """
+    Copies the live database to `destination` without stopping the app:
+    pages go to a temporary file next to it, the copy is switched out of WAL
+    (so it is one self-contained file) and checked, then renamed into place.
+    Returns (size in bytes, seconds taken).
+    """
+    source = database_path()
+    os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+    partial = f"{destination}.{os.getpid()}.partial"
+    started = time.perf_counter()
+    try:
+        target = sqlite3.connect(partial)
+        try:
+            restarts = _copy_pages(source, target, kind)
+            target.execute("PRAGMA journal_mode=DELETE")
+            _check_integrity(target, full=full_check)
+        finally:
+            target.close()
+        os.replace(partial, destination)
+    except (sqlite3.Error, OSError, BackupError) as e:
+        DB_BACKUPS.inc(kind=kind, outcome='error')
+        if isinstance(e, BackupError):
+            raise
+        raise BackupError(f"Could not copy the database: {e}") from e
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    size = os.path.getsize(destination)
+    DB_BACKUPS.inc(kind=kind, outcome='success')
+    DB_BACKUP_SIZE.set(size, kind=kind)
+    if restarts:
+        current_app.logger.info(f"💾 {kind} copy restarted {restarts} times by concurrent writes")
+    return size, time.perf_counter() - started
+
+
+# ---------------------- ROTATED BACKUPS ----------------------
+def _backup_prefix():
+    return os.path.splitext(os.path.basename(database_path()))[0]
+
+
+def list_backups():
+    """[(path, taken_at, size)] of the backups in BACKUP_DIR, newest first"""
+    backups = []
+    pattern = os.path.join(current_app.config['BACKUP_DIR'], f"{_backup_prefix()}-*.db")
+    for path in glob.glob(pattern):
+        stamp = os.path.basename(path)[len(_backup_prefix()) + 1:-len('.db')]
+        try:
+            taken_at = datetime.strptime(stamp, BACKUP_TIME_FORMAT)
+        except ValueError:
+            continue
+        backups.append((path, taken_at, os.path.getsize(path)))
+    return sorted(backups, key=lambda backup: backup[1], reverse=True)
+
+
+def rotate_backups(keep):
+    """Deletes all but the `keep` newest backups; returns the paths removed"""
+    removed = []
+    for path, _, _ in list_backups()[keep:]:
+        os.remove(path)
+        removed.append(path)
+    return removed
+
+
+def create_backup():
+    """
+    Takes a checked backup into BACKUP_DIR as <db>-YYYYmmdd-HHMMSS.db and
+    rotates old ones. Returns (path, size, seconds).
+    """
+    config = current_app.config
+    path = os.path.join(
+        config['BACKUP_DIR'], f"{_backup_prefix()}-{datetime.utcnow().strftime(BACKUP_TIME_FORMAT)}.db"
+    )
+    size, elapsed = copy_database(path, kind='backup', full_check=True)
+    rotate_backups(config['BACKUP_KEEP'])
+    return path, size, elapsed
+
+
+def verify_backup(path):
+    """Opens a backup read-only and runs a full integrity check; raises BackupError if it is damaged"""
+    if not os.path.isfile(path):
+        raise BackupError(f"No such backup: {path}")
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            _check_integrity(conn, full=True)
+            return conn.execute("SELECT count(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        raise BackupError(f"{path} is not a readable SQLite database: {e}") from e
+
+
+def backup_due(interval_seconds):
+    """False while the newest backup is younger than the interval (every worker runs the job)"""
+    backups = list_backups()
+    return not backups or (datetime.utcnow() - backups[0][1]).total_seconds() >= interval_seconds * 0.9
+
+
+# ---------------------- REPORTING SNAPSHOT ----------------------
+def snapshot_age():
+    """Seconds since the reporting snapshot was refreshed, or None if there is none"""
+    try:
+        return time.time() - os.path.getmtime(current_app.config['SNAPSHOT_PATH'])
+    except OSError:
+        return None
+
+
+def refresh_snapshot():
+    """
+    Replaces the reporting snapshot with a fresh copy of the live database.
+    Readers that already opened the old file finish on it; the next
+    reporting_session() opens the new one. Returns (size, seconds).
+    """
+    return copy_database(current_app.config['SNAPSHOT_PATH'], kind='snapshot', full_check=False)
+
+
+def _snapshot_engine(app):
+    engine = app.extensions.get('reporting_snapshot')
+    if engine is None:
+        # No pool: every session opens the file anew, so a replaced snapshot is picked up
+        engine = create_engine(
+            f"sqlite:///file:{app.config['SNAPSHOT_PATH']}?mode=ro&uri=true", poolclass=NullPool
+        )
+
+        @event.listens_for(engine, 'connect')
+        def _connect(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA query_only=1")
+
+        app.extensions['reporting_snapshot'] = engine
+    return engine
+
+
+def reporting_session():
+    """
+    Session for heavy admin reads (exports). It reads the snapshot when
+    SNAPSHOT_ENABLED and the snapshot is fresher than SNAPSHOT_MAX_AGE, and
+    the live database otherwise. Returns (session, snapshot age in seconds
+    or None for live). Close the session when done.
+    """
+    from app.extensions import db
+
+    app = current_app._get_current_object()
+    age = snapshot_age()
+    if app.config['SNAPSHOT_ENABLED'] and age is not None and age <= app.config['SNAPSHOT_MAX_AGE']:
+        return Session(_snapshot_engine(app)), age
+    return Session(db.engine), None
@@ -0,0 +1,95 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import current_app, make_response, request, session
+from markupsafe import Markup
+
+from utils.metrics_utils import Counter
+from utils.template_utils import template_fingerprint
+
+
+FRAGMENT_LOOKUPS = Counter(
+    'template_fragment_cache_total', 'Rendered-fragment cache lookups', ['fragment', 'result']
+)
+
+
+# ---------------------- FRAGMENT CACHE ----------------------
+class FragmentCache:
+    """Per-worker LRU of rendered template fragments"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+            return html
+
+    def set(self, key, html):
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def fragment_cache(name, *key, caller):
+    """
+    Jinja global, used as a call block. Everything the fragment shows must
+    be covered by the key, normally an application's id and version_id:
+
+        {% call fragment_cache('documents', application.id, application.version_id) %}
+            ...
+        {% endcall %}
+    """
+    cache = current_app.extensions['fragment_cache']
+    cache_key = (name,) + key
+    html = cache.get(cache_key)
+    if html is None:
+        FRAGMENT_LOOKUPS.inc(fragment=name, result='miss')
+        html = Markup(caller())
+        cache.set(cache_key, html)
+    else:
+        FRAGMENT_LOOKUPS.inc(fragment=name, result='hit')
+    return html
+
+
+# ---------------------- ETAGS ----------------------
+def page_etag(*parts):
+    """Strong ETag over everything a page shows (plus the deployed templates)"""
+    raw = '|'.join(str(part) for part in (current_app.config['TEMPLATE_FINGERPRINT'],) + parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def etag_response(etag, render):
+    """
+    Answers 304 Not Modified when the browser already has this version of
+    the page, otherwise calls render() and tags the response. Pages with a
+    pending flash message are always rendered and never tagged, since the
+    message belongs to that one view.
+    """
+    if '_flashes' in session:
+        return render()
+
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'  # revalidate on every view
+    return response
+
+
+def init_fragment_cache(app):
+    app.extensions['fragment_cache'] = FragmentCache(app.config.get('FRAGMENT_CACHE_SIZE', 2048))
+    app.config['TEMPLATE_FINGERPRINT'] = template_fingerprint(app)
+    app.jinja_env.globals['fragment_cache'] = fragment_cache
@@ -0,0 +1,229 @@
+import collections
+import contextvars
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import current_app, g, jsonify, render_template, request
+from sqlalchemy import event
+from werkzeug.exceptions import ServiceUnavailable
+
+from utils.metrics_utils import REGISTRY, Counter
+
+
+INTERRUPTED_QUERIES = Counter(
+    'db_queries_interrupted_total', 'SQL statements cancelled because their request ran out of time', ['scope']
+)
+
+ABORT_LOG_NAME = 'aborted_queries.jsonl'
+ABORT_LOG_MAX_BYTES = 1024 * 1024
+MAX_PARAMETER_LENGTH = 200
+
+_recent_aborts = collections.deque(maxlen=50)  # used when there is no METRICS_DIR
+_settings = {'check_ops': 1000}
+
+
+class Deadline:
+    """Time budget of one request (or block); `expired` is set once SQLite was interrupted"""
+
+    def __init__(self, name, seconds):
+        self.name = name
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.expires_at = self.started + seconds
+        self.expired = False
+
+
+current_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+
+class DeadlineExceeded(ServiceUnavailable):
+    """A statement was interrupted because the request's time budget ran out"""
+
+    description = "This page took too long to load. Please narrow your search or try again in a moment."
+
+    def __init__(self, deadline):
+        super().__init__()
+        self.deadline = deadline
+
+
+# ---------------------- SQLITE HOOKS ----------------------
+def _progress_handler():
+    """
+    Called by SQLite every REQUEST_DEADLINE_CHECK_OPS virtual-machine instructions
+    on the thread running the statement; a non-zero return interrupts it.
+    """
+    deadline = current_deadline.get()
+    if deadline is not None and time.monotonic() > deadline.expires_at:
+        deadline.expired = True
+        return 1
+    return 0
+
+
+def _parameter(value):
+    text = repr(value)
+    return text if len(text) <= MAX_PARAMETER_LENGTH else text[:MAX_PARAMETER_LENGTH] + '…'
+
+
+def _record_abort(deadline, statement, parameters):
+    if isinstance(parameters, dict):
+        parameters = {name: _parameter(value) for name, value in parameters.items()}
+    elif parameters is not None:
+        parameters = [_parameter(value) for value in parameters]
+
+    entry = {
+        'time': time.time(),
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'pid': os.getpid(),
+        'scope': deadline.name,
+        'budget_seconds': deadline.seconds,
+        'elapsed_seconds': round(time.monotonic() - deadline.started, 3),
+        'statement': statement,
+        'parameters': parameters,
+    }
+    INTERRUPTED_QUERIES.inc(scope=deadline.name)
+    _append_abort(entry)
+    return entry
+
+
+def _append_abort(entry):
+    """Shared log of interrupted statements: one JSON line each, next to the worker dumps"""
+    if not REGISTRY.directory:
+        _recent_aborts.append(entry)
+        return
+    path = os.path.join(REGISTRY.directory, ABORT_LOG_NAME)
+    try:
+        if os.path.exists(path) and os.path.getsize(path) > ABORT_LOG_MAX_BYTES:
+            os.replace(path, f"{path}.1")
+        with open(path, 'a') as f:
+            f.write(json.dumps(entry, default=str) + '\n')
+    except OSError:
+        _recent_aborts.append(entry)
+
+
+def recent_aborts(limit=20):
+    """Newest first: the statements most recently cancelled by a deadline"""
+    entries = list(_recent_aborts)
+    if REGISTRY.directory:
+        path = os.path.join(REGISTRY.directory, ABORT_LOG_NAME)
+        try:
+            with open(path) as f:
+                lines = collections.deque(f, maxlen=limit)
+            entries = [json.loads(line) for line in lines] + entries
+        except (OSError, ValueError):
+            pass
+    entries.sort(key=lambda entry: entry['time'], reverse=True)
+    return entries[:limit]
+
+
+def _install_progress_handler(dbapi_connection, connection_record):
+    dbapi_connection.set_progress_handler(_progress_handler, _settings['check_ops'])
+
+
+def _handle_interrupt(exception_context):
+    original = exception_context.original_exception
+    if not isinstance(original, sqlite3.OperationalError) or 'interrupted' not in str(original):
+        return None
+    deadline = current_deadline.get()
+    if deadline is None or not deadline.expired:
+        return None
+
+    entry = _record_abort(deadline, exception_context.statement, exception_context.parameters)
+    current_app.logger.warning(
+        f"⏱️ Interrupted SQL in {deadline.name} after {entry['elapsed_seconds']}s "
+        f"(budget {deadline.seconds}s): {entry['statement']} {entry['parameters']}"
+    )
+    return DeadlineExceeded(deadline)
+
+
+# ---------------------- REQUEST HOOKS ----------------------
+def _deadline_seconds():
+    """
+    QUERY_BUDGETS-style lookup: REQUEST_DEADLINES, then @request_deadline,
+    then REQUEST_DEADLINE. Upload POSTs (@upload_endpoint) read their body
+    inside the request, so they also get UPLOAD_READ_TIMEOUT for that.
+    """
+    config = current_app.config
+    view = current_app.view_functions.get(request.endpoint)
+    seconds = config.get('REQUEST_DEADLINES', {}).get(
+        request.endpoint, getattr(view, 'request_deadline', config.get('REQUEST_DEADLINE'))
+    )
+    if seconds and request.method == 'POST' and getattr(view, 'upload_endpoint', None):
+        seconds += config.get('UPLOAD_READ_TIMEOUT', 0)
+    return seconds or None
+
+
+def _start_deadline():
+    if request.endpoint is None:
+        return
+    seconds = _deadline_seconds()
+    if seconds is None:
+        return
+    g.deadline_token = current_deadline.set(Deadline(request.endpoint, seconds))
+
+
+def _clear_deadline(exc=None):
+    token = g.pop('deadline_token', None)
+    if token is not None:
+        current_deadline.reset(token)
+
+
+def _deadline_exceeded(e):
+    from app.extensions import db
+
+    db.session.rollback()  # the interrupted transaction is unusable
+    current_deadline.set(None)  # or the error page's own queries (flask-login's user load) are interrupted too
+    if request.is_json or request.accept_mimetypes.best == 'application/json':
+        response = jsonify({'error': e.description})
+    else:
+        response = current_app.make_response(render_template('timeout.html', message=e.description))
+    response.status_code = 503
+    response.headers['Retry-After'] = str(current_app.config.get('REQUEST_DEADLINE_RETRY_AFTER', 30))
+    return response
+
+
+@contextmanager
+def deadline(name, seconds):
+    """
+    Gives a block outside a request (a job, a CLI command) its own budget:
+
+        with deadline('stale_reminders', 60):
+            ...
+
+    Statements still running when it expires raise DeadlineExceeded.
+    """
+    token = current_deadline.set(Deadline(name, seconds))
+    try:
+        yield
+    finally:
+        current_deadline.reset(token)
+
+
+def init_request_deadlines(app):
+    """
+    Interrupts SQL that runs past the request's time budget: REQUEST_DEADLINE
+    seconds by default, @request_deadline on a view, or REQUEST_DEADLINES
+    ({endpoint: seconds}). Must run before anything opens a database
+    connection, so every pooled connection gets the progress handler.
+    Writes on the writer thread are never interrupted (no deadline there).
+    """
+    if not app.config.get('REQUEST_DEADLINES_ENABLED', True):
+        return
+
+    from app.extensions import db
+
+    with app.app_context():
+        engine = db.engine
+    if engine.url.get_backend_name() != 'sqlite':
+        return
+
+    _settings['check_ops'] = app.config.get('REQUEST_DEADLINE_CHECK_OPS', 1000)
+    event.listen(engine, 'connect', _install_progress_handler)
+    event.listen(engine, 'handle_error', _handle_interrupt)
+
+    app.before_request(_start_deadline)
+    app.teardown_request(_clear_deadline)
+    app.register_error_handler(DeadlineExceeded, _deadline_exceeded)
@@ -0,0 +1,282 @@
+import os
+import re
+import zipfile
+import zlib
+from xml.etree import ElementTree
+
+
+# Formats we can read without third-party packages. Scanned PDFs (no text
+# layer), legacy .doc files and images are reported as unsupported/empty.
+TEXT_EXTENSIONS = ('.pdf', '.docx')
+
+MAX_XML_BYTES = 50 * 1024 * 1024  # uncompressed document.xml; anything bigger is not a CV
+
+
+class UnsupportedDocument(ValueError):
+    """The file is not a format we can pull text out of"""
+
+
+def extract_text(path, max_chars=200000):
+    """
+    Plain text of a .docx or text-layer .pdf, cut at `max_chars`.
+    Raises UnsupportedDocument for other formats.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.docx':
+        text = _docx_text(path)
+    elif extension == '.pdf':
+        text = _pdf_text(path)
+    else:
+        raise UnsupportedDocument(f"No text extractor for '{extension}' files.")
+    text = re.sub(r'[\x00-\x08\x0e-\x1f\x7f]', '', text)
+    text = re.sub(r'[ \t\r\f\v]+', ' ', text)
+    text = re.sub(r'\s*\n\s*', '\n', text).strip()
+    return text[:max_chars]
+
+
+# ---------------------- DOCX ----------------------
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def _docx_text(path):
+    """Text runs of word/document.xml: paragraphs become lines, tabs and breaks are kept"""
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise UnsupportedDocument("Not a valid .docx file.")
+
+    with archive:
+        try:
+            info = archive.getinfo('word/document.xml')
+        except KeyError:
+            raise UnsupportedDocument("The .docx file has no document body.")
+        if info.file_size > MAX_XML_BYTES:
+            raise UnsupportedDocument("The .docx document body is too large.")
+
+        parts = []
+        with archive.open(info) as xml:
+            for _, element in ElementTree.iterparse(xml):
+                if element.tag == _W + 't' and element.text:
+                    parts.append(element.text)
+                elif element.tag == _W + 'tab':
+                    parts.append('\t')
+                elif element.tag in (_W + 'br', _W + 'cr', _W + 'p'):
+                    parts.append('\n')
+                if element.tag == _W + 'p':
+                    element.clear()  # keep memory flat on long documents
+        return ''.join(parts)
+
+
+# ---------------------- PDF ----------------------
+_OBJECT = re.compile(rb'(\d+)\s+\d+\s+obj\b(.*?)\bendobj', re.S)
+_REFERENCE = re.compile(rb'/([^\s/<>\[\]()]+)\s+(\d+)\s+\d+\s+R')
+_FONT_RESOURCES = re.compile(rb'/Font\s*(?:<<(.*?)>>|(\d+)\s+\d+\s+R)', re.S)
+_TO_UNICODE = re.compile(rb'/ToUnicode\s+(\d+)\s+\d+\s+R')
+_HEX = re.compile(rb'<([0-9A-Fa-f\s]*)>')
+_BF_CHAR = re.compile(rb'beginbfchar(.*?)endbfchar', re.S)
+_BF_RANGE = re.compile(rb'beginbfrange(.*?)endbfrange', re.S)
+_BF_RANGE_ENTRY = re.compile(rb'<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]+)>\s*(<[0-9A-Fa-f]+>|\[[^\]]*\])')
+_CONTENT_TOKEN = re.compile(rb"""
+      \((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\)   # literal string (one level of nesting)
+    | <[0-9A-Fa-f\s]*>                           # hex string
+    | /[^\s/<>\[\]()]+                           # name
+    | [+-]?(?:\d+\.?\d*|\.\d+)                   # number
+    | [\[\]]
+    | [A-Za-z'"*]+                               # operator
+""", re.S | re.X)
+_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+
+def _inflate(data):
+    try:
+        return zlib.decompressobj().decompress(data)  # tolerates the trailing EOL before endstream
+    except zlib.error:
+        return b''
+
+
+def _split_stream(body):
+    """(dictionary, decoded stream data or None) of one object body"""
+    marker = re.search(rb'\bstream\r?\n', body)
+    if marker is None:
+        return body, None
+    dictionary = body[:marker.start()]
+    data = body[marker.end():body.rfind(b'endstream')]
+    if b'/FlateDecode' in dictionary:
+        data = _inflate(data)
+    elif b'/Filter' in dictionary:
+        data = b''  # images and other encodings carry no text
+    return dictionary, data
+
+
+def _pdf_objects(raw):
+    """{object number: (dictionary, stream data or None)}, including objects packed in object streams"""
+    objects = {}
+    for match in _OBJECT.finditer(raw):
+        objects[int(match.group(1))] = _split_stream(match.group(2))
+
+    for dictionary, data in list(objects.values()):
+        if data and b'/ObjStm' in dictionary:
+            first = re.search(rb'/First\s+(\d+)', dictionary)
+            if first is None:
+                continue
+            first = int(first.group(1))
+            header = [int(n) for n in data[:first].split()]
+            offsets = list(zip(header[::2], header[1::2]))
+            for i, (number, offset) in enumerate(offsets):
+                end = offsets[i + 1][1] if i + 1 < len(offsets) else len(data) - first
+                objects.setdefault(number, (data[first + offset:first + end], None))
+    return objects
+
+
+def _parse_cmap(data):
+    """ToUnicode CMap -> ({code bytes: text}, code width in bytes)"""
+    mapping, width = {}, 1
+
+    def code(hex_digits):
+        return bytes.fromhex(hex_digits.decode())
+
+    def text(hex_digits):
+        return bytes.fromhex(hex_digits.decode()).decode('utf-16-be', 'ignore')
+
+    for block in _BF_CHAR.findall(data):
+        pairs = _HEX.findall(block)
+        for source, target in zip(pairs[::2], pairs[1::2]):
+            source = re.sub(rb'\s', b'', source)
+            width = len(source) // 2 or width
+            mapping[code(source)] = text(re.sub(rb'\s', b'', target))
+
+    for block in _BF_RANGE.findall(data):
+        for low, high, target in _BF_RANGE_ENTRY.findall(block):
+            width = len(low) // 2 or width
+            start, end = int(low, 16), int(high, 16)
+            if end - start > 0xFFFF:
+                continue
+            if target.startswith(b'['):
+                targets = [text(t) for t in _HEX.findall(target)]
+            else:
+                first = int(target[1:-1], 16)
+                targets = [chr(first + i) if first + i < 0x110000 else '' for i in range(end - start + 1)]
+            for i, value in enumerate(targets[:end - start + 1]):
+                mapping[(start + i).to_bytes(len(low) // 2, 'big')] = value
+    return mapping, width
+
+
+def _font_maps(objects):
+    """Font resource name (/F1) -> ToUnicode map. Names are merged across pages."""
+    fonts = {}
+    for dictionary, _ in objects.values():
+        for inline, reference in _FONT_RESOURCES.findall(dictionary):
+            if reference:
+                inline = objects.get(int(reference), (b'', None))[0]
+            for name, number in _REFERENCE.findall(inline):
+                font = objects.get(int(number), (b'', None))[0]
+                to_unicode = _TO_UNICODE.search(font)
+                if to_unicode is None:
+                    continue
+                cmap = objects.get(int(to_unicode.group(1)), (b'', None))[1]
+                if cmap:
+                    fonts.setdefault(name.decode('latin-1'), _parse_cmap(cmap))
+    return fonts
+
+
+def _literal(token):
+    """Bytes of a (literal) string token, with escapes resolved"""
+    body, out, i = token[1:-1], bytearray(), 0
+    while i < len(body):
+        char = body[i:i + 1]
+        if char != b'\\':
+            out += char
+            i += 1
+            continue
+        following = body[i + 1:i + 2]
+        octal = re.match(rb'[0-7]{1,3}', body[i + 1:i + 4])
+        if octal:
+            out.append(int(octal.group(), 8) & 0xFF)
+            i += 1 + len(octal.group())
+        elif following in (b'\r', b'\n'):
+            i += 2  # line continuation
+        else:
+            out += _ESCAPES.get(following, following)
+            i += 2
+    return bytes(out)
+
+
+def _hex_string(token):
+    digits = re.sub(rb'\s', b'', token[1:-1]).decode()
+    return bytes.fromhex(digits + '0' * (len(digits) % 2))  # an odd final digit is padded with 0
+
+
+def _decode(string, font):
+    if font is None:
+        return string.decode('cp1252', 'ignore')
+    mapping, width = font
+    return ''.join(mapping.get(string[i:i + width], '') for i in range(0, len(string), width))
+
+
+def _content_text(data, fonts):
+    """Text shown by Tj / TJ / ' / " operators in one content stream"""
+    parts, operands, array, font, size = [], [], None, None, 0.0
+    for token in _CONTENT_TOKEN.findall(data):
+        first = token[:1]
+        if first == b'(' or first == b'<':
+            value = _literal(token) if first == b'(' else _hex_string(token)
+            (array if array is not None else operands).append(value)
+        elif first == b'[':
+            array = []
+        elif first == b']':
+            operands.append(array or [])
+            array = None
+        elif first == b'/' or first in b'+-.0123456789':
+            value = token[1:].decode('latin-1') if first == b'/' else float(token)  # names are str
+            (array if array is not None else operands).append(value)
+        else:
+            if token == b'Tf' and len(operands) >= 2 and isinstance(operands[-2], str):
+                font = fonts.get(operands[-2])
+                size = operands[-1] if isinstance(operands[-1], float) else size
+            elif token in (b'Tj', b"'", b'"') and operands and isinstance(operands[-1], bytes):
+                if token != b'Tj':
+                    parts.append('\n')
+                parts.append(_decode(operands[-1], font))
+            elif token == b'TJ' and operands and isinstance(operands[-1], list):
+                for item in operands[-1]:
+                    if isinstance(item, bytes):
+                        parts.append(_decode(item, font))
+                    elif item < -150:
+                        parts.append(' ')  # a gap wider than kerning (1/1000 em) is a word break
+            elif token in (b'Td', b'TD') and len(operands) >= 2 and isinstance(operands[-1], float):
+                # A new line, or a jump along it: longer than one glyph means a new word,
+                # shorter is a generator placing glyphs one at a time.
+                if operands[-1]:
+                    parts.append('\n')
+                elif isinstance(operands[-2], float) and operands[-2] > size:
+                    parts.append(' ')
+            elif token in (b'T*', b'ET', b'Tm'):
+                parts.append('\n' if token != b'Tm' else ' ')
+            operands = []
+    return ''.join(parts)
+
+
+_FONT_PROGRAM = re.compile(rb'/Length[123]\b|/Subtype\s*/(?:Type1C|CIDFontType0C|OpenType)')
+_TEXT_OBJECT = re.compile(rb'\bBT\b.*?\bT[Jj]\b.*?\bET\b', re.S)
+
+
+def _is_content_stream(dictionary, data):
+    """Page contents and form XObjects; skips fonts, images, metadata, xref and object streams"""
+    if not data or _FONT_PROGRAM.search(dictionary):
+        return False
+    if b'/Type' in dictionary and not re.search(rb'/Subtype\s*/Form', dictionary):
+        return False
+    return _TEXT_OBJECT.search(data) is not None
+
+
+def _pdf_text(path):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if not raw.startswith(b'%PDF'):
+        raise UnsupportedDocument("Not a PDF file.")
+
+    objects = _pdf_objects(raw)
+    fonts = _font_maps(objects)
+    return '\n'.join(
+        _content_text(data, fonts) for dictionary, data in objects.values() if _is_content_stream(dictionary, data)
+    )
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import re
+import time
+import uuid
+
+from flask import current_app
+from sqlalchemy import select, union
+from werkzeug.utils import secure_filename
+
+from utils.metrics_utils import Counter
+from utils.tracing_utils import annotate_span, traced
+
+
+DOCUMENT_UPLOADS = Counter(
+    'document_uploads_total', 'Step 3 documents by how they reached the server', ['kind', 'outcome']
+)
+DOCUMENT_BYTES = Counter(
+    'document_upload_bytes_total', 'Document bytes received, and bytes not re-sent thanks to dedup',
+    ['kind', 'outcome']
+)
+
+# Document kind (form field) -> Application column
+DOCUMENT_KINDS = {
+    'cv': 'cv_filename',
+    'national_id': 'id_filename',
+    'certificate': 'cert_filename',
+}
+ALLOWED_EXTENSIONS = {
+    'cv': ('.pdf', '.doc', '.docx'),
+    'national_id': ('.pdf', '.jpg', '.jpeg', '.png'),
+    'certificate': ('.pdf', '.jpg', '.jpeg', '.png'),
+}
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+CHUNK_SIZE = 64 * 1024
+
+
+class DocumentError(ValueError):
+    """An upload or handshake the server refuses (bad kind, type or hash)"""
+
+
+def document_extension(kind, filename):
+    """The lower-cased extension of `filename` if `kind` accepts it"""
+    if kind not in DOCUMENT_KINDS:
+        raise DocumentError(f"Unknown document '{kind}'.")
+    extension = os.path.splitext(secure_filename(filename or ''))[1].lower()
+    if extension not in ALLOWED_EXTENSIONS[kind]:
+        raise DocumentError(f"Please upload a {', '.join(ALLOWED_EXTENSIONS[kind])} file.")
+    return extension
+
+
+def document_name(sha256, extension):
+    """
+    Stored documents are named by content: identical files uploaded by
+    different applicants (or re-uploaded) are kept once.
+    """
+    return f"{sha256}{extension}"
+
+
+def find_document(kind, sha256, size, filename, owned=()):
+    """
+    Handshake lookup: the stored name for content with this hash and size,
+    or None when the client has to send the file. Only names in `owned`
+    (the caller's own documents) are found: knowing a hash must not be
+    enough to attach someone else's file, or to learn that it exists.
+    """
+    sha256 = (sha256 or '').lower()
+    if not SHA256_PATTERN.match(sha256):
+        raise DocumentError("Invalid SHA-256 digest.")
+    name = document_name(sha256, document_extension(kind, filename))
+    if name not in owned:
+        return None
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], name)
+    try:
+        if os.path.getsize(path) != size:
+            return None
+        os.utime(path)  # about to be referenced again: restart the garbage collector's grace period
+    except OSError:
+        return None
+    DOCUMENT_UPLOADS.inc(kind=kind, outcome='already_stored')
+    DOCUMENT_BYTES.inc(size, kind=kind, outcome='saved')
+    return name
+
+
+@traced('storage.write')
+def store_document(kind, file_storage, expected_sha256=None):
+    """
+    Streams an uploaded file to disk while hashing it, then files it under
+    its content name. Returns (name, size). If `expected_sha256` is given
+    (the handshake's hash) and does not match, nothing is kept.
+    """
+    extension = document_extension(kind, file_storage.filename)
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+
+    digest, size = hashlib.sha256(), 0
+    partial = os.path.join(upload_folder, f".incoming-{uuid.uuid4().hex}")
+    try:
+        with open(partial, 'wb') as out:
+            for chunk in iter(lambda: file_storage.stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+
+        sha256 = digest.hexdigest()
+        if expected_sha256 and expected_sha256.lower() != sha256:
+            DOCUMENT_UPLOADS.inc(kind=kind, outcome='hash_mismatch')
+            raise DocumentError("The file changed while uploading. Please try again.")
+
+        name = document_name(sha256, extension)
+        final = os.path.join(upload_folder, name)
+        DOCUMENT_BYTES.inc(size, kind=kind, outcome='received')
+        duplicate = os.path.exists(final)
+        if duplicate:
+            os.utime(final)
+            DOCUMENT_UPLOADS.inc(kind=kind, outcome='duplicate')  # sent anyway (no handshake)
+        else:
+            os.replace(partial, final)
+            DOCUMENT_UPLOADS.inc(kind=kind, outcome='uploaded')
+        annotate_span(**{'document.kind': kind, 'document.size': size, 'document.duplicate': duplicate})
+        return name, size
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def referenced_documents(names=None):
+    """
+    Stored names that an application, live or archived, points at; only
+    those among `names` when given.
+    """
+    from app.extensions import db
+    from app.models.application import Application
+    from app.models.application_archive import ArchivedApplication
+
+    columns = [
+        getattr(model, column)
+        for model in (Application, ArchivedApplication) for column in DOCUMENT_KINDS.values()
+    ]
+    if names is None:
+        selects = [select(column).where(column.isnot(None)) for column in columns]
+    else:
+        selects = [select(column).where(column.in_(names)) for column in columns]
+    return set(db.session.execute(union(*selects)).scalars())
+
+
+def remove_unreferenced_documents(names):
+    """
+    Deletes the stored files among `names` that no application points at any
+    more (files are content-addressed, so one may be shared), and drops them
+    from the search index. Call after the rows referencing them are committed.
+    Files modified within GC_GRACE_SECONDS may be about to be attached by an
+    upload in flight (find_document() touches them), so they are left for
+    the storage garbage collector. Returns the names removed.
+    """
+    from utils.search_utils import forget_documents
+
+    names = {name for name in names if name}
+    if not names:
+        return set()
+    referenced = referenced_documents(names)
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    cutoff = time.time() - current_app.config['GC_GRACE_SECONDS']
+    removed = set()
+    for name in names - referenced:
+        path = os.path.join(upload_folder, name)
+        try:
+            if os.stat(path).st_mtime > cutoff:
+                continue
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        removed.add(name)
+    forget_documents(removed)
+    return removed
@@ -0,0 +1,266 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+
+from utils.metrics_utils import Counter
+
+
+DRAFT_SAVES = Counter('application_draft_saves_total', 'Autosaved draft updates by wizard step', ['step'])
+
+# Wizard steps that autosave, and the Application fields each one may buffer
+DRAFT_FIELDS = {
+    1: ('passport_status',),
+    2: ('phone_number', 'date_of_birth', 'education_level', 'occupation', 'marital_status'),
+}
+MAX_DRAFT_VALUE_LENGTH = 255
+
+
+class SQLiteDraftStore:
+    """
+    Partially filled wizard forms, kept in their own SQLite file so every
+    worker sees them and autosaves never take the main database's write
+    lock. `dirty` marks drafts the flusher has not copied to Application yet.
+    """
+
+    MAX_AGE_SECONDS = 30 * 86400  # abandoned drafts are pruned after this
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS drafts ("
+                " user_id INTEGER NOT NULL, step INTEGER NOT NULL, fields TEXT NOT NULL,"
+                " updated_at REAL NOT NULL, dirty INTEGER NOT NULL DEFAULT 1,"
+                " PRIMARY KEY (user_id, step))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_drafts_dirty ON drafts (dirty) WHERE dirty = 1")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")  # a lost draft is retyped, not lost data
+            self._local.conn = conn
+        return conn
+
+    def save(self, user_id, step, fields):
+        """Merges `fields` into the user's draft for `step` and marks it dirty"""
+        self._connect().execute(
+            "INSERT INTO drafts (user_id, step, fields, updated_at, dirty) VALUES (?, ?, ?, ?, 1) "
+            "ON CONFLICT(user_id, step) DO UPDATE SET fields = json_patch(fields, excluded.fields),"
+            " updated_at = excluded.updated_at, dirty = 1",
+            (user_id, step, json.dumps(fields), time.time())
+        )
+
+    def load(self, user_id, step):
+        row = self._connect().execute(
+            "SELECT fields FROM drafts WHERE user_id = ? AND step = ?", (user_id, step)
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def take_dirty(self, limit=500, user_ids=None):
+        """
+        Claims up to `limit` dirty drafts (optionally only for `user_ids`)
+        and clears their dirty flag in one IMMEDIATE transaction, so two
+        workers never flush the same change. Returns [(user_id, step, fields)].
+        """
+        conn = self._connect()
+        user_filter, params = "", []
+        if user_ids is not None:
+            user_filter = f" AND user_id IN ({', '.join('?' for _ in user_ids)})"
+            params = list(user_ids)
+
+        if not conn.execute(f"SELECT 1 FROM drafts WHERE dirty = 1{user_filter} LIMIT 1", params).fetchone():
+            return []  # cheap check; most intervals have nothing to do
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT user_id, step, fields FROM drafts WHERE dirty = 1{user_filter} LIMIT ?", params + [limit]
+            ).fetchall()
+            conn.executemany(
+                "UPDATE drafts SET dirty = 0 WHERE user_id = ? AND step = ?",
+                [(user_id, step) for user_id, step, _ in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [(user_id, step, json.loads(fields)) for user_id, step, fields in rows]
+
+    def mark_dirty(self, keys):
+        """Re-queues [(user_id, step)] after a failed flush"""
+        self._connect().executemany("UPDATE drafts SET dirty = 1 WHERE user_id = ? AND step = ?", keys)
+
+    def existing(self, keys):
+        """The [(user_id, step)] among `keys` that still have a draft"""
+        conn = self._connect()
+        return {
+            key for key in keys
+            if conn.execute("SELECT 1 FROM drafts WHERE user_id = ? AND step = ?", key).fetchone()
+        }
+
+    def discard(self, user_id, step):
+        """Drops a draft once its step has been submitted for real"""
+        self._connect().execute("DELETE FROM drafts WHERE user_id = ? AND step = ?", (user_id, step))
+
+    def prune(self):
+        self._connect().execute(
+            "DELETE FROM drafts WHERE updated_at < ?", (time.time() - self.MAX_AGE_SECONDS,)
+        )
+
+
+class MemoryDraftStore:
+    """
+    Process-local stand-in for SQLiteDraftStore.
+    Only suitable for a single worker (development, tests).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._drafts = {}  # (user_id, step) -> [fields, updated_at, dirty]
+
+    def save(self, user_id, step, fields):
+        with self._lock:
+            draft = self._drafts.setdefault((user_id, step), [{}, 0, True])
+            draft[0].update(fields)
+            draft[1] = time.time()
+            draft[2] = True
+
+    def load(self, user_id, step):
+        with self._lock:
+            draft = self._drafts.get((user_id, step))
+            return dict(draft[0]) if draft else {}
+
+    def take_dirty(self, limit=500, user_ids=None):
+        with self._lock:
+            taken = []
+            for (user_id, step), draft in self._drafts.items():
+                if len(taken) >= limit:
+                    break
+                if draft[2] and (user_ids is None or user_id in user_ids):
+                    draft[2] = False
+                    taken.append((user_id, step, dict(draft[0])))
+            return taken
+
+    def mark_dirty(self, keys):
+        with self._lock:
+            for key in keys:
+                if key in self._drafts:
+                    self._drafts[key][2] = True
+
+    def existing(self, keys):
+        with self._lock:
+            return {key for key in keys if key in self._drafts}
+
+    def discard(self, user_id, step):
+        with self._lock:
+            self._drafts.pop((user_id, step), None)
+
+    def prune(self):
+        pass
+
+
+def apply_draft_fields(application, fields):
+    """
+    Copies autosaved values onto an application, skipping anything that
+    would not pass the step's own validation (half-typed dates, blanks).
+    Returns True if anything changed.
+    """
+    changed = False
+    for name, value in fields.items():
+        if not value:
+            continue
+        if name == 'date_of_birth':
+            try:
+                value = datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                continue
+        if getattr(application, name) != value:
+            setattr(application, name, value)
+            changed = True
+    return changed
+
+
+def merge_drafts(drafts, applications_by_user):
+    """
+    Coalesces claimed drafts onto the loaded applications. Users without an
+    application keep their draft in the store only (step 1 creates the row).
+    Submitted applications are never changed. Returns the number of
+    applications modified.
+    """
+    fields_by_user = {}
+    for user_id, _, fields in drafts:
+        fields_by_user.setdefault(user_id, {}).update(fields)
+
+    changed = 0
+    for user_id, fields in fields_by_user.items():
+        application = applications_by_user.get(user_id)
+        if application is None or application.submitted:
+            continue
+        if apply_draft_fields(application, fields):
+            changed += 1
+    return changed
+
+
+def init_drafts(app):
+    """
+    Creates the draft store named by DRAFT_STORAGE_URL
+    ('memory://' or 'sqlite:///<path>') and attaches it to the app.
+    """
+    url = app.config.get('DRAFT_STORAGE_URL', 'memory://')
+    if url.startswith('sqlite:///'):
+        store = SQLiteDraftStore(url[len('sqlite:///'):])
+    else:
+        store = MemoryDraftStore()
+    app.extensions['drafts'] = store
+    return store
+
+
+def get_draft_store():
+    return current_app.extensions['drafts']
+
+
+def clean_draft_fields(step, form):
+    """
+    Keeps only the fields `step` may autosave, trimmed and length-checked.
+    Returns None for a step that does not autosave.
+    """
+    allowed = DRAFT_FIELDS.get(step)
+    if allowed is None:
+        return None
+    fields = {}
+    for name in allowed:
+        value = form.get(name)
+        if value is not None:
+            fields[name] = value.strip()[:MAX_DRAFT_VALUE_LENGTH]
+    return fields
+
+
+def save_draft(user_id, step, form):
+    """Buffers a partial form; returns the field names stored (None for an unknown step)"""
+    fields = clean_draft_fields(step, form)
+    if fields is None:
+        return None
+    if fields:
+        get_draft_store().save(user_id, step, fields)
+        DRAFT_SAVES.inc(step=str(step))
+    return sorted(fields)
+
+
+def form_with_draft(application, user_id, step):
+    """
+    Values to pre-fill a wizard step with: what is saved on the
+    application, overlaid with any newer autosaved draft.
+    """
+    values = {name: getattr(application, name, None) if application else None for name in DRAFT_FIELDS[step]}
+    values.update(get_draft_store().load(user_id, step))
+    return values
@@ -1,11 +1,15 @@
 from flask_mail import Message
 from flask import current_app
 from app.extensions import mail
+from utils.metrics_utils import SMTP_SEND_TIME
+from utils.tracing_utils import KIND_CLIENT, span
+import time
 
 def send_email(subject, recipients, body, html=None):
     """
     Core email sending function
     """
+    started = time.perf_counter()
     try:
         msg = Message(
     subject=subject,
@@ -16,12 +20,16 @@ def send_email(subject, recipients, body, html=None):
 
         if html:
             msg.html = html
-        mail.send(msg)
-        current_app.logger.info(f"✅ Email sent to {recipients}")
+        with span('smtp.send', KIND_CLIENT, **{'email.recipients': len(recipients), 'email.subject': subject}):
+            mail.send(msg)
+        SMTP_SEND_TIME.observe(time.perf_counter() - started, outcome='sent')
+        current_app.logger.info("✅ Email sent to %s", recipients, extra={'event': 'email_sent'})
         return True, "Email sent successfully."
     except Exception as e:
+        SMTP_SEND_TIME.observe(time.perf_counter() - started, outcome='failed')
         error_msg = f"❌ Failed to send email: {str(e)}"
-        current_app.logger.error(error_msg, exc_info=True)
+        current_app.logger.error("❌ Failed to send email to %s: %s", recipients, e, exc_info=True,
+                                 extra={'event': 'email_failed'})
         return False, error_msg
 
 def send_acceptance_email(to_email, user_name, registration_number, is_reminder=False):
@@ -0,0 +1,340 @@
+import atexit
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.models.funnel import FUNNEL_OUTCOMES, FUNNEL_STEPS, FunnelCursor, FunnelDaily, FunnelEvent, FunnelUser
+from utils.metrics_utils import Counter
+from utils.write_queue_utils import run_write
+
+
+FUNNEL_EVENTS = Counter(
+    'funnel_events_total', 'Applicant funnel steps recorded', ['step']
+)
+
+# Step -> the step a user normally completes just before it
+PREVIOUS_STEP = {**dict(zip(FUNNEL_STEPS[1:], FUNNEL_STEPS)), 'rejected': 'submitted'}
+REPORT_STEPS = FUNNEL_STEPS + FUNNEL_OUTCOMES
+
+# Upper bounds (seconds) of the time-between-steps histogram buckets; the last one is open
+DURATION_BUCKETS = (
+    60, 300, 900, 3600, 3 * 3600, 6 * 3600, 12 * 3600,
+    86400, 2 * 86400, 3 * 86400, 7 * 86400, 14 * 86400, 30 * 86400, math.inf,
+)
+CURSOR_NAME = 'funnel_daily'
+
+
+# ---------------------- RECORDING ----------------------
+class FunnelEventBuffer:
+    """
+    Per-worker buffer of funnel events. Steps are appended from request
+    threads without touching the database; the buffer is written in one
+    INSERT once it holds FUNNEL_FLUSH_SIZE events or its oldest event is
+    FUNNEL_FLUSH_INTERVAL seconds old, by the funnel flush job, and at exit.
+    Events still buffered when a worker is killed are lost: they feed
+    statistics, not the application itself.
+    """
+
+    def __init__(self, flush_size=200, flush_interval=5.0):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._events = []
+        self._oldest = None
+        self._lock = threading.Lock()
+
+    def append(self, user_id, step, occurred_at=None):
+        with self._lock:
+            self._events.append({'user_id': user_id, 'step': step, 'occurred_at': occurred_at or datetime.utcnow()})
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            due = len(self._events) >= self.flush_size or time.monotonic() - self._oldest >= self.flush_interval
+        FUNNEL_EVENTS.inc(step=step)
+        if due:
+            try:
+                self.flush()
+            except Exception as e:  # statistics must not fail the request; the next flush retries
+                current_app.logger.warning(f"⚠️ Could not write funnel events: {e}")
+
+    def flush(self):
+        """Writes the buffered events; they go back to the buffer if the insert fails"""
+        with self._lock:
+            events, self._events, self._oldest = self._events, [], None
+        if not events:
+            return 0
+        try:
+            run_write(lambda session: session.execute(insert(FunnelEvent), events), name='funnel_events')
+        except Exception:
+            with self._lock:
+                self._events[:0] = events
+                self._oldest = self._oldest or time.monotonic()
+            raise
+        return len(events)
+
+
+def init_funnel(app):
+    buffer = FunnelEventBuffer(app.config['FUNNEL_FLUSH_SIZE'], app.config['FUNNEL_FLUSH_INTERVAL'])
+    app.extensions['funnel_events'] = buffer
+
+    def flush_at_exit():
+        with app.app_context():
+            try:
+                buffer.flush()
+            except Exception as e:
+                app.logger.error(f"❌ Could not write buffered funnel events at exit: {e}")
+
+    atexit.register(flush_at_exit)
+    return buffer
+
+
+def record_step(user_id, step, occurred_at=None):
+    """Buffers the event that `user_id` completed `step` (see FUNNEL_STEPS)"""
+    current_app.extensions['funnel_events'].append(user_id, step, occurred_at)
+
+
+def add_step_events(session, user_ids, step, occurred_at):
+    """
+    Inserts events for `step` inside the caller's write unit, for
+    transitions that must be recorded only if their transaction commits
+    (review decisions).
+    """
+    rows = [{'user_id': user_id, 'step': step, 'occurred_at': occurred_at} for user_id in user_ids]
+    if rows:
+        session.execute(insert(FunnelEvent), rows)
+        FUNNEL_EVENTS.inc(len(rows), step=step)
+
+
+# ---------------------- AGGREGATION ----------------------
+def _percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+def _bucket(seconds):
+    for index, upper in enumerate(DURATION_BUCKETS):
+        if seconds <= upper:
+            return index
+
+
+def _day_rows(day, users, now):
+    """FunnelDaily rows for one cohort day, from its FunnelUser rows"""
+    rows = []
+    for step in REPORT_STEPS:
+        column = f'{step}_at'
+        previous = PREVIOUS_STEP.get(step)
+        reached = [user for user in users if getattr(user, column)]
+        durations = []
+        if previous:
+            durations = sorted(
+                (getattr(user, column) - getattr(user, f'{previous}_at')).total_seconds()
+                for user in reached if getattr(user, f'{previous}_at')
+            )
+            durations = [seconds for seconds in durations if seconds >= 0]
+        histogram = [0] * len(DURATION_BUCKETS)
+        for seconds in durations:
+            histogram[_bucket(seconds)] += 1
+        rows.append({
+            'day': day,
+            'step': step,
+            'users': len(reached),
+            'converted': len(durations) if previous else len(reached),
+            'p50_seconds': _percentile(durations, 0.5) if durations else None,
+            'p90_seconds': _percentile(durations, 0.9) if durations else None,
+            'duration_histogram': json.dumps(histogram) if durations else None,
+            'updated_at': now,
+        })
+    return rows
+
+
+def _fold_events(session, events):
+    """
+    Folds a batch of events into funnel_user (earliest time per step wins)
+    and recomputes funnel_daily for every cohort day they touched. Runs in
+    one write unit, so concurrent aggregators see each other's results.
+    """
+    first_seen = defaultdict(dict)
+    for _, user_id, step, occurred_at in events:
+        seen = first_seen[user_id].get(step)
+        if seen is None or occurred_at < seen:
+            first_seen[user_id][step] = occurred_at
+
+    # Core rows, not ORM objects: the writer's session is shared with other units
+    funnel_users = FunnelUser.__table__
+    existing = {
+        user.user_id: user for user in
+        session.execute(select(funnel_users).where(funnel_users.c.user_id.in_(list(first_seen)))).all()
+    }
+    days = set()
+    rows = []
+    for user_id, steps in first_seen.items():
+        old = existing.get(user_id)
+        row = {'user_id': user_id}
+        for step in REPORT_STEPS:
+            column = f'{step}_at'
+            times = [value for value in (getattr(old, column, None), steps.get(step)) if value]
+            row[column] = min(times) if times else None
+        row['cohort_day'] = min(value for key, value in row.items() if key.endswith('_at') and value).date()
+        if old is not None:
+            days.add(old.cohort_day)
+        days.add(row['cohort_day'])
+        rows.append(row)
+
+    statement = sqlite_insert(funnel_users)
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={column: statement.excluded[column] for column in rows[0] if column != 'user_id'},
+        ),
+        rows,
+    )
+
+    now = datetime.utcnow()
+    cohort = defaultdict(list)
+    for user in session.execute(select(funnel_users).where(funnel_users.c.cohort_day.in_(days))).all():
+        cohort[user.cohort_day].append(user)
+    session.execute(delete(FunnelDaily).where(FunnelDaily.day.in_(days)))
+    daily = [row for day in sorted(days) for row in _day_rows(day, cohort[day], now)]
+    session.execute(insert(FunnelDaily), daily)
+    return days
+
+
+def aggregate_funnel(batch_size=5000, max_batches=None):
+    """
+    Incremental aggregation: reads events past the saved cursor in id
+    order, folds each batch into the aggregates and advances the cursor in
+    the same transaction. Idempotent, so every worker can run it.
+    Returns (events folded, cohort days refreshed).
+    """
+    from app.extensions import db
+
+    folded, refreshed, batches = 0, set(), 0
+    while max_batches is None or batches < max_batches:
+        cursor = db.session.execute(
+            select(FunnelCursor.last_event_id).where(FunnelCursor.name == CURSOR_NAME)
+        ).scalar() or 0
+        events = db.session.execute(
+            select(FunnelEvent.id, FunnelEvent.user_id, FunnelEvent.step, FunnelEvent.occurred_at)
+            .where(FunnelEvent.id > cursor).order_by(FunnelEvent.id).limit(batch_size)
+        ).all()
+        db.session.rollback()
+        if not events:
+            break
+        last_event_id = events[-1][0]
+
+        def fold(session):
+            saved = session.execute(
+                select(FunnelCursor.last_event_id).where(FunnelCursor.name == CURSOR_NAME)
+            ).scalar() or 0
+            if saved >= last_event_id:
+                return set()  # another worker folded this batch meanwhile
+            days = _fold_events(session, [event for event in events if event[0] > saved])
+            statement = sqlite_insert(FunnelCursor.__table__).values(
+                name=CURSOR_NAME, last_event_id=last_event_id, updated_at=datetime.utcnow()
+            )
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['name'],
+                set_={'last_event_id': statement.excluded.last_event_id, 'updated_at': statement.excluded.updated_at},
+            ))
+            return days
+
+        refreshed |= run_write(fold, name='funnel_aggregate')
+        folded += len(events)
+        batches += 1
+    return folded, refreshed
+
+
+def reset_funnel_aggregates():
+    """Drops the aggregates and the cursor, so the next run rebuilds them from every event"""
+    def reset(session):
+        session.execute(delete(FunnelDaily))
+        session.execute(delete(FunnelUser))
+        session.execute(delete(FunnelCursor).where(FunnelCursor.name == CURSOR_NAME))
+
+    run_write(reset, name='funnel_reset')
+
+
+# ---------------------- REPORT ----------------------
+def _histogram_percentile(histogram, fraction):
+    """Upper bound of the bucket holding the given fraction of a merged histogram"""
+    total = sum(histogram)
+    if not total:
+        return None
+    rank, seen = math.ceil(fraction * total), 0
+    for upper, count in zip(DURATION_BUCKETS, histogram):
+        seen += count
+        if seen >= rank:
+            return upper
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return '—'
+    if seconds == math.inf:
+        return f'> {format_duration(DURATION_BUCKETS[-2])}'
+    for unit, size in (('d', 86400), ('h', 3600), ('min', 60)):
+        if seconds >= size:
+            return f'{seconds / size:.1f} {unit}'.replace('.0 ', ' ')
+    return f'{seconds:.0f} s'
+
+
+def funnel_report(start, end):
+    """
+    Funnel for the cohorts that entered between `start` and `end` (dates,
+    inclusive), from funnel_daily only: users per step, conversion from the
+    previous step and from the first one, and time-between-steps
+    percentiles (merged from the daily histograms, so bucket-precise).
+    Returns (summary rows, daily rows).
+    """
+    from app.extensions import db
+
+    rows = db.session.execute(
+        select(FunnelDaily).where(FunnelDaily.day.between(start, end)).order_by(FunnelDaily.day)
+    ).scalars().all()
+
+    totals = {step: {'users': 0, 'converted': 0, 'histogram': [0] * len(DURATION_BUCKETS)} for step in REPORT_STEPS}
+    days = defaultdict(dict)
+    for row in rows:
+        if row.step not in totals:
+            continue
+        total = totals[row.step]
+        total['users'] += row.users
+        total['converted'] += row.converted
+        if row.duration_histogram:
+            total['histogram'] = [a + b for a, b in zip(total['histogram'], json.loads(row.duration_histogram))]
+        days[row.day][row.step] = row
+
+    first = totals[FUNNEL_STEPS[0]]['users'] or max((total['users'] for total in totals.values()), default=0)
+    summary = []
+    for step in REPORT_STEPS:
+        total = totals[step]
+        previous = PREVIOUS_STEP.get(step)
+        previous_users = totals[previous]['users'] if previous else None
+        summary.append({
+            'step': step,
+            'users': total['users'],
+            'from_previous': total['converted'] / previous_users if previous_users else None,
+            'from_start': total['users'] / first if first else None,
+            'p50': format_duration(_histogram_percentile(total['histogram'], 0.5)),
+            'p90': format_duration(_histogram_percentile(total['histogram'], 0.9)),
+        })
+
+    daily = []
+    for day in sorted(days, reverse=True):
+        steps = days[day]
+        daily.append({
+            'day': day,
+            'users': {step: steps[step].users if step in steps else 0 for step in REPORT_STEPS},
+            'p50': {step: format_duration(steps[step].p50_seconds) if step in steps else '—' for step in REPORT_STEPS},
+        })
+    return summary, daily
+
+
+def report_window(days):
+    end = datetime.utcnow().date()
+    return end - timedelta(days=days - 1), end
@@ -0,0 +1,313 @@
+import base64
+import functools
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import current_app, flash, g, make_response, request, session
+from markupsafe import Markup
+
+from utils.metrics_utils import Counter
+
+
+IDEMPOTENT_REQUESTS = Counter(
+    'idempotent_requests_total', 'State-changing POSTs by idempotency outcome', ['endpoint', 'outcome']
+)
+
+FORM_FIELD = '_idempotency_key'
+HEADER = 'Idempotency-Key'
+KEY_PATTERN = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+REPLAYED_HEADERS = ('Location', 'Content-Type', 'Retry-After')
+HASH_CHUNK = 1024 * 1024
+
+
+class SQLiteIdempotencyStore:
+    """
+    Completed responses to form submissions, keyed by the one-time token
+    embedded in the form. Kept in their own SQLite file so a double-tap
+    that lands on another gunicorn worker is still recognised.
+    A key is 'pending' while its first request runs, then 'done'; either
+    way it remembers the fingerprint of the body it was first used with.
+    """
+
+    def __init__(self, path, ttl=86400, pending_timeout=120):
+        self.path = path
+        self.ttl = ttl
+        self.pending_timeout = pending_timeout  # a worker died mid-request: let a retry run
+        self._local = threading.local()
+        self._claims = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+                " key TEXT PRIMARY KEY, state TEXT NOT NULL, response TEXT, updated_at REAL NOT NULL,"
+                " fingerprint TEXT)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(idempotency_keys)")}
+            if 'fingerprint' not in columns:  # store files created before fingerprints
+                conn.execute("ALTER TABLE idempotency_keys ADD COLUMN fingerprint TEXT")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key, fingerprint=None):
+        """
+        Returns ('claimed', None) if the caller should run the request,
+        ('done', response) for a completed one, ('pending', None), or
+        ('mismatch', None) when the key was first used with another body.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT state, response, updated_at, fingerprint FROM idempotency_keys WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[0] == 'pending' and row[2] < now - self.pending_timeout):
+                conn.execute(
+                    "INSERT OR REPLACE INTO idempotency_keys (key, state, response, updated_at, fingerprint)"
+                    " VALUES (?, 'pending', NULL, ?, ?)", (key, now, fingerprint)
+                )
+                outcome = ('claimed', None)
+            elif row[3] != fingerprint:
+                outcome = ('mismatch', None)
+            elif row[0] == 'done':
+                outcome = ('done', json.loads(row[1]))
+            else:
+                outcome = ('pending', None)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._claims += 1
+        if self._claims % 1000 == 0:
+            self.prune()
+        return outcome
+
+    def state(self, key):
+        """The key's state without taking the write lock, or None if it is unknown"""
+        row = self._connect().execute(
+            "SELECT state FROM idempotency_keys WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def complete(self, key, response):
+        self._connect().execute(
+            "UPDATE idempotency_keys SET state = 'done', response = ?, updated_at = ? WHERE key = ?",
+            (json.dumps(response), time.time(), key)
+        )
+
+    def release(self, key):
+        """Forgets a claim whose request failed, so the user can retry it"""
+        self._connect().execute("DELETE FROM idempotency_keys WHERE key = ?", (key,))
+
+    def prune(self):
+        self._connect().execute("DELETE FROM idempotency_keys WHERE updated_at < ?", (time.time() - self.ttl,))
+
+
+class MemoryIdempotencyStore:
+    """
+    Process-local stand-in for SQLiteIdempotencyStore.
+    Only suitable for a single worker (development, tests).
+    """
+
+    def __init__(self, ttl=86400, pending_timeout=120):
+        self.ttl = ttl
+        self.pending_timeout = pending_timeout
+        self._lock = threading.Lock()
+        self._keys = {}  # key -> [state, response, updated_at, fingerprint]
+
+    def claim(self, key, fingerprint=None):
+        now = time.time()
+        with self._lock:
+            entry = self._keys.get(key)
+            if entry is None or (entry[0] == 'pending' and entry[2] < now - self.pending_timeout):
+                self._keys[key] = ['pending', None, now, fingerprint]
+                return 'claimed', None
+            if entry[3] != fingerprint:
+                return 'mismatch', None
+            if entry[0] == 'done':
+                return 'done', entry[1]
+            return 'pending', None
+
+    def state(self, key):
+        with self._lock:
+            entry = self._keys.get(key)
+            return entry[0] if entry else None
+
+    def complete(self, key, response):
+        with self._lock:
+            entry = self._keys.get(key)
+            self._keys[key] = ['done', response, time.time(), entry[3] if entry else None]
+
+    def release(self, key):
+        with self._lock:
+            self._keys.pop(key, None)
+
+    def prune(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for key in [k for k, entry in self._keys.items() if entry[2] < cutoff]:
+                del self._keys[key]
+
+
+def init_idempotency(app):
+    """
+    Creates the store named by IDEMPOTENCY_STORAGE_URL ('memory://' or
+    'sqlite:///<path>') and registers `idempotency_field()` for templates.
+    """
+    url = app.config.get('IDEMPOTENCY_STORAGE_URL', 'memory://')
+    ttl = app.config.get('IDEMPOTENCY_TTL', 86400)
+    if url.startswith('sqlite:///'):
+        store = SQLiteIdempotencyStore(url[len('sqlite:///'):], ttl=ttl)
+    else:
+        store = MemoryIdempotencyStore(ttl=ttl)
+    app.extensions['idempotency'] = store
+    app.jinja_env.globals['idempotency_field'] = idempotency_field
+    app.after_request(_no_store_tokens)
+    return store
+
+
+def idempotency_field():
+    """Hidden input carrying a fresh one-time token; put one in every state-changing form"""
+    g.idempotency_token_rendered = True
+    return Markup(f'<input type="hidden" name="{FORM_FIELD}" value="{uuid.uuid4().hex}">')
+
+
+def _no_store_tokens(response):
+    """
+    after_request: a page carrying a token must not come back from the
+    browser cache (Back button, 304), or its next submission would reuse
+    the token of one already made.
+    """
+    if g.get('idempotency_token_rendered'):
+        response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def _request_key():
+    """The submitted token, scoped to the endpoint and the user; None when absent or malformed"""
+    token = request.headers.get(HEADER) or request.form.get(FORM_FIELD)
+    if not token or not KEY_PATTERN.match(token):
+        return None
+    return f"{request.endpoint}:{session.get('user_id') or 'anon'}:{token}"
+
+
+def _request_fingerprint():
+    """
+    SHA-256 over the submitted form fields (minus the token) and uploaded
+    files, so a token reused with an edited form is told apart from a
+    double-tap.
+    """
+    digest = hashlib.sha256()
+    if request.mimetype in ('application/x-www-form-urlencoded', 'multipart/form-data'):
+        fields = sorted((name, value) for name, value in request.form.items(multi=True) if name != FORM_FIELD)
+        digest.update(json.dumps(fields).encode('utf-8'))
+        for name, upload in sorted(request.files.items(multi=True), key=lambda item: (item[0], item[1].filename or '')):
+            digest.update(json.dumps([name, upload.filename]).encode('utf-8'))
+            for chunk in iter(lambda: upload.stream.read(HASH_CHUNK), b''):
+                digest.update(chunk)
+            upload.stream.seek(0)  # the view reads it again
+    else:
+        digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _record(response, flashes):
+    """What a replay needs: status, a few headers, a bounded body and the messages flashed"""
+    max_body = current_app.config.get('IDEMPOTENCY_MAX_BODY', 65536)
+    body = b'' if response.is_streamed else response.get_data()
+    if len(body) > max_body:
+        body = b''
+    return {
+        'status': response.status_code,
+        'headers': [[name, response.headers[name]] for name in REPLAYED_HEADERS if name in response.headers],
+        'body': base64.b64encode(body).decode('ascii'),
+        'flashes': flashes,
+    }
+
+
+def _replay(record):
+    pending = [tuple(item) for item in session.get('_flashes', [])]
+    for category, message in record['flashes']:
+        if (category, message) not in pending:  # the first response's cookie may have arrived after all
+            flash(message, category)
+    response = make_response(base64.b64decode(record['body']), record['status'])
+    for name, value in record['headers']:
+        response.headers[name] = value
+    response.headers['Idempotent-Replay'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """
+    Runs a state-changing POST at most once per form token. A replay of
+    a completed submission gets the stored response (and its flash
+    messages) without running the view again; a replay that arrives while
+    the first request is still running waits for it, up to IDEMPOTENCY_WAIT
+    seconds, then gets 409 with Retry-After. A token resubmitted with a
+    different body gets 422 instead of the first response. Errors (5xx,
+    429) release the token so the user can retry. Requests without a
+    token run as before.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'POST':
+            return view(*args, **kwargs)
+
+        endpoint = request.endpoint or view.__name__
+        key = _request_key()
+        if key is None:
+            IDEMPOTENT_REQUESTS.inc(endpoint=endpoint, outcome='no_key')
+            return view(*args, **kwargs)
+
+        store = current_app.extensions['idempotency']
+        fingerprint = _request_fingerprint()
+        deadline = time.monotonic() + current_app.config.get('IDEMPOTENCY_WAIT', 2)
+        state, record = store.claim(key, fingerprint)
+        delay = 0.05
+        while state == 'pending' and time.monotonic() + delay < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            if store.state(key) != 'pending':  # cheap read; only claim (write lock) once it settles
+                state, record = store.claim(key, fingerprint)
+
+        if state == 'mismatch':
+            IDEMPOTENT_REQUESTS.inc(endpoint=endpoint, outcome='mismatch')
+            return ("This form was already submitted with different values. "
+                    "Reload the page to submit your changes."), 422
+        if state == 'done':
+            IDEMPOTENT_REQUESTS.inc(endpoint=endpoint, outcome='replayed')
+            return _replay(record)
+        if state == 'pending':
+            IDEMPOTENT_REQUESTS.inc(endpoint=endpoint, outcome='in_progress')
+            return "This form is still being processed. Please wait a moment and reload.", 409, {'Retry-After': '1'}
+
+        flashed_before = len(session.get('_flashes', []))
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            store.release(key)
+            raise
+
+        if response.status_code >= 500 or response.status_code == 429:
+            store.release(key)
+            IDEMPOTENT_REQUESTS.inc(endpoint=endpoint, outcome='released')
+            return response
+
+        flashes = [list(item) for item in session.get('_flashes', [])[flashed_before:]]
+        store.complete(key, _record(response, flashes))
+        IDEMPOTENT_REQUESTS.inc(endpoint=endpoint, outcome='first')
+        return response
+    return wrapper
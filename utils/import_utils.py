@@ -0,0 +1,216 @@
+import csv
+import re
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.models.application import Application
+from app.models.user import User
+from utils.metrics_utils import Counter
+from utils.outbox_utils import queue_emails
+from utils.user_lifecycle_utils import UNUSABLE_PASSWORD
+from utils.write_queue_utils import run_write
+
+
+IMPORT_ROWS = Counter(
+    'applicant_import_rows_total', 'CSV rows read by applicant imports, by outcome', ['outcome']
+)
+
+REQUIRED_COLUMNS = ('email', 'full_name')
+APPLICATION_COLUMNS = ('passport_status', 'phone_number', 'date_of_birth',
+                       'education_level', 'occupation', 'marital_status')
+
+# Choices offered on wizard steps 1 and 2, matched case-insensitively
+PASSPORT_STATUSES = {'valid': 'valid', 'yes': 'valid', 'no_passport': 'no_passport', 'no': 'no_passport'}
+EDUCATION_LEVELS = ["High School", "Diploma", "Bachelor's Degree", "Master's Degree", "PhD"]
+MARITAL_STATUSES = ["Single", "Married", "Divorced", "Widowed"]
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d.%m.%Y')
+
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+PHONE_PATTERN = re.compile(r'^\+?\d{7,15}$')
+
+
+class RowError(ValueError):
+    """A CSV row that cannot be imported; the message goes to the error file"""
+
+
+class ImportReport:
+    """Counts of one import run"""
+
+    def __init__(self):
+        self.rows = 0
+        self.users = 0
+        self.applications = 0
+        self.invites = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def _header_key(name):
+    return re.sub(r'[\s-]+', '_', (name or '').strip().lower())
+
+
+def _choice(value, choices, label):
+    for choice in choices:
+        if value.lower() == choice.lower():
+            return choice
+    raise RowError(f"Unknown {label} '{value}' (expected one of: {', '.join(choices)}).")
+
+
+def normalize_row(row):
+    """Validates one CSV row (keys already normalized) and returns the values to insert"""
+    values = {key: ' '.join((row.get(key) or '').split()) for key in REQUIRED_COLUMNS + APPLICATION_COLUMNS}
+
+    email = values['email'].lower()
+    if not EMAIL_PATTERN.match(email) or len(email) > 120:
+        raise RowError("Missing or invalid email address.")
+    if not values['full_name'] or len(values['full_name']) > 120:
+        raise RowError("Full name is required (at most 120 characters).")
+
+    application = {}
+    if values['passport_status']:
+        status = PASSPORT_STATUSES.get(values['passport_status'].lower().replace(' ', '_'))
+        if status is None:
+            raise RowError(f"Unknown passport status '{values['passport_status']}' (use valid or no_passport).")
+        application['passport_status'] = status
+    if values['phone_number']:
+        phone = re.sub(r'[\s().-]', '', values['phone_number'])
+        if not PHONE_PATTERN.match(phone):
+            raise RowError(f"Invalid phone number '{values['phone_number']}'.")
+        application['phone_number'] = phone
+    if values['date_of_birth']:
+        for date_format in DATE_FORMATS:
+            try:
+                application['date_of_birth'] = datetime.strptime(values['date_of_birth'], date_format).date()
+                break
+            except ValueError:
+                continue
+        else:
+            raise RowError(f"Invalid date of birth '{values['date_of_birth']}' (use YYYY-MM-DD).")
+    if values['education_level']:
+        application['education_level'] = _choice(values['education_level'], EDUCATION_LEVELS, 'education level')
+    if values['occupation']:
+        application['occupation'] = values['occupation'][:100]
+    if values['marital_status']:
+        application['marital_status'] = _choice(values['marital_status'], MARITAL_STATUSES, 'marital status')
+
+    if application and 'passport_status' not in application:
+        raise RowError("Application details need a passport status too.")
+    return {'email': email, 'full_name': values['full_name']}, application
+
+
+def _existing_emails():
+    """Every registered address, lower-cased, for set lookups while streaming"""
+    from app.extensions import db
+
+    emails = {email.lower() for email in db.session.execute(select(User.email)).scalars()}
+    db.session.rollback()  # don't hold a read snapshot while the batches are written
+    return emails
+
+
+def _insert_batch(batch, send_invites):
+    """
+    Inserts one batch of (line, user, application) in a single transaction.
+    Returns (users created, applications created, invites queued, lines lost to a
+    concurrent registration).
+    """
+    def import_users(session):
+        # executemany with RETURNING: one cached statement, not a 500-row VALUES to compile per batch
+        created = dict(session.execute(
+            sqlite_insert(User.__table__).on_conflict_do_nothing(index_elements=['email'])
+            .returning(User.__table__.c.email, User.__table__.c.id),
+            [{**user, 'password_hash': UNUSABLE_PASSWORD, 'is_admin': False} for _, user, _ in batch],
+        ).all())
+
+        applications = [
+            {'user_id': created[user['email']], **application}
+            for _, user, application in batch if application and user['email'] in created
+        ]
+        if applications:
+            session.execute(insert(Application), applications)
+
+        invites = 0
+        if send_invites:
+            invites = queue_emails(session, 'password_setup', list(created.items()))
+        taken = [line for line, user, _ in batch if user['email'] not in created]
+        return len(created), len(applications), invites, taken
+
+    return run_write(import_users, name='applicant_import')
+
+
+def import_applicants(stream, error_file, batch_size=500, send_invites=True, progress=None):
+    """
+    Streams a CSV of applicants (`email`, `full_name`, optionally the wizard's
+    step 1-2 fields) into users with an unusable password plus a starter
+    application when passport status is given. Rows are validated and
+    deduplicated against existing accounts and earlier rows, then inserted
+    `batch_size` at a time; password-setup invitations go to the email
+    outbox. Rejected rows are written to `error_file` as CSV with the reason.
+    """
+    report = ImportReport()
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        raise RowError("The file is empty.")
+    keys = [_header_key(name) for name in header]
+    missing = [column for column in REQUIRED_COLUMNS if column not in keys]
+    if missing:
+        raise RowError(f"Missing column(s): {', '.join(missing)}.")
+
+    errors = csv.writer(error_file)
+    errors.writerow(['line', 'error'] + header)
+    registered = _existing_emails()
+    seen = set()
+    pending_lines = {}
+    batch = []
+
+    def reject(line, message, cells):
+        errors.writerow([line, message] + cells)
+        report.skipped += 1
+        IMPORT_ROWS.inc(outcome='rejected')
+
+    def flush():
+        users, applications, invites, taken = _insert_batch(batch, send_invites)
+        report.users += users
+        report.applications += applications
+        report.invites += invites
+        IMPORT_ROWS.inc(users, outcome='imported')
+        for line in taken:
+            reject(line, "Email registered while the import was running.", pending_lines[line])
+        pending_lines.clear()
+        batch.clear()
+        report.elapsed = time.perf_counter() - report.started
+        if progress:
+            progress(report)
+
+    for cells in reader:
+        line = reader.line_num  # physical line, so quoted newlines do not shift the numbers
+        if not any(cell.strip() for cell in cells):
+            continue
+        report.rows += 1
+        try:
+            user, application = normalize_row(dict(zip(keys, cells)))
+            if user['email'] in registered:
+                raise RowError("Email already registered.")
+            if user['email'] in seen:
+                raise RowError("Email repeated in this file (first occurrence imported).")
+        except RowError as e:
+            reject(line, str(e), cells)
+            continue
+        seen.add(user['email'])
+        batch.append((line, user, application))
+        pending_lines[line] = cells
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+    report.elapsed = time.perf_counter() - report.started
+    return report
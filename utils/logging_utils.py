@@ -0,0 +1,271 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import time
+import traceback
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+from flask import current_app, g, has_request_context, request
+from flask.logging import default_handler
+
+from utils.metrics_utils import Counter, current_scope
+from utils.tracing_utils import current_trace_ids
+
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+LOG_RECORDS_DROPPED = Counter(
+    'log_records_dropped_total', 'Log records dropped because the log queue was full', ['level']
+)
+
+# LogRecord attributes that are not `extra=` fields
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+# Set by ContextFilter; written as their own keys, not as extras
+_CONTEXT_ATTRS = ('request_id', 'trace_id', 'span_id', 'user_id', 'route', 'job', 'sample_rate')
+
+_listener = None
+
+
+# ---------------------- RECORD CONTEXT ----------------------
+class ContextFilter(logging.Filter):
+    """
+    Stamps each record with the request (id, route, user) or scheduler job
+    it was logged from, and the current trace span. Runs on the logging thread before the record is
+    queued, because the request context does not exist on the listener's.
+    """
+
+    def filter(self, record):
+        record.trace_id, record.span_id = current_trace_ids()
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.trace_id = record.trace_id or g.get('trace_id')
+            record.route = request.url_rule.rule if request.url_rule else request.path
+            user = g.get('_login_user')  # only if flask-login already loaded it: never query from a log call
+            record.user_id = getattr(user, 'id', None)
+        else:
+            scope = current_scope.get()
+            record.job = scope.name if scope is not None else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a share of the records below INFO (LOG_DEBUG_SAMPLE_RATE), or
+    the share a call asks for with extra={'sample_rate': 0.01}. Inside a
+    request the decision follows the request id, so a sampled request
+    keeps all of its debug lines. Kept records carry their rate, so
+    counts can be scaled back up.
+    """
+
+    def __init__(self, debug_rate):
+        super().__init__()
+        self.debug_rate = debug_rate
+
+    def filter(self, record):
+        rate = getattr(record, 'sample_rate', None)
+        if rate is None:
+            if record.levelno >= logging.INFO:
+                return True
+            rate = record.sample_rate = self.debug_rate
+        if rate >= 1:
+            return True
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            return zlib.crc32(request_id.encode()) / 2 ** 32 < rate
+        return random.random() < rate
+
+
+# ---------------------- FORMATTING ----------------------
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, context, extras"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name in _CONTEXT_ATTRS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRS and name not in _CONTEXT_ATTRS and not name.startswith('_'):
+                entry[name] = value
+        entry['pid'] = record.process
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread. The stock
+    prepare() runs the formatter on the calling thread; here only the
+    message is interpolated (args may be mutated after the call returns)
+    and tracebacks rendered. A full queue drops the record instead of
+    blocking the request.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)  # other handlers may still see the original
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(level=record.levelname)
+
+
+# ---------------------- SETUP ----------------------
+def build_handlers(config):
+    """The handlers that do the actual I/O: stderr (LOG_STDERR) and/or LOG_FILE"""
+    formatter = JsonFormatter() if config['LOG_FORMAT'] == 'json' else logging.Formatter(
+        '[%(asctime)s] %(levelname)s in %(module)s: %(message)s'
+    )
+    handlers = [logging.StreamHandler(sys.stderr)] if config['LOG_STDERR'] else []
+    if config['LOG_FILE']:
+        os.makedirs(os.path.dirname(os.path.abspath(config['LOG_FILE'])), exist_ok=True)
+        handlers.append(logging.handlers.RotatingFileHandler(
+            config['LOG_FILE'], maxBytes=config['LOG_FILE_MAX_BYTES'], backupCount=config['LOG_FILE_BACKUPS'],
+            encoding='utf-8',
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+class _Tee(logging.Handler):
+    """Synchronous fan-out to the handlers (LOG_MODE 'sync')"""
+
+    def __init__(self, handlers):
+        super().__init__()
+        self.handlers = handlers
+
+    def emit(self, record):
+        for handler in self.handlers:
+            handler.handle(record)
+
+    def close(self):
+        for handler in self.handlers:
+            handler.close()
+        super().close()
+
+
+def stop_logging():
+    """Stops the listener thread after it has written every queued record"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def configure_logging(app, mode=None):
+    """
+    Points app.logger (and its children) at the configured handlers.
+    mode 'queue' (LOG_MODE's default) hands records to a QueueListener
+    thread; 'sync' writes on the calling thread, for debugging and for
+    comparing the two with `flask bench --logging`.
+    """
+    global _listener
+    config = app.config
+    mode = mode or config['LOG_MODE']
+    stop_logging()
+    logger = app.logger
+    for handler in list(logger.handlers):
+        if getattr(handler, 'app_logging', False):
+            logger.removeHandler(handler)
+            handler.close()
+    logger.removeHandler(default_handler)
+    logger.setLevel(config['LOG_LEVEL'])
+
+    handlers = build_handlers(config)
+    if mode == 'queue':
+        handler = LazyQueueHandler(queue.Queue(config['LOG_QUEUE_SIZE']))
+        _listener = logging.handlers.QueueListener(handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+    else:
+        handler = _Tee(handlers)
+    handler.app_logging = True
+    handler.addFilter(ContextFilter())
+    handler.addFilter(SamplingFilter(config['LOG_DEBUG_SAMPLE_RATE']))
+    logger.addHandler(handler)
+    return handler
+
+
+# ---------------------- REQUEST LOG ----------------------
+def _assign_request_id():
+    incoming = request.headers.get(REQUEST_ID_HEADER, '')
+    g.request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+    g.log_start = time.perf_counter()
+    g.log_scope = current_scope.get()  # the request's SQL stats (init_metrics runs first)
+
+
+def _return_request_id(response):
+    g.log_status = response.status_code
+    if 'request_id' in g:
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+    return response
+
+
+def _log_request(exc=None):
+    start = g.pop('log_start', None)
+    if start is None:
+        return
+    duration = time.perf_counter() - start
+    status = g.pop('log_status', 500)
+    config = current_app.config
+    slow = duration >= config['LOG_SLOW_REQUEST_SECONDS']
+    rate = 1.0 if status >= 500 or slow else config['LOG_REQUEST_SAMPLE_RATE']
+    if rate <= 0:
+        return
+    scope = g.pop('log_scope', None)
+    current_app.logger.getChild('request').log(
+        logging.WARNING if status >= 500 or slow else logging.INFO,
+        '%s %s %s %.1fms', request.method, request.path, status, duration * 1000,
+        extra={
+            'method': request.method,
+            'status': status,
+            'duration_ms': round(duration * 1000, 2),
+            'queries': scope.queries if scope is not None else None,
+            'db_ms': round(scope.db_time * 1000, 2) if scope is not None else None,
+            'sample_rate': rate,
+        },
+    )
+
+
+def init_logging(app):
+    """
+    Structured, asynchronous logging: records from app.logger are stamped
+    with the request id, route, user and job, queued, and formatted as
+    JSON lines (LOG_FORMAT) and written by a background thread. Each
+    request also logs one summary line with its status, duration and SQL
+    count, and echoes its X-Request-ID. Call after init_metrics.
+    """
+    configure_logging(app)
+    atexit.register(stop_logging)
+    app.before_request(_assign_request_id)
+    app.after_request(_return_request_id)
+    if app.config['LOG_REQUESTS']:
+        app.teardown_request(_log_request)
@@ -0,0 +1,440 @@
+import atexit
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+
+from flask import g, request
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+# ---------------------- METRIC TYPES ----------------------
+class Metric:
+    """Base class: a named family of samples keyed by label values"""
+    type_name = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._samples = {}
+        REGISTRY.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._samples.items()]
+
+
+class Counter(Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    `multiprocess_mode` decides how values from several workers combine:
+    'sum' (live workers only), 'max' or 'min'.
+    """
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), multiprocess_mode='max'):
+        super().__init__(name, documentation, labelnames)
+        self.multiprocess_mode = multiprocess_mode
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._samples[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            sample = self._samples.get(key)
+            if sample is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                sample = self._samples[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample[0][i] += 1
+                    break
+            else:
+                sample[0][-1] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), [list(v[0]), v[1], v[2]]] for key, v in self._samples.items()]
+
+
+class Registry:
+    """
+    Holds every metric of this process. Each gunicorn worker dumps its
+    registry to METRICS_DIR/<pid>.json; the /metrics endpoint merges them.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.directory = None
+        self.flush_interval = 1.0
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+        self.collectors = {}  # name -> callable returning extra metric families at scrape time
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def dump(self):
+        return {
+            name: {'type': metric.type_name, 'samples': metric.snapshot()}
+            for name, metric in self.metrics.items()
+        }
+
+    def flush(self, force=False):
+        """Writes this process's samples to disk (at most once per flush_interval)"""
+        if not self.directory:
+            return
+        now = time.time()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_flush = now
+            path = os.path.join(self.directory, f"{os.getpid()}.json")
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'pid': os.getpid(), 'metrics': self.dump()}, f)
+            os.replace(tmp_path, path)
+        finally:
+            self._flush_lock.release()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+REGISTRY = Registry()
+
+
+# ---------------------- STANDARD METRICS ----------------------
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by blueprint endpoint',
+    ['endpoint', 'method', 'status']
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Requests currently being handled', multiprocess_mode='sum'
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL statements issued per request',
+    ['endpoint'], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    'http_request_db_seconds', 'Time spent in SQL per request', ['endpoint']
+)
+TEMPLATE_RENDER_TIME = Histogram(
+    'template_render_seconds', 'Jinja render time by template', ['template']
+)
+SMTP_SEND_TIME = Histogram(
+    'smtp_send_seconds', 'Time spent sending one email', ['outcome']
+)
+JOB_DURATION = Histogram(
+    'scheduler_job_duration_seconds', 'Scheduler job run time', ['job'],
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+)
+JOB_RUNS = Counter(
+    'scheduler_job_runs_total', 'Scheduler job runs by outcome', ['job', 'outcome']
+)
+JOB_QUERIES = Counter(
+    'scheduler_job_db_queries_total', 'SQL statements issued by scheduler jobs', ['job']
+)
+DB_LOCK_ERRORS = Counter(
+    'db_lock_errors_total', 'SQLite "database is locked" errors by endpoint or job', ['scope']
+)
+JOB_LAST_SUCCESS = Gauge(
+    'scheduler_job_last_success_timestamp_seconds', 'Unix time of the last successful run', ['job']
+)
+JOB_LAST_DURATION = Gauge(
+    'scheduler_job_last_duration_seconds', 'Run time of the most recent run', ['job']
+)
+
+
+# ---------------------- PER-REQUEST / PER-JOB STATS ----------------------
+class ScopeStats:
+    """SQL statistics for one request or one scheduler job run"""
+
+    record_statements = False  # switched on by the query audit
+    close_hooks = []           # callables(scope) run when a scope ends
+
+    def __init__(self, name):
+        self.name = name
+        self.queries = 0
+        self.db_time = 0.0
+        # (statement, parameters, elapsed, perf_counter start) while recording
+        self.statements = [] if self.record_statements else None
+
+    def close(self):
+        for hook in self.close_hooks:
+            hook(self)
+
+    def merge_into(self, parent):
+        """Adds this scope's totals to an enclosing scope"""
+        parent.queries += self.queries
+        parent.db_time += self.db_time
+        if parent.statements is not None and self.statements is not None:
+            parent.statements.extend(self.statements)
+
+
+current_scope = contextvars.ContextVar('metrics_scope', default=None)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_start_time'].pop()
+    scope = current_scope.get()
+    if scope is not None:
+        elapsed = time.perf_counter() - started
+        scope.queries += 1
+        scope.db_time += elapsed
+        if scope.statements is not None:
+            scope.statements.append((statement, parameters, elapsed, started))
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(exception_context):
+    # after_cursor_execute never fires for a failed statement
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_start_time'):
+        conn.info['query_start_time'].pop()
+
+    if 'database is locked' in str(exception_context.original_exception):
+        scope = current_scope.get()
+        DB_LOCK_ERRORS.inc(scope=scope.name if scope is not None else 'unscoped')
+
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_parent_scope = current_scope.get()  # e.g. a benchmark's audit_queries()
+    g.metrics_scope_token = current_scope.set(ScopeStats(request.endpoint or 'unmatched'))
+    REQUESTS_IN_FLIGHT.inc()
+
+
+def _after_request(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _teardown_request(exc=None):
+    start = g.pop('metrics_start', None)
+    token = g.pop('metrics_scope_token', None)
+    if start is None or token is None:
+        return
+    scope = current_scope.get()
+    current_scope.reset(token)
+    REQUESTS_IN_FLIGHT.dec()
+
+    status = g.pop('metrics_status', 500)
+    REQUEST_LATENCY.observe(
+        time.perf_counter() - start, endpoint=scope.name, method=request.method, status=status
+    )
+    REQUEST_QUERIES.observe(scope.queries, endpoint=scope.name)
+    REQUEST_DB_TIME.observe(scope.db_time, endpoint=scope.name)
+    scope.close()
+    parent = g.pop('metrics_parent_scope', None)
+    if parent is not None:
+        scope.merge_into(parent)
+    REGISTRY.flush()
+
+
+def _before_render(sender, template, context, **extra):
+    g.setdefault('template_render_starts', []).append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    starts = g.get('template_render_starts')
+    if starts:
+        TEMPLATE_RENDER_TIME.observe(time.perf_counter() - starts.pop(), template=template.name or 'string')
+
+
+def track_job(name):
+    """
+    Decorator for scheduler jobs: records duration, outcome and SQL count,
+    and traces each run (utils/tracing_utils.py).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            from utils.tracing_utils import span
+
+            parent = current_scope.get()
+            token = current_scope.set(ScopeStats(name))
+            start = time.perf_counter()
+            outcome = 'error'
+            try:
+                with span(f'job {name}', root=True, **{'job.name': name}):  # a trace of its own
+                    result = func(*args, **kwargs)
+                outcome = 'success'
+                return result
+            finally:
+                elapsed = time.perf_counter() - start
+                scope = current_scope.get()
+                current_scope.reset(token)
+                JOB_DURATION.observe(elapsed, job=name)
+                JOB_RUNS.inc(job=name, outcome=outcome)
+                JOB_QUERIES.inc(scope.queries, job=name)
+                scope.close()
+                if parent is not None:
+                    scope.merge_into(parent)
+                JOB_LAST_DURATION.set(elapsed, job=name)
+                if outcome == 'success':
+                    JOB_LAST_SUCCESS.set(time.time(), job=name)
+                REGISTRY.flush(force=True)
+        return wrapper
+    return decorator
+
+
+# ---------------------- EXPOSITION ----------------------
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _merge(dumps, live_pids, pids_per_dump):
+    """Combines per-worker samples into {name: {label_key: value}}"""
+    merged = {}
+    for dump, pid in zip(dumps, pids_per_dump):
+        for name, family in dump.items():
+            metric = REGISTRY.metrics.get(name)
+            if metric is None:
+                continue
+            target = merged.setdefault(name, {})
+            for labels, value in family['samples']:
+                key = tuple(labels)
+                if isinstance(metric, Histogram):
+                    if key not in target:
+                        target[key] = [[0] * len(value[0]), 0.0, 0]
+                    current = target[key]
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+                    current[2] += value[2]
+                elif isinstance(metric, Gauge) and metric.multiprocess_mode != 'sum':
+                    pick = max if metric.multiprocess_mode == 'max' else min
+                    target[key] = pick(target[key], value) if key in target else value
+                elif isinstance(metric, Gauge):
+                    if pid in live_pids:
+                        target[key] = target.get(key, 0) + value
+                else:
+                    target[key] = target.get(key, 0) + value
+    return merged
+
+
+def render_prometheus():
+    """Prometheus text exposition format (version 0.0.4)"""
+    dumps, pids = [], []
+    if REGISTRY.directory:
+        REGISTRY.flush(force=True)
+        for filename in sorted(os.listdir(REGISTRY.directory)):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(REGISTRY.directory, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            dumps.append(data['metrics'])
+            pids.append(data['pid'])
+    else:
+        dumps, pids = [REGISTRY.dump()], [os.getpid()]
+    live_pids = {pid for pid in pids if _pid_alive(pid)}
+
+    merged = _merge(dumps, live_pids, pids)
+    lines = []
+    for name, metric in REGISTRY.metrics.items():
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.type_name}')
+        for key, value in sorted(merged.get(name, {}).items()):
+            if isinstance(metric, Histogram):
+                cumulative = 0
+                for bound, count in zip(list(metric.buckets) + ['+Inf'], value[0]):
+                    cumulative += count
+                    labels = _format_labels(metric.labelnames, key, [('le', bound)])
+                    lines.append(f'{name}_bucket{labels} {cumulative}')
+                labels = _format_labels(metric.labelnames, key)
+                lines.append(f'{name}_sum{labels} {value[1]}')
+                lines.append(f'{name}_count{labels} {value[2]}')
+            else:
+                lines.append(f'{name}{_format_labels(metric.labelnames, key)} {value}')
+
+    for collector in REGISTRY.collectors.values():
+        for name, type_name, documentation, samples in collector():
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {type_name}')
+            for labels, value in samples:
+                lines.append(f'{name}{_format_labels(labels.keys(), labels.values())} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def init_metrics(app):
+    """
+    Installs request hooks and template signals, and points the registry
+    at METRICS_DIR so samples from every gunicorn worker can be merged.
+    Clear METRICS_DIR when the whole server restarts.
+    """
+    REGISTRY.directory = app.config.get('METRICS_DIR')
+    REGISTRY.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 1.0)
+    if REGISTRY.directory:
+        os.makedirs(REGISTRY.directory, exist_ok=True)
+        atexit.register(REGISTRY.flush, force=True)
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+
+from flask import current_app, render_template, url_for
+from sqlalchemy import and_, insert, or_, select, update
+
+from app.models.email_outbox import OutboxEmail
+from app.models.user import User
+from utils.email_utils import send_email
+from utils.metrics_utils import Counter
+from utils.token_utils import generate_setup_token
+from utils.write_queue_utils import run_write
+
+
+OUTBOX_EMAILS = Counter(
+    'email_outbox_total', 'Outbox emails by kind and delivery outcome', ['kind', 'outcome']
+)
+
+
+# ---------------------- QUEUEING ----------------------
+def queue_emails(session, kind, recipients):
+    """
+    Adds emails to the outbox inside the caller's write unit, so they are
+    only sent if that transaction commits. `recipients` is [(email, user_id)].
+    """
+    rows = [{'kind': kind, 'recipient': email, 'user_id': user_id} for email, user_id in recipients]
+    if rows:
+        session.execute(insert(OutboxEmail), rows)
+        OUTBOX_EMAILS.inc(len(rows), kind=kind, outcome='queued')
+    return len(rows)
+
+
+# ---------------------- RENDERERS ----------------------
+def _external_url(endpoint, **values):
+    """Absolute link for emails built outside a request (PUBLIC_BASE_URL)"""
+    with current_app.test_request_context(base_url=current_app.config['PUBLIC_BASE_URL']):
+        return url_for(endpoint, _external=True, **values)
+
+
+def render_password_setup(user):
+    """Invitation for an account created by an admin import: choose a password"""
+    setup_url = _external_url('auth.reset_password', token=generate_setup_token(user))
+    subject = "👋 Your Work Abroad account is ready"
+    text_body = f"""Hello {user.full_name},
+
+An account has been created for you on the Work Abroad platform.
+
+Choose your password here: {setup_url}
+
+The link is valid for {current_app.config['PASSWORD_SETUP_TOKEN_MAX_AGE'] // 86400} days.
+
+- Work Abroad Team
+"""
+    html_body = render_template("emails/password_setup_email.html", full_name=user.full_name, setup_url=setup_url)
+    return subject, text_body, html_body
+
+
+# kind -> renderer(user) returning (subject, text, html)
+OUTBOX_RENDERERS = {
+    'password_setup': render_password_setup,
+}
+
+
+# ---------------------- DELIVERY ----------------------
+def claim_outbox(limit):
+    """
+    Takes up to `limit` due emails (plus ones whose sender died mid-claim)
+    in one UPDATE … RETURNING, so two workers never send the same row.
+    Returns [(id, kind, recipient, user_id, attempts)].
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=current_app.config['OUTBOX_CLAIM_SECONDS'])
+    due = (
+        select(OutboxEmail.id)
+        .where(or_(
+            and_(OutboxEmail.status == 'pending', OutboxEmail.next_attempt_at <= now),
+            and_(OutboxEmail.status == 'sending', OutboxEmail.claimed_at < stale),
+        ))
+        .order_by(OutboxEmail.id)
+        .limit(limit)
+    )
+
+    def claim(session):
+        return [tuple(row) for row in session.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.id.in_(due.scalar_subquery()))
+            .values(status='sending', claimed_at=now, attempts=OutboxEmail.attempts + 1)
+            .returning(OutboxEmail.id, OutboxEmail.kind, OutboxEmail.recipient,
+                       OutboxEmail.user_id, OutboxEmail.attempts)
+            .execution_options(synchronize_session=False)
+        ).all()]
+
+    return run_write(claim, name='outbox_claim')
+
+
+def _retry_delay(attempts):
+    """1, 2, 4 … minutes between attempts, capped at an hour"""
+    return timedelta(minutes=min(2 ** (attempts - 1), 60))
+
+
+def deliver_outbox(limit=50):
+    """Sends one batch of due emails and records each outcome. Returns the number sent."""
+    claimed = claim_outbox(limit)
+    if not claimed:
+        return 0
+
+    user_ids = {user_id for _, _, _, user_id, _ in claimed if user_id}
+    users = {user.id: user for user in User.query.filter(User.id.in_(user_ids)).all()}
+    max_attempts = current_app.config['OUTBOX_MAX_ATTEMPTS']
+    results = []
+    for email_id, kind, recipient, user_id, attempts in claimed:
+        renderer = OUTBOX_RENDERERS.get(kind)
+        user = users.get(user_id)
+        if renderer is None or user is None or user.email != recipient:
+            # Unknown kind, or the user was deleted/anonymized since: nothing to send
+            results.append((email_id, 'cancelled', None, None))
+            continue
+        subject, text_body, html_body = renderer(user)
+        success, message = send_email(subject, [recipient], text_body, html=html_body)
+        if success:
+            results.append((email_id, 'sent', None, None))
+        elif attempts >= max_attempts:
+            results.append((email_id, 'failed', message, None))
+        else:
+            results.append((email_id, 'pending', message, datetime.utcnow() + _retry_delay(attempts)))
+
+    now = datetime.utcnow()
+
+    def record_delivery(session):
+        for email_id, status, error, retry_at in results:
+            values = {'status': status, 'last_error': error, 'claimed_at': None}
+            if status == 'sent':
+                values['sent_at'] = now
+            if retry_at is not None:
+                values['next_attempt_at'] = retry_at
+            session.execute(update(OutboxEmail).where(OutboxEmail.id == email_id).values(**values))
+
+    run_write(record_delivery, name='outbox_record')
+
+    for (_, kind, _, _, _), (_, status, _, _) in zip(claimed, results):
+        OUTBOX_EMAILS.inc(kind=kind, outcome='retry' if status == 'pending' else status)
+    return sum(1 for _, status, _, _ in results if status == 'sent')
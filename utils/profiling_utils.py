@@ -0,0 +1,319 @@
+import collections
+import cProfile
+import glob
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import current_app, g, request
+from flask import before_render_template, template_rendered
+from flask_login import current_user
+from itsdangerous import URLSafeTimedSerializer
+
+from app.decorators import is_admin_user
+from app.models.user import User
+from utils.metrics_utils import current_scope
+
+
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_FLAG = '_profile'
+PROFILE_MODES = ('sample', 'cprofile')
+PROFILE_ID_PATTERN = re.compile(r'^[0-9]{8}-[0-9]{6}-[A-Za-z0-9_.]+-[0-9a-f]{8}$')
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..')) + os.sep
+
+
+def _short_path(filename):
+    """Project-relative or package-relative path, so frames stay readable"""
+    if filename.startswith(_PROJECT_ROOT):
+        return filename[len(_PROJECT_ROOT):]
+    _, marker, rest = filename.rpartition('site-packages' + os.sep)
+    return rest if marker else filename
+
+
+# ---------------------- SIGNED HEADER TOKENS ----------------------
+def generate_profile_token(user):
+    """Token an admin sends as `X-Profile-Token` to profile any request (curl, load tests)"""
+    s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
+    return s.dumps(user.id, salt='request-profile')
+
+
+def verify_profile_token(token):
+    """Returns the admin the token was issued to, or None"""
+    s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
+    try:
+        user_id = s.loads(token, salt='request-profile', max_age=current_app.config['PROFILE_TOKEN_MAX_AGE'])
+    except Exception:
+        return None
+    user = User.query.get(user_id)
+    return user if is_admin_user(user) else None
+
+
+# ---------------------- SAMPLING PROFILER ----------------------
+class StackSampler(threading.Thread):
+    """
+    Samples one thread's Python stack every `interval` seconds and counts
+    identical stacks, i.e. the "folded" format flamegraph.pl and
+    speedscope read. Only runs while a profiled request is in flight.
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='request-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._labels = {}
+        self._stopped = threading.Event()
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.stacks[';'.join(stack)] += 1
+                self.samples += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# ---------------------- REQUEST HOOKS ----------------------
+def _requested_mode():
+    """
+    Profiling mode asked for by this request, or None. An admin session may
+    use `?_profile=1|sample|cprofile`; any client may send a signed
+    `X-Profile-Token` header (mode from `X-Profile-Mode`).
+    """
+    token = request.headers.get(PROFILE_HEADER)
+    if token:
+        admin = verify_profile_token(token)
+        mode = request.headers.get('X-Profile-Mode', 'sample')
+    else:
+        mode = request.args.get(PROFILE_FLAG)
+        admin = current_user._get_current_object() if mode and is_admin_user() else None
+
+    if admin is None:
+        return None, None
+    return (mode if mode in PROFILE_MODES else 'sample'), admin
+
+
+def _start_profile():
+    # Fast path: unprofiled requests only pay for these two lookups
+    if PROFILE_HEADER not in request.headers and PROFILE_FLAG.encode() not in request.query_string:
+        return
+
+    # The authorization lookup is not part of what we are measuring
+    scope_token = current_scope.set(None)
+    try:
+        mode, admin = _requested_mode()
+    finally:
+        current_scope.reset(scope_token)
+    if mode is None:
+        return
+
+    scope = current_scope.get()
+    if scope is not None and scope.statements is None:
+        scope.statements = []
+
+    profile = {
+        'mode': mode,
+        'admin_id': admin.id,
+        'started': time.perf_counter(),
+        'templates': [],
+        'template_starts': [],
+        'status': 500,
+    }
+    if mode == 'cprofile':
+        profile['profiler'] = cProfile.Profile()
+        profile['profiler'].enable()
+    else:
+        profile['sampler'] = StackSampler(threading.get_ident(), current_app.config['PROFILE_SAMPLE_INTERVAL'])
+        profile['sampler'].start()
+    g.request_profile = profile
+
+
+def _record_status(response):
+    profile = g.get('request_profile')
+    if profile is not None:
+        profile['status'] = response.status_code
+    return response
+
+
+def _finish_profile(exc=None):
+    profile = g.pop('request_profile', None)
+    if profile is None:
+        return
+    finished = time.perf_counter()
+    if 'profiler' in profile:
+        profile['profiler'].disable()
+    else:
+        profile['sampler'].stop()
+
+    try:
+        save_profile(profile, current_scope.get(), finished)
+    except OSError as e:
+        current_app.logger.error(f"❌ Could not store request profile: {e}")
+
+
+def _before_render(sender, template, context, **extra):
+    profile = g.get('request_profile')
+    if profile is not None:
+        profile['template_starts'].append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    profile = g.get('request_profile')
+    if profile is not None and profile['template_starts']:
+        started = profile['template_starts'].pop()
+        profile['templates'].append({
+            'template': template.name or 'string',
+            'offset_ms': round((started - profile['started']) * 1000, 3),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+        })
+
+
+# ---------------------- STORAGE ----------------------
+def _function_table(profiler, limit=40):
+    """Top functions by cumulative time from a cProfile run"""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f"{name} ({_short_path(filename)}:{line})",
+            'calls': ncalls,
+            'self_ms': round(tottime * 1000, 3),
+            'cumulative_ms': round(cumtime * 1000, 3),
+        })
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:limit]
+
+
+def save_profile(profile, scope, finished):
+    """
+    Writes <id>.json (summary, SQL timeline, template timings) plus
+    <id>.folded (sampling) or <id>.prof (cProfile, for snakeviz/pstats)
+    to PROFILE_DIR, then prunes old profiles beyond PROFILE_KEEP.
+    """
+    directory = current_app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+
+    started = profile['started']
+    endpoint = re.sub(r'[^A-Za-z0-9_.]', '_', request.endpoint or 'unmatched')
+    profile_id = f"{datetime.utcnow():%Y%m%d-%H%M%S}-{endpoint}-{uuid.uuid4().hex[:8]}"
+
+    statements = scope.statements if scope is not None and scope.statements else []
+    sql_timeline = [
+        {
+            'offset_ms': round((statement_start - started) * 1000, 3),
+            'duration_ms': round(elapsed * 1000, 3),
+            'statement': statement,
+        }
+        for statement, _, elapsed, statement_start in statements
+        if statement_start >= started
+    ]
+
+    summary = {
+        'id': profile_id,
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'mode': profile['mode'],
+        'admin_id': profile['admin_id'],
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'endpoint': request.endpoint,
+        'status': profile['status'],
+        'duration_ms': round((finished - started) * 1000, 3),
+        'sql_count': len(sql_timeline),
+        'sql_ms': round(sum(entry['duration_ms'] for entry in sql_timeline), 3),
+        'template_ms': round(sum(entry['duration_ms'] for entry in profile['templates']), 3),
+        'sql_timeline': sql_timeline,
+        'templates': profile['templates'],
+    }
+
+    if 'profiler' in profile:
+        summary['functions'] = _function_table(profile['profiler'])
+        profile['profiler'].dump_stats(os.path.join(directory, f"{profile_id}.prof"))
+    else:
+        sampler = profile['sampler']
+        summary['samples'] = sampler.samples
+        summary['sample_interval_ms'] = sampler.interval * 1000
+        with open(os.path.join(directory, f"{profile_id}.folded"), 'w') as f:
+            f.write(sampler.folded())
+
+    with open(os.path.join(directory, f"{profile_id}.json"), 'w') as f:
+        json.dump(summary, f, indent=2, default=str)
+
+    _prune(directory, current_app.config['PROFILE_KEEP'])
+    current_app.logger.info(f"🔬 Stored {profile['mode']} profile {profile_id} ({summary['duration_ms']}ms)")
+    return profile_id
+
+
+def _prune(directory, keep):
+    summaries = sorted(glob.glob(os.path.join(directory, '*.json')), reverse=True)
+    for path in summaries[keep:]:
+        stem = path[:-len('.json')]
+        for extension in ('.json', '.folded', '.prof'):
+            if os.path.exists(stem + extension):
+                os.remove(stem + extension)
+
+
+def list_profiles(limit=50):
+    """Newest first; each entry is the stored summary without its timelines"""
+    directory = current_app.config['PROFILE_DIR']
+    profiles = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.json')), reverse=True)[:limit]:
+        with open(path) as f:
+            summary = json.load(f)
+        summary.pop('sql_timeline', None)
+        summary.pop('templates', None)
+        summary.pop('functions', None)
+        profiles.append(summary)
+    return profiles
+
+
+def load_profile(profile_id):
+    """Full stored summary, or None for an unknown/invalid id"""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(current_app.config['PROFILE_DIR'], f"{profile_id}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def init_profiling(app):
+    """
+    Lets admins profile single requests. Must run after init_metrics so the
+    request's ScopeStats exists when profiling starts; requests without the
+    flag/header skip everything after a header and query-string check.
+    """
+    if not app.config.get('PROFILING_ENABLED'):
+        return
+
+    app.before_request(_start_profile)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_profile)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
@@ -0,0 +1,130 @@
+import re
+from collections import Counter as ShapeCounter
+from contextlib import contextmanager
+
+from flask import current_app, request
+
+from utils.metrics_utils import Counter, ScopeStats, current_scope
+
+
+REPEATED_SHAPES = Counter(
+    'db_repeated_query_shapes_total',
+    'Requests/jobs that ran the same statement shape repeatedly (likely N+1)',
+    ['scope']
+)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_settings = {'repeat_threshold': 3, 'logger': None}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict audit mode when an endpoint issues more SQL than its budget"""
+
+
+def statement_shape(statement):
+    """
+    Normalizes a SQL statement so calls that differ only in literal
+    values or IN-list length compare equal.
+    """
+    shape = _STRING_LITERAL.sub('?', statement)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = _PLACEHOLDER_LIST.sub('(?...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+def repeated_shapes(statements, threshold):
+    """Returns [(shape, count)] for shapes issued at least `threshold` times"""
+    counts = ShapeCounter(statement_shape(statement) for statement, *_ in statements)
+    return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+
+def _format_statements(statements):
+    return '\n'.join(f"  [{elapsed * 1000:.2f}ms] {statement}" for statement, _, elapsed, _ in statements)
+
+
+def _report_repeated_shapes(scope):
+    """Close hook: flags likely N+1 patterns for every request and job"""
+    if scope.statements is None:
+        return
+    repeats = repeated_shapes(scope.statements, _settings['repeat_threshold'])
+    if not repeats:
+        return
+    REPEATED_SHAPES.inc(scope=scope.name)
+    for shape, count in repeats:
+        _settings['logger'].warning(f"🔁 Possible N+1 in {scope.name}: {count}x {shape}")
+
+
+def _enforce_budget(response):
+    """after_request: compares the request's query count with its budget"""
+    scope = current_scope.get()
+    if scope is None or request.endpoint is None:
+        return response
+
+    view = current_app.view_functions.get(request.endpoint)
+    budget = current_app.config.get('QUERY_BUDGETS', {}).get(
+        request.endpoint, getattr(view, 'query_budget', None)
+    )
+    if budget is None or scope.queries <= budget:
+        return response
+
+    message = (
+        f"{request.endpoint} issued {scope.queries} queries (budget {budget}):\n"
+        f"{_format_statements(scope.statements or [])}"
+    )
+    if current_app.config.get('QUERY_AUDIT_MODE') == 'strict':
+        raise QueryBudgetExceeded(message)
+    current_app.logger.warning(f"💸 Query budget exceeded: {message}")
+    return response
+
+
+@contextmanager
+def audit_queries(name='block', budget=None):
+    """
+    Records every statement issued inside the block, e.g. a scheduler job
+    called from a test:
+
+        with audit_queries('reminders', budget=5) as scope:
+            send_reminder_emails(app)
+
+    Raises QueryBudgetExceeded when `budget` is exceeded.
+    """
+    parent = current_scope.get()
+    scope = ScopeStats(name)
+    scope.statements = []
+    token = current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        current_scope.reset(token)
+        if parent is not None:
+            scope.merge_into(parent)
+
+    if budget is not None and scope.queries > budget:
+        raise QueryBudgetExceeded(
+            f"{name} issued {scope.queries} queries (budget {budget}):\n"
+            f"{_format_statements(scope.statements)}"
+        )
+
+
+def init_query_audit(app):
+    """
+    Turns on statement recording for every request and scheduler job when
+    QUERY_AUDIT_ENABLED is set. Budgets come from @query_budget on a view or
+    from QUERY_BUDGETS ({endpoint: max_queries}); QUERY_AUDIT_MODE='strict'
+    raises QueryBudgetExceeded instead of logging, which fails tests, and
+    turns the audit on by itself.
+    """
+    if not app.config.get('QUERY_AUDIT_ENABLED') and app.config.get('QUERY_AUDIT_MODE') != 'strict':
+        return
+
+    _settings['repeat_threshold'] = app.config.get('QUERY_AUDIT_REPEAT_THRESHOLD', 3)
+    _settings['logger'] = app.logger
+    ScopeStats.record_statements = True
+    if _report_repeated_shapes not in ScopeStats.close_hooks:
+        ScopeStats.close_hooks.append(_report_repeated_shapes)
+
+    app.after_request(_enforce_budget)
@@ -0,0 +1,209 @@
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, request
+
+from utils.metrics_utils import REGISTRY
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets kept in a small SQLite file so every gunicorn worker
+    sees the same balances. Each consume runs in one IMMEDIATE transaction.
+    """
+
+    PRUNE_EVERY = 1000          # consumes between clean-ups of idle buckets
+    IDLE_BUCKET_SECONDS = 86400  # buckets untouched this long are full again anyway
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._consumes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS throttle_counters ("
+                " scope TEXT NOT NULL, outcome TEXT NOT NULL, count INTEGER NOT NULL,"
+                " PRIMARY KEY (scope, outcome))"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key, capacity, refill_per_second, cost=1):
+        """
+        Takes `cost` tokens from the bucket `key`.
+        Returns (allowed, retry_after_seconds).
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * refill_per_second)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._consumes += 1
+        if self._consumes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+        retry_after = 0 if allowed else (cost - tokens) / refill_per_second
+        return allowed, retry_after
+
+    def incr_counter(self, scope, outcome):
+        self._connect().execute(
+            "INSERT INTO throttle_counters (scope, outcome, count) VALUES (?, ?, 1) "
+            "ON CONFLICT(scope, outcome) DO UPDATE SET count = count + 1",
+            (scope, outcome)
+        )
+
+    def counters(self):
+        """Returns {scope: {outcome: count}} across all workers"""
+        rows = self._connect().execute(
+            "SELECT scope, outcome, count FROM throttle_counters ORDER BY scope, outcome"
+        ).fetchall()
+        result = {}
+        for scope, outcome, count in rows:
+            result.setdefault(scope, {})[outcome] = count
+        return result
+
+    def prune(self):
+        """Deletes buckets that have been idle long enough to be full again"""
+        self._connect().execute(
+            "DELETE FROM buckets WHERE updated_at < ?",
+            (time.time() - self.IDLE_BUCKET_SECONDS,)
+        )
+
+
+class MemoryBucketStore:
+    """
+    Process-local stand-in for SQLiteBucketStore.
+    Only suitable for a single worker (development, tests).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._counters = {}
+
+    def consume(self, key, capacity, refill_per_second, cost=1):
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+        retry_after = 0 if allowed else (cost - tokens) / refill_per_second
+        return allowed, retry_after
+
+    def incr_counter(self, scope, outcome):
+        with self._lock:
+            outcomes = self._counters.setdefault(scope, {})
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    def counters(self):
+        with self._lock:
+            return {scope: dict(outcomes) for scope, outcomes in sorted(self._counters.items())}
+
+    def prune(self):
+        pass
+
+
+def init_rate_limiter(app):
+    """
+    Creates the bucket store named by RATE_LIMIT_STORAGE_URL
+    ('memory://' or 'sqlite:///<path>') and attaches it to the app.
+    """
+    url = app.config.get('RATE_LIMIT_STORAGE_URL', 'memory://')
+    if url.startswith('sqlite:///'):
+        store = SQLiteBucketStore(url[len('sqlite:///'):])
+    else:
+        store = MemoryBucketStore()
+    app.extensions['rate_limiter'] = store
+
+    def collect_throttle_counters():
+        samples = [
+            ({'scope': scope, 'outcome': outcome}, count)
+            for scope, outcomes in store.counters().items()
+            for outcome, count in outcomes.items()
+        ]
+        return [('rate_limit_decisions_total', 'counter', 'Throttle decisions by scope and outcome', samples)]
+
+    REGISTRY.collectors['rate_limit'] = collect_throttle_counters
+    return store
+
+
+def get_rate_limiter():
+    return current_app.extensions['rate_limiter']
+
+
+def client_ip():
+    """
+    Client address, honouring X-Forwarded-For only for the number of
+    proxies configured in RATE_LIMIT_PROXY_COUNT.
+    """
+    proxy_count = current_app.config.get('RATE_LIMIT_PROXY_COUNT', 0)
+    route = request.access_route
+    if proxy_count and len(route) >= proxy_count:
+        return route[-proxy_count]
+    return request.remote_addr or 'unknown'
+
+
+def check_rate_limit(scope, account=None):
+    """
+    Consumes one token from each bucket `scope` has a limit for (see
+    RATE_LIMITS): 'ip', and when an account is given 'account' (that
+    account from anywhere) or 'account_ip' (that account from this client).
+    Call this before any password hashing or email work.
+    Returns (allowed, retry_after_seconds).
+    """
+    if not current_app.config.get('RATE_LIMIT_ENABLED', True):
+        return True, 0
+
+    limits = current_app.config['RATE_LIMITS'][scope]
+    store = get_rate_limiter()
+
+    ip = client_ip()
+    identities = {'ip': ip}
+    if account:
+        account = account.strip().lower()
+        identities.update(account=account, account_ip=f"{account}|{ip}")
+    checks = [(kind, identities[kind]) for kind in ('ip', 'account', 'account_ip')
+              if kind in limits and kind in identities]
+
+    for kind, identity in checks:
+        capacity, period = limits[kind]
+        allowed, retry_after = store.consume(f"{scope}:{kind}:{identity}", capacity, capacity / period)
+        if not allowed:
+            store.incr_counter(scope, f"throttled_{kind}")
+            current_app.logger.warning("🚦 Throttled %s by %s (%s)", scope, kind, identity,
+                                       extra={'event': 'throttled', 'scope': scope})
+            return False, retry_after
+
+    store.incr_counter(scope, 'allowed')
+    return True, 0
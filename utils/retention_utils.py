@@ -0,0 +1,262 @@
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, delete, func, insert, literal, select
+
+from app.models.application import Application
+from app.models.application_archive import ArchivedApplication
+from utils.document_utils import DOCUMENT_KINDS, referenced_documents, remove_unreferenced_documents
+from utils.metrics_utils import Counter
+from utils.search_utils import forget_documents
+from utils.write_queue_utils import run_write
+
+
+ARCHIVED_APPLICATIONS = Counter(
+    'applications_archived_total', 'Applications moved to the archive table', ['reason']
+)
+STORAGE_GC_FILES = Counter(
+    'storage_gc_files_total', 'Unreferenced upload files handled by the garbage collector', ['action']
+)
+STORAGE_GC_BYTES = Counter(
+    'storage_gc_bytes_total', 'Upload bytes reclaimed by the garbage collector', ['action']
+)
+
+ARCHIVE_REASONS = ('finished', 'abandoned')
+PARTIAL_PREFIX = '.incoming-'  # store_document()'s temporary files
+QUARANTINE_RUN_FORMAT = '%Y%m%d-%H%M%S'
+
+
+# ---------------------- ARCHIVAL ----------------------
+def archive_condition(reason, days, now=None):
+    """
+    WHERE clause for applications due for the archive:
+    finished = reviewed (or, for older rows, approved) more than `days` ago;
+    abandoned = never submitted and untouched for `days`. Rows with no
+    timestamp to judge by are left alone.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    if reason == 'finished':
+        return func.coalesce(Application.reviewed_at, Application.approved_at) < cutoff
+    if reason == 'abandoned':
+        return and_(Application.submitted.is_(False), Application.updated_at < cutoff)
+    raise ValueError(f"Unknown archive reason '{reason}'")
+
+
+def count_archivable(reason, days):
+    from app.extensions import db
+
+    count = db.session.execute(
+        select(func.count()).select_from(Application).where(archive_condition(reason, days))
+    ).scalar()
+    db.session.rollback()
+    return count
+
+
+def archived_application(user_id, session=None):
+    """
+    The user's most recently archived application, or None. A user whose
+    application was archived still has one: the dashboard shows it and
+    step 1 does not start a new one.
+    """
+    from app.extensions import db
+
+    return (session or db.session).query(ArchivedApplication).filter_by(user_id=user_id).order_by(
+        ArchivedApplication.archived_at.desc()
+    ).first()
+
+
+def archive_batch(reason, days, batch_size=500):
+    """
+    Moves up to `batch_size` due applications to `application_archive` in one
+    transaction (copy, then delete). Abandoned applications were never
+    reviewed, so their documents are not carried over and are removed from
+    storage once nothing else shares them; finished ones keep theirs.
+    Returns (applications archived, documents removed).
+    """
+    now = datetime.utcnow()
+    columns = [column.name for column in Application.__table__.columns]
+    document_columns = set(DOCUMENT_KINDS.values())
+    keep_documents = reason == 'finished'
+
+    def move_applications(session):
+        application_ids = session.execute(
+            select(Application.id).where(archive_condition(reason, days, now))
+            .order_by(Application.id).limit(batch_size)
+        ).scalars().all()
+        if not application_ids:
+            return 0, set()
+
+        copied = [
+            getattr(Application, name) if keep_documents or name not in document_columns else literal(None)
+            for name in columns
+        ]
+        session.execute(insert(ArchivedApplication).from_select(
+            columns + ['archived_at', 'archive_reason'],
+            select(*copied, literal(now), literal(reason)).where(Application.id.in_(application_ids)),
+        ))
+        documents = session.execute(
+            delete(Application).where(Application.id.in_(application_ids))
+            .returning(*(getattr(Application, name) for name in DOCUMENT_KINDS.values()))
+            .execution_options(synchronize_session=False)
+        ).all()
+        names = set() if keep_documents else {name for row in documents for name in row if name}
+        return len(application_ids), names
+
+    archived, documents = run_write(move_applications, name='applications_archive')
+    removed = remove_unreferenced_documents(documents)
+    ARCHIVED_APPLICATIONS.inc(archived, reason=reason)
+    return archived, len(removed)
+
+
+# ---------------------- STORAGE GARBAGE COLLECTION ----------------------
+class GCReport:
+    """What one garbage collection run found and did"""
+
+    def __init__(self):
+        self.scanned = 0
+        self.referenced = 0
+        self.recent = 0
+        self.candidates = 0
+        self.candidate_bytes = 0
+        self.removed = 0
+        self.reclaimed_bytes = 0
+        self.kept = 0  # referenced again between the mark and the sweep
+        self.samples = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+
+def _unreferenced_files(upload_folder, referenced, grace_seconds, report):
+    """
+    Sweep phase: yields (name, size) of top-level files no row points at
+    and older than the grace period (so uploads waiting to be attached are
+    safe). Subfolders are not collected.
+    """
+    cutoff = time.time() - grace_seconds
+    with os.scandir(upload_folder) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            report.scanned += 1
+            if entry.name in referenced:
+                report.referenced += 1
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                report.recent += 1
+                continue
+            yield entry.name, stat.st_size
+
+
+def _dispose(upload_folder, names, quarantine_dir, grace_seconds):
+    """
+    Deletes (or moves to `quarantine_dir`) the files among `names` that are
+    still unreferenced and were not touched since the mark. Returns the
+    names handled.
+    """
+    still_referenced = referenced_documents(names)
+    cutoff = time.time() - grace_seconds
+    handled = []
+    for name in names:
+        path = os.path.join(upload_folder, name)
+        try:
+            if name in still_referenced or os.stat(path).st_mtime > cutoff:
+                continue  # re-attached (find_document() touches the file) since the mark
+            if quarantine_dir:
+                shutil.move(path, os.path.join(quarantine_dir, name))
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            continue
+        handled.append(name)
+    return handled
+
+
+def collect_garbage(dry_run=False, quarantine=False, grace_seconds=None, batch_size=500, progress=None):
+    """
+    Mark-and-sweep over UPLOAD_FOLDER: every document name referenced by a
+    live or archived application is marked, then unreferenced files older
+    than the grace period (stray files, abandoned partial uploads, documents
+    replaced by a re-upload) are deleted, or moved to a timestamped folder
+    under GC_QUARANTINE_DIR, `batch_size` at a time. Each batch re-checks
+    its names against the database first. With `dry_run` nothing changes
+    and the report says what would be reclaimed.
+    """
+    from app.extensions import db
+
+    config = current_app.config
+    upload_folder = config['UPLOAD_FOLDER']
+    grace_seconds = config['GC_GRACE_SECONDS'] if grace_seconds is None else grace_seconds
+    report = GCReport()
+    if not os.path.isdir(upload_folder):
+        return report
+
+    referenced = referenced_documents()
+    db.session.rollback()
+
+    quarantine_dir = None
+    if quarantine and not dry_run:
+        quarantine_dir = os.path.join(config['GC_QUARANTINE_DIR'], datetime.utcnow().strftime(QUARANTINE_RUN_FORMAT))
+        os.makedirs(quarantine_dir, exist_ok=True)
+    action = 'quarantined' if quarantine else 'deleted'
+
+    def sweep(batch):
+        sizes = dict(batch)
+        handled = _dispose(upload_folder, list(sizes), quarantine_dir, grace_seconds)
+        db.session.rollback()
+        forget_documents(name for name in handled if not name.startswith(PARTIAL_PREFIX))
+        reclaimed = sum(sizes[name] for name in handled)
+        report.removed += len(handled)
+        report.reclaimed_bytes += reclaimed
+        report.kept += len(batch) - len(handled)
+        STORAGE_GC_FILES.inc(len(handled), action=action)
+        STORAGE_GC_BYTES.inc(reclaimed, action=action)
+
+    batch = []
+    for name, size in _unreferenced_files(upload_folder, referenced, grace_seconds, report):
+        report.candidates += 1
+        report.candidate_bytes += size
+        if len(report.samples) < 20:
+            report.samples.append((name, size))
+        if dry_run:
+            continue
+        batch.append((name, size))
+        if len(batch) >= batch_size:
+            sweep(batch)
+            batch = []
+            if progress:
+                progress(report)
+    if batch:
+        sweep(batch)
+
+    report.elapsed = time.perf_counter() - report.started
+    return report
+
+
+def purge_quarantine(days, dry_run=False):
+    """
+    Deletes quarantine folders from runs more than `days` ago.
+    Returns (folders, bytes) purged or, with `dry_run`, that would be.
+    """
+    root = current_app.config['GC_QUARANTINE_DIR']
+    if not os.path.isdir(root):
+        return 0, 0
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    folders = purged_bytes = 0
+    for entry in os.scandir(root):
+        try:
+            started = datetime.strptime(entry.name, QUARANTINE_RUN_FORMAT)
+        except ValueError:
+            continue  # not ours
+        if not entry.is_dir(follow_symlinks=False) or started >= cutoff:
+            continue
+        purged_bytes += sum(
+            os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(entry.path) for name in names
+        )
+        folders += 1
+        if not dry_run:
+            shutil.rmtree(entry.path)
+    return folders, purged_bytes
@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import object_session
+
+from app.models.application import Application
+from utils.funnel_utils import add_step_events
+from utils.metrics_utils import Counter
+from utils.write_queue_utils import run_write
+
+
+REVIEW_CLAIMS = Counter(
+    'review_queue_claims_total', 'Applications handed out by the review queue', ['outcome']
+)
+REVIEW_DECISIONS = Counter(
+    'review_queue_decisions_total', 'What admins did with their claimed applications', ['decision']
+)
+
+
+def lease_cutoff(now=None):
+    """Claims taken before this moment have lapsed and can be handed to someone else"""
+    now = now or datetime.utcnow()
+    return now - timedelta(seconds=current_app.config['REVIEW_LEASE_SECONDS'])
+
+
+def pending_review():
+    """Submitted applications no admin has decided on yet"""
+    return and_(
+        Application.submitted.is_(True),
+        Application.approved.is_(False),
+        Application.reviewed_at.is_(None),
+    )
+
+
+def unclaimed(cutoff):
+    return or_(Application.claimed_by.is_(None), Application.claimed_at < cutoff)
+
+
+def not_skipped_by(admin_id, cutoff):
+    """Leaves out what `admin_id` skipped within the lease, so Skip moves them on"""
+    return or_(
+        Application.skipped_by.is_(None),
+        Application.skipped_by != admin_id,
+        Application.skipped_at < cutoff,
+    )
+
+
+def holds_claim(application, admin_id):
+    """True while `admin_id` holds a live lease on `application`"""
+    return (
+        application.claimed_by == admin_id
+        and application.claimed_at is not None
+        and application.claimed_at >= lease_cutoff()
+    )
+
+
+def claim_review_items(admin_id):
+    """
+    Renews the admin's live claims and tops them up to 1 + REVIEW_PREFETCH,
+    one atomic UPDATE … RETURNING per missing item, so two admins can never
+    be handed the same application. Returns the held ids in queue order:
+    the first is reviewed now, the rest are prefetched.
+    """
+    now = datetime.utcnow()
+    cutoff = lease_cutoff(now)
+    wanted = 1 + current_app.config['REVIEW_PREFETCH']
+
+    def claim(session):
+        held = session.execute(
+            update(Application)
+            .where(Application.claimed_by == admin_id, Application.claimed_at >= cutoff, pending_review())
+            .values(claimed_at=now, updated_at=Application.updated_at)  # a claim is not an edit
+            .returning(Application.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+
+        claimed = 0
+        while len(held) + claimed < wanted:
+            next_id = (
+                select(Application.id)
+                .where(pending_review(), unclaimed(cutoff), not_skipped_by(admin_id, cutoff))
+                .order_by(Application.submitted_at, Application.id)
+                .limit(1)
+                .scalar_subquery()
+            )
+            # The outer unclaimed() re-check keeps this safe on databases that
+            # evaluate the subquery before taking the row lock.
+            application_id = session.execute(
+                update(Application)
+                .where(Application.id == next_id, unclaimed(cutoff))
+                .values(claimed_by=admin_id, claimed_at=now, updated_at=Application.updated_at)
+                .returning(Application.id)
+                .execution_options(synchronize_session=False)
+            ).scalar()
+            if application_id is None:
+                break
+            claimed += 1
+
+        REVIEW_CLAIMS.inc(len(held), outcome='renewed')
+        REVIEW_CLAIMS.inc(claimed, outcome='claimed')
+        if not held and not claimed:
+            REVIEW_CLAIMS.inc(outcome='empty')
+
+        return session.execute(
+            select(Application.id)
+            .where(Application.claimed_by == admin_id, Application.claimed_at >= cutoff, pending_review())
+            .order_by(Application.submitted_at, Application.id)
+        ).scalars().all()
+
+    return run_write(claim, name='review_claim')
+
+
+def next_claimed_id(admin_id, after_id):
+    """The admin's prefetched application after `after_id`, if any"""
+    return Application.query.with_entities(Application.id).filter(
+        Application.claimed_by == admin_id,
+        Application.claimed_at >= lease_cutoff(),
+        Application.id != after_id,
+        pending_review(),
+    ).order_by(Application.submitted_at, Application.id).limit(1).scalar()
+
+
+def pending_review_count():
+    return Application.query.with_entities(func.count(Application.id)).filter(pending_review()).scalar()
+
+
+def release_claim(admin_id, application_id):
+    """
+    Puts an application the admin is skipping back in the queue for the
+    other admins; claim_review_items() passes over it for this one until
+    the lease time has gone by.
+    """
+    now = datetime.utcnow()
+
+    def release(session):
+        return session.execute(
+            update(Application)
+            .where(Application.id == application_id, Application.claimed_by == admin_id)
+            .values(claimed_by=None, claimed_at=None, skipped_by=admin_id, skipped_at=now,
+                    updated_at=Application.updated_at)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    released = run_write(release, name='review_release')
+    REVIEW_DECISIONS.inc(decision='release')
+    return bool(released)
+
+
+def record_decision(application, approve, now=None):
+    """
+    Applies an admin's approve/reject to `application` and takes it out of
+    the review queue. Call inside a write unit.
+    """
+    now = now or datetime.utcnow()
+    if approve:
+        if not application.approved:
+            application.approved = True
+            application.approved_at = now
+    else:
+        application.approved = False
+        application.approved_at = None
+    application.reviewed_at = now
+    application.claimed_by = None
+    application.claimed_at = None
+    add_step_events(object_session(application), [application.user_id], 'approved' if approve else 'rejected', now)
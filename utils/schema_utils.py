@@ -0,0 +1,74 @@
+from sqlalchemy import inspect
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+
+# Columns added to existing tables since the first release. db.create_all()
+# only creates missing tables, so older databases get these via ALTER TABLE
+# (and the tables' indexes via CREATE INDEX IF NOT EXISTS).
+ADDED_COLUMNS = {
+    'application': ['version_id', 'updated_at', 'reviewed_at', 'claimed_by', 'claimed_at',
+                    'skipped_by', 'skipped_at'],
+    'application_archive': ['skipped_by', 'skipped_at'],
+}
+
+
+def ensure_schema(db, logger=None):
+    """
+    Adds any ADDED_COLUMNS (and their tables' indexes) missing from existing
+    tables. Safe to run from several workers at once: a column another
+    worker just added is skipped.
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+    added = []
+
+    for table_name, column_names in ADDED_COLUMNS.items():
+        if not inspector.has_table(table_name):
+            continue  # create_all() builds it with every column
+        existing = {column['name'] for column in inspector.get_columns(table_name)}
+        table = db.metadata.tables[table_name]
+
+        for name in column_names:
+            if name in existing:
+                continue
+            ddl = CreateColumn(table.c[name]).compile(dialect=engine.dialect)
+            try:
+                with engine.begin() as conn:
+                    conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {ddl}")
+                added.append(f"{table_name}.{name}")
+            except OperationalError as e:
+                if 'duplicate column' not in str(e):
+                    raise
+
+        with engine.begin() as conn:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+    if added and logger:
+        logger.info(f"🧱 Added columns: {', '.join(added)}")
+    return added
+
+
+# Revision in migrations/versions/ matching what create_all() builds
+BASELINE_REVISION = '0001_baseline'
+
+
+def stamp_baseline(db, logger=None):
+    """
+    Marks a database built by create_all() as being at the baseline
+    migration, so `flask db upgrade` only applies the revisions after it.
+    Databases already under Alembic keep their version.
+    """
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE IF NOT EXISTS alembic_version ("
+            "version_num VARCHAR(32) NOT NULL, CONSTRAINT alembic_version_pkc PRIMARY KEY (version_num))"
+        )
+        stamped = conn.exec_driver_sql(
+            "INSERT INTO alembic_version (version_num) SELECT ? "
+            "WHERE NOT EXISTS (SELECT 1 FROM alembic_version)", (BASELINE_REVISION,)
+        ).rowcount
+    if stamped and logger:
+        logger.info(f"🧱 Stamped the database at migration {BASELINE_REVISION}")
+    return bool(stamped)
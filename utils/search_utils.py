@@ -0,0 +1,237 @@
+import atexit
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import current_app
+from markupsafe import Markup, escape
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from utils.document_text_utils import TEXT_EXTENSIONS, UnsupportedDocument, extract_text
+from utils.metrics_utils import Counter, Histogram, current_scope
+from utils.write_queue_utils import run_write
+
+
+DOCUMENTS_INDEXED = Counter(
+    'document_index_total', 'Uploaded documents run through text extraction, by outcome', ['outcome']
+)
+EXTRACTION_TIME = Histogram(
+    'document_text_extraction_seconds', 'Text extraction time per document', ['extension']
+)
+
+# document_index holds one row per stored file (content-addressed, so shared by
+# every application that uploaded it); document_fts.rowid = document_index.id.
+SEARCH_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS document_index ("
+    " id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, status TEXT NOT NULL,"
+    " chars INTEGER NOT NULL DEFAULT 0, error TEXT, indexed_at DATETIME NOT NULL)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS document_fts USING fts5("
+    "body, tokenize = 'porter unicode61 remove_diacritics 2')",
+)
+SNIPPET_START, SNIPPET_END = '\x02', '\x03'
+_SEARCH_TERM = re.compile(r'\w+\*?')
+
+
+def ensure_search_index(db, logger=None):
+    """Creates the FTS5 tables; returns False when this SQLite build has no FTS5"""
+    try:
+        with db.engine.begin() as conn:
+            for ddl in SEARCH_SCHEMA:
+                conn.exec_driver_sql(ddl)
+    except OperationalError as e:
+        if logger:
+            logger.warning(f"⚠️ Document search disabled: {e}")
+        return False
+    return True
+
+
+# ---------------------- EXTRACTION ----------------------
+def is_indexable(name):
+    return os.path.splitext(name)[1].lower() in TEXT_EXTENSIONS and not name.startswith('.')
+
+
+def extract_document(name):
+    """(name, status, text, error) for one stored file; status is indexed|empty|unsupported|failed"""
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], name)
+    started = time.perf_counter()
+    try:
+        body = extract_text(path, max_chars=current_app.config['DOCUMENT_INDEX_MAX_CHARS'])
+        status, error = ('indexed' if body else 'empty'), None
+    except UnsupportedDocument as e:
+        body, status, error = '', 'unsupported', str(e)
+    except Exception as e:  # a malformed upload must not take the indexer down
+        body, status, error = '', 'failed', f"{type(e).__name__}: {e}"
+    EXTRACTION_TIME.observe(time.perf_counter() - started, extension=os.path.splitext(name)[1].lower())
+    return name, status, body, error
+
+
+def store_extracts(extracts):
+    """Writes a batch of extract_document() results in one transaction"""
+    now = datetime.utcnow()
+
+    def save_document_text(session):
+        for name, status, body, error in extracts:
+            row_id = session.execute(text(
+                "INSERT INTO document_index (name, status, chars, error, indexed_at)"
+                " VALUES (:name, :status, :chars, :error, :now)"
+                " ON CONFLICT (name) DO UPDATE SET status = excluded.status, chars = excluded.chars,"
+                " error = excluded.error, indexed_at = excluded.indexed_at"
+                " RETURNING id"
+            ), {'name': name, 'status': status, 'chars': len(body), 'error': error, 'now': now}).scalar()
+            session.execute(text("DELETE FROM document_fts WHERE rowid = :id"), {'id': row_id})
+            if body:
+                session.execute(text("INSERT INTO document_fts (rowid, body) VALUES (:id, :body)"),
+                                {'id': row_id, 'body': body})
+
+    run_write(save_document_text, name='document_index')
+    for _, status, _, _ in extracts:
+        DOCUMENTS_INDEXED.inc(outcome=status)
+
+
+def forget_documents(names):
+    """Removes deleted files from the index"""
+    names = list(names)
+    if not names or not current_app.extensions.get('document_search'):
+        return
+
+    def drop_document_text(session):
+        for name in names:
+            row_id = session.execute(
+                text("DELETE FROM document_index WHERE name = :name RETURNING id"), {'name': name}
+            ).scalar()
+            if row_id is not None:
+                session.execute(text("DELETE FROM document_fts WHERE rowid = :id"), {'id': row_id})
+
+    run_write(drop_document_text, name='document_forget')
+
+
+def indexed_names(include_failed=True):
+    """Names that already have an index row (failed ones only if `include_failed`)"""
+    from app.extensions import db
+
+    rows = db.session.execute(text("SELECT name, status FROM document_index")).all()
+    return {name for name, status in rows if include_failed or status != 'failed'}
+
+
+def index_document(name):
+    """Extracts and stores one uploaded file, unless it is indexed already"""
+    from app.extensions import db
+
+    already = db.session.execute(
+        text("SELECT 1 FROM document_index WHERE name = :name"), {'name': name}
+    ).scalar()
+    if already or not os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], name)):
+        return False
+    store_extracts([extract_document(name)])
+    return True
+
+
+# ---------------------- BACKGROUND POOL ----------------------
+class DocumentIndexer:
+    """
+    Small per-worker thread pool that indexes documents after upload, so the
+    request never waits for text extraction. A name already queued is not
+    queued twice; a lost job is picked up by `flask documents index`.
+    """
+
+    def __init__(self, app, workers):
+        self.app = app
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._queued = set()
+
+    def submit(self, name):
+        with self._lock:
+            if self._pid != os.getpid():  # forked after the pool started: its threads are gone
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='document-index')
+                self._pid = os.getpid()
+                self._queued = set()
+            if name in self._queued:
+                return
+            self._queued.add(name)
+            self._executor.submit(self._run, name)
+
+    def _run(self, name):
+        try:
+            with self.app.app_context():
+                index_document(name)
+        except Exception as e:
+            self.app.logger.error(f"❌ Indexing {name} failed: {e}")
+        finally:
+            with self._lock:
+                self._queued.discard(name)
+
+    def close(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def queue_document_indexing(names):
+    """Indexes newly attached documents in the background (inline when DOCUMENT_INDEX_WORKERS is 0)"""
+    if not current_app.extensions.get('document_search'):
+        return
+    indexer = current_app.extensions.get('document_indexer')
+    for name in names:
+        if not name or not is_indexable(name):
+            continue
+        if indexer is not None:
+            indexer.submit(name)
+            continue
+        # Inline (tests): the indexing SQL is not part of the request's query budget
+        token = current_scope.set(None)
+        try:
+            index_document(name)
+        finally:
+            current_scope.reset(token)
+
+
+# ---------------------- SEARCH ----------------------
+def fts_query(terms):
+    """Free text from the search box -> an FTS5 query that ANDs its words (prefix* allowed)"""
+    words = _SEARCH_TERM.findall(terms or '')
+    return ' '.join(f'"{word.rstrip("*")}"' + ('*' if word.endswith('*') else '') for word in words)
+
+
+def _highlight(snippet):
+    """Escapes document text and turns the FTS match markers into <mark>"""
+    html = str(escape(' '.join(snippet.split())))  # line breaks of the source layout mean nothing here
+    return Markup(html.replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>'))
+
+
+def search_documents(terms, limit=200):
+    """[(document name, highlighted snippet)], best match first"""
+    from app.extensions import db
+
+    query = fts_query(terms)
+    if not query or not current_app.extensions.get('document_search'):
+        return []
+    rows = db.session.execute(text(
+        "SELECT d.name, snippet(document_fts, 0, :start, :end, '…', 16)"
+        " FROM document_fts JOIN document_index d ON d.id = document_fts.rowid"
+        " WHERE document_fts MATCH :query ORDER BY rank LIMIT :limit"
+    ), {'start': SNIPPET_START, 'end': SNIPPET_END, 'query': query, 'limit': limit}).all()
+    return [(name, _highlight(snippet)) for name, snippet in rows]
+
+
+def init_document_search(app):
+    """
+    Creates the FTS5 index and the background indexing pool
+    (DOCUMENT_INDEX_WORKERS threads per worker; 0 indexes inline).
+    """
+    from app.extensions import db
+
+    with app.app_context():
+        app.extensions['document_search'] = ensure_search_index(db, app.logger)
+
+    workers = app.config.get('DOCUMENT_INDEX_WORKERS', 2)
+    indexer = DocumentIndexer(app, workers) if workers else None
+    app.extensions['document_indexer'] = indexer
+    if indexer is not None:
+        atexit.register(indexer.close)
+    return indexer
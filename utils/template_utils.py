@@ -0,0 +1,150 @@
+import glob
+import hashlib
+import os
+import time
+
+from flask import request
+from jinja2 import FileSystemBytecodeCache, TemplateError
+
+from utils.metrics_utils import Histogram
+
+
+TEMPLATE_WARMUP_TIME = Histogram(
+    'template_warmup_duration_seconds', 'Time each worker spent precompiling templates at boot',
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+FIRST_REQUEST_LATENCY = Histogram(
+    'http_first_request_duration_seconds', 'Latency of the first request served by each worker',
+    ['endpoint', 'warmed']
+)
+
+_CACHE_FILE_PATTERN = '__jinja2_%s.cache'
+_first_request = {'pending': True, 'started': None, 'warmed': 'no'}
+
+
+class CountingBytecodeCache(FileSystemBytecodeCache):
+    """
+    On-disk bytecode cache shared by all workers. Jinja stores a checksum of
+    the template source in every entry, so an edited template is recompiled
+    (and its entry rewritten, atomically) the first time it is loaded.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(directory, _CACHE_FILE_PATTERN)
+        self.hits = 0
+        self.misses = 0
+
+    def load_bytecode(self, bucket):
+        super().load_bytecode(bucket)
+        if bucket.code is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+
+def init_template_cache(app):
+    """
+    Installs the bytecode cache. Has to run before anything touches
+    app.jinja_env, because Flask builds the environment from jinja_options
+    on first access.
+    """
+    directory = app.config.get('TEMPLATE_CACHE_DIR')
+    if not directory:
+        return None
+    cache = CountingBytecodeCache(directory)
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': cache}
+    return cache
+
+
+def _template_names(env):
+    return env.list_templates(filter_func=lambda name: name.endswith(('.html', '.txt')))
+
+
+def prune_bytecode_cache(app):
+    """Deletes cache entries for templates that no longer exist; returns how many"""
+    env = app.jinja_env
+    cache = env.bytecode_cache
+    if not isinstance(cache, FileSystemBytecodeCache):
+        return 0
+
+    live = set()
+    for name in _template_names(env):
+        _, filename, _ = env.loader.get_source(env, name)
+        live.add(os.path.join(cache.directory, _CACHE_FILE_PATTERN % cache.get_cache_key(name, filename)))
+
+    removed = 0
+    for path in glob.glob(os.path.join(cache.directory, _CACHE_FILE_PATTERN % '*')):
+        if path not in live:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def template_fingerprint(app):
+    """
+    Short hash of every template's path, size and mtime. Identical for all
+    workers of one deploy and different after any template changes, so it
+    can go into ETags.
+    """
+    env = app.jinja_env
+    digest = hashlib.sha1()
+    for name in _template_names(env):
+        _, filename, _ = env.loader.get_source(env, name)
+        stat = os.stat(filename)
+        digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+def warm_templates(app):
+    """
+    Compiles every template under app/templates (and blueprint template
+    folders) into the environment's in-memory cache, loading bytecode from
+    disk when it is still current. Returns (template_count, seconds).
+    """
+    env = app.jinja_env
+    started = time.perf_counter()
+    names = _template_names(env)
+    for name in names:
+        try:
+            env.get_template(name)
+        except TemplateError as e:
+            # Still fails loudly at render time; don't keep the worker from booting
+            app.logger.error(f"❌ Template {name} failed to compile during warm-up: {e}")
+    elapsed = time.perf_counter() - started
+    TEMPLATE_WARMUP_TIME.observe(elapsed)
+
+    cache = env.bytecode_cache
+    from_cache = f", {cache.hits} from bytecode cache" if isinstance(cache, CountingBytecodeCache) else ""
+    app.logger.info(f"🔥 Warmed {len(names)} templates in {elapsed * 1000:.1f}ms{from_cache}")
+    _first_request['warmed'] = 'yes'
+    return len(names), elapsed
+
+
+def _start_first_request():
+    if _first_request['pending'] and _first_request['started'] is None:
+        _first_request['started'] = time.perf_counter()
+
+
+def _finish_first_request(exc=None):
+    if not _first_request['pending'] or _first_request['started'] is None:
+        return
+    _first_request['pending'] = False
+    FIRST_REQUEST_LATENCY.observe(
+        time.perf_counter() - _first_request['started'],
+        endpoint=request.endpoint or 'unmatched', warmed=_first_request['warmed']
+    )
+
+
+def init_template_warmup(app):
+    """
+    Precompiles templates at boot (TEMPLATE_WARMUP) so a fresh gunicorn
+    worker doesn't compile them on its first requests, and records that
+    first request's latency either way so both setups can be compared.
+    """
+    app.before_request(_start_first_request)
+    app.teardown_request(_finish_first_request)
+
+    if app.config.get('TEMPLATE_WARMUP'):
+        prune_bytecode_cache(app)
+        warm_templates(app)
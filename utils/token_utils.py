@@ -1,14 +1,52 @@
+import hashlib
+
 from itsdangerous import URLSafeTimedSerializer
 from flask import current_app
 
-def generate_reset_token(email, expires_sec=1800):  # 30 minutes
+from app.models.user import User
+
+
+def password_fingerprint(password_hash):
+    """Short digest of the user's current password hash; setting a password voids older tokens"""
+    return hashlib.sha256(password_hash.encode('utf-8')).hexdigest()[:16]
+
+def _token_payload(user):
+    return {'email': user.email, 'pw': password_fingerprint(user.password_hash)}
+
+def generate_reset_token(user, expires_sec=1800):  # 30 minutes
     s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
-    return s.dumps(email, salt='password-reset')
+    return s.dumps(_token_payload(user), salt='password-reset')
 
-def verify_reset_token(token, expires_sec=1800):
+def generate_setup_token(user):
+    """Longer-lived token in invitations for imported accounts (PASSWORD_SETUP_TOKEN_MAX_AGE)"""
     s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
-    try:
-        email = s.loads(token, salt='password-reset', max_age=expires_sec)
-    except Exception:
+    return s.dumps(_token_payload(user), salt='password-setup')
+
+def _token_user(payload):
+    """The user a token payload names, if the password is still the one it was issued against"""
+    from utils.user_lifecycle_utils import UNUSABLE_PASSWORD
+
+    if isinstance(payload, str):
+        # Issued before tokens carried a fingerprint: only good until a password is chosen
+        user = User.query.filter_by(email=payload).first()
+        return user if user and user.password_hash == UNUSABLE_PASSWORD else None
+
+    user = User.query.filter_by(email=payload.get('email')).first()
+    if user is None or password_fingerprint(user.password_hash) != payload.get('pw'):
         return None
-    return email
+    return user
+
+def verify_reset_token(token, expires_sec=1800):
+    """
+    User from a reset token, or from a setup token still within its own
+    lifetime. Either is single-use: once the password changes it is refused.
+    """
+    s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
+    for salt, max_age in (('password-reset', expires_sec),
+                          ('password-setup', current_app.config.get('PASSWORD_SETUP_TOKEN_MAX_AGE', 604800))):
+        try:
+            payload = s.loads(token, salt=salt, max_age=max_age)
+        except Exception:
+            continue
+        return _token_user(payload)
+    return None
@@ -0,0 +1,375 @@
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import time
+import zlib
+
+from flask import g, request
+from flask import before_render_template, template_rendered
+
+from utils.metrics_utils import Counter
+
+
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+TRACEPARENT_PATTERN = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+TRACE_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+TRACES_DROPPED = Counter(
+    'traces_dropped_total', 'Finished traces dropped because the export queue was full'
+)
+
+current_span = contextvars.ContextVar('trace_span', default=None)
+
+
+# ---------------------- SPANS ----------------------
+class Trace:
+    """The spans of one request or job run, exported together when the root ends"""
+
+    def __init__(self, trace_id, sampled):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans = []
+        self.dropped = 0
+        self.error = False
+
+
+class Span:
+    """One timed operation. Use span() rather than creating these directly."""
+
+    def __init__(self, trace, name, kind, parent_id, attributes):
+        self.trace = trace
+        self.name = name
+        self.kind = kind
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = STATUS_UNSET
+        self.status_message = None
+        self.events = []
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._token = current_span.set(self)
+        trace.spans.append(self)
+
+    @property
+    def is_root(self):
+        return self is self.trace.spans[0]
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exc):
+        self.status, self.status_message = STATUS_ERROR, f"{type(exc).__name__}: {exc}"
+        self.trace.error = True
+        self.events.append({
+            'name': 'exception',
+            'timeUnixNano': str(time.time_ns()),
+            'attributes': _otlp_attributes({'exception.type': type(exc).__name__, 'exception.message': str(exc)}),
+        })
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        try:
+            current_span.reset(self._token)
+        except ValueError:  # ended from another context (e.g. a signal handler's copy)
+            pass
+        if self.is_root:
+            TRACER.finish(self.trace, self.end_ns - self.start_ns)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_exception(exc)
+        self.end()
+        return False
+
+
+class _NoopSpan:
+    """Returned when tracing is off or the trace is full: every call does nothing"""
+    trace = None
+    span_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_exception(self, exc):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name, kind=KIND_INTERNAL, root=False, trace_id=None, parent_id=None, sampled=None, **attributes):
+    """
+    Starts a span as a child of the current one. Use it as a context
+    manager (exceptions mark it as failed) or call .end() yourself;
+    attribute names with dots go through **{...}. Outside a trace (CLI
+    commands, the writer thread) it does nothing unless `root` is set:
+    only requests and scheduler jobs start traces.
+    """
+    if not TRACER.enabled:
+        return NOOP_SPAN
+    parent = current_span.get()
+    if parent is None:
+        if not root:
+            return NOOP_SPAN
+        trace_id = trace_id or os.urandom(16).hex()
+        trace = Trace(trace_id, TRACER.should_sample(trace_id) if sampled is None else sampled)
+    else:
+        trace, parent_id = parent.trace, parent.span_id
+        if len(trace.spans) >= TRACER.max_spans:
+            trace.dropped += 1
+            return NOOP_SPAN
+    return Span(trace, name, kind, parent_id, attributes)
+
+
+def traced(name=None, kind=KIND_INTERNAL):
+    """Decorator: runs the function inside span(name or its qualified name)"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def annotate_span(**attributes):
+    """Adds attributes to the current span, if there is one"""
+    current = current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def current_trace_ids():
+    """(trace id, span id) of the current span, or (None, None); used to stamp log records"""
+    current = current_span.get()
+    if current is None:
+        return None, None
+    return current.trace.trace_id, current.span_id
+
+
+# ---------------------- EXPORT ----------------------
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}  # int64 is a string in OTLP/JSON
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def _otlp_span(s):
+    entry = {
+        'traceId': s.trace.trace_id,
+        'spanId': s.span_id,
+        'name': s.name,
+        'kind': s.kind,
+        'startTimeUnixNano': str(s.start_ns),
+        'endTimeUnixNano': str(s.end_ns or s.start_ns),
+        'attributes': _otlp_attributes(s.attributes),
+        'status': {'code': s.status},
+    }
+    if s.parent_id:
+        entry['parentSpanId'] = s.parent_id
+    if s.status_message:
+        entry['status']['message'] = s.status_message
+    if s.events:
+        entry['events'] = s.events
+    return entry
+
+
+class OtlpJsonFormatter(logging.Formatter):
+    """
+    Renders one finished trace as an OTLP/JSON ExportTraceServiceRequest
+    on a single line (the OpenTelemetry file exporter format), on the
+    exporter thread.
+    """
+
+    def __init__(self, service_name):
+        super().__init__()
+        self.resource = {'attributes': _otlp_attributes({'service.name': service_name, 'process.pid': os.getpid()})}
+
+    def format(self, record):
+        trace = record.trace
+        return json.dumps({'resourceSpans': [{
+            'resource': self.resource,
+            'scopeSpans': [{
+                'scope': {'name': 'utils.tracing_utils'},
+                'spans': [_otlp_span(s) for s in trace.spans],
+            }],
+        }]}, separators=(',', ':'))
+
+
+class Tracer:
+    """
+    Process-wide tracing settings and the file exporter: finished traces
+    are queued and written to TRACE_FILE (rotated) by a background thread.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 1.0
+        self.slow_ns = None
+        self.max_spans = 500
+        self._queue = None
+        self._listener = None
+
+    def should_sample(self, trace_id):
+        if self.sample_rate >= 1:
+            return True
+        return zlib.crc32(trace_id.encode()) / 2 ** 32 < self.sample_rate
+
+    def start(self, path, max_bytes, backups, queue_size, service_name):
+        self.stop()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        handler.setFormatter(OtlpJsonFormatter(service_name))
+        self._queue = queue.Queue(queue_size)
+        self._listener = logging.handlers.QueueListener(self._queue, handler)
+        self._listener.start()
+        self.enabled = True
+
+    def finish(self, trace, duration_ns):
+        """Exports a trace that was sampled, failed, or ran longer than TRACE_SLOW_SECONDS"""
+        slow = self.slow_ns is not None and duration_ns >= self.slow_ns
+        if not (trace.sampled or trace.error or slow) or self._queue is None:
+            return
+        root = trace.spans[0]
+        if trace.dropped:
+            root.attributes['trace.dropped_spans'] = trace.dropped
+        if not trace.sampled:
+            root.attributes['trace.kept_because'] = 'error' if trace.error else 'slow'
+        try:
+            self._queue.put_nowait(logging.makeLogRecord({'trace': trace}))
+        except queue.Full:
+            TRACES_DROPPED.inc()
+
+    def stop(self):
+        """Writes every queued trace, then stops the exporter thread"""
+        self.enabled = False
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = self._queue = None
+
+
+TRACER = Tracer()
+
+
+# ---------------------- REQUESTS AND TEMPLATES ----------------------
+def _start_request_span():
+    """
+    Root span of the request. Continues a W3C `traceparent` from the
+    caller; otherwise the trace id is the request id when that is already
+    a 32-hex id, so logs and spans share one id.
+    """
+    trace_id = parent_id = sampled = None
+    match = TRACEPARENT_PATTERN.match(request.headers.get('traceparent', ''))
+    if match:
+        trace_id, parent_id, flags = match.groups()
+        sampled = bool(int(flags, 16) & 1) or None  # unsampled upstream: still our own decision
+    elif TRACE_ID_PATTERN.match(g.get('request_id') or ''):
+        trace_id = g.request_id
+    route = request.url_rule.rule if request.url_rule else request.path
+    g.trace_span = root = span(
+        f"{request.method} {route}", KIND_SERVER, root=True, trace_id=trace_id, parent_id=parent_id, sampled=sampled,
+        **{'http.request.method': request.method, 'http.route': route, 'url.path': request.path,
+           'request.id': g.get('request_id'), 'http.request.body.size': request.content_length},
+    )
+    if root.trace is not None:
+        g.trace_id = root.trace.trace_id  # for log records after the root span has ended
+
+
+def _end_request_span(exc=None):
+    root = g.pop('trace_span', None)
+    if root is None or root is NOOP_SPAN:
+        return
+    status = g.get('log_status', 500)
+    root.set_attribute('http.response.status_code', status)
+    user = g.get('_login_user')
+    root.set_attribute('user.id', getattr(user, 'id', None))
+    scope = g.get('log_scope')
+    if scope is not None:
+        root.set_attribute('db.queries', scope.queries)
+        root.set_attribute('db.time_ms', round(scope.db_time * 1000, 3))
+    if exc is not None:
+        root.record_exception(exc)
+    elif status >= 500:
+        root.status = STATUS_ERROR
+        root.trace.error = True
+    # Spans left open (a view that forgot .end()) are closed with the request
+    for open_span in reversed(root.trace.spans):
+        if open_span is not root and open_span.end_ns is None:
+            open_span.end_ns = time.time_ns()
+    root.end()
+
+
+def _before_render(sender, template, context, **extra):
+    g.setdefault('trace_render_spans', []).append(span(f"render {template.name}", **{'template.name': template.name}))
+
+
+def _after_render(sender, template, context, **extra):
+    spans = g.get('trace_render_spans')
+    if spans:
+        spans.pop().end()
+
+
+def init_tracing(app):
+    """
+    Request tracing: every request (and scheduler job, see track_job) is a
+    trace of nested spans — body parsing, storage writes, database writes,
+    template rendering, SMTP — exported as OTLP/JSON lines to TRACE_FILE.
+    TRACE_SAMPLE_RATE of the traces are kept, plus every failed or slow
+    one. Call after init_logging, whose request id becomes the trace id.
+    """
+    if not app.config['TRACING_ENABLED']:
+        return
+    TRACER.sample_rate = app.config['TRACE_SAMPLE_RATE']
+    TRACER.slow_ns = int(app.config['TRACE_SLOW_SECONDS'] * 1e9)
+    TRACER.max_spans = app.config['TRACE_MAX_SPANS']
+    TRACER.start(
+        app.config['TRACE_FILE'], app.config['TRACE_FILE_MAX_BYTES'], app.config['TRACE_FILE_BACKUPS'],
+        app.config['TRACE_QUEUE_SIZE'], app.config['TRACE_SERVICE_NAME'],
+    )
+    atexit.register(TRACER.stop)
+
+    app.before_request(_start_request_span)
+    app.teardown_request(_end_request_span)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
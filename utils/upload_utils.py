@@ -0,0 +1,219 @@
+import socket
+import threading
+import time
+
+from flask import Request, current_app, g, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge, RequestTimeout
+
+from utils.metrics_utils import Counter, Gauge
+from utils.tracing_utils import span
+
+
+UPLOADS_IN_FLIGHT = Gauge(
+    'upload_requests_in_flight', 'Upload requests currently reading or handling a body', multiprocess_mode='sum'
+)
+UPLOAD_REJECTIONS = Counter(
+    'upload_rejections_total', 'Upload requests turned away by admission control', ['endpoint', 'reason']
+)
+
+
+def format_size(num_bytes):
+    """10485760 -> '10 MB', for limits shown to users"""
+    for unit, size in (('MB', 1024 * 1024), ('KB', 1024)):
+        if num_bytes >= size:
+            return f"{num_bytes / size:.3g} {unit}"
+    return f"{num_bytes} bytes"
+
+
+def upload_endpoint(json=False):
+    """
+    Marks a view that accepts file uploads, so admission control applies
+    to its POSTs (see init_upload_admission). `json` views get JSON errors.
+    """
+    def decorator(f):
+        f.upload_endpoint = {'json': json}
+        return f
+    return decorator
+
+
+class SizeLimitedFile:
+    """Spool for one uploaded file that refuses to grow past `limit` bytes"""
+
+    def __init__(self, stream, limit):
+        self._stream = stream
+        self._limit = limit
+        self._written = 0
+
+    def write(self, data):
+        self._written += len(data)
+        if self._written > self._limit:
+            raise RequestEntityTooLarge(f"Each file must be at most {format_size(self._limit)}.")
+        return self._stream.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __iter__(self):
+        return iter(self._stream)
+
+
+class UploadRequest(Request):
+    """Request class that applies the per-file limit while the multipart body is parsed"""
+
+    max_file_size = None  # set per request by admission control
+
+    def _load_form_data(self):
+        # Runs on the first access to request.form/files: the multipart parse (and upload read)
+        with span('http.parse_body', **{'http.request.body.size': self.content_length,
+                                        'http.request.content_type': self.mimetype}):
+            super()._load_form_data()
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        stream = super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        if self.max_file_size is None:
+            return stream
+        return SizeLimitedFile(stream, self.max_file_size)
+
+
+class SlowClientGuard:
+    """
+    wsgi.input wrapper for upload bodies. A read that stalls for
+    `idle_timeout` seconds, a body that takes longer than `total_timeout`,
+    or one trickling in below `min_rate` bytes/s after `grace` seconds is
+    aborted with 408, freeing the worker thread.
+    """
+
+    def __init__(self, stream, sock, idle_timeout, total_timeout, min_rate, grace):
+        self._stream = stream
+        self._sock = sock
+        self._idle_timeout = idle_timeout
+        self._total_timeout = total_timeout
+        self._min_rate = min_rate
+        self._grace = grace
+        self._started = time.monotonic()
+        self._received = 0
+        if sock is not None:
+            sock.settimeout(idle_timeout)  # gunicorn hands us the client socket
+
+    def _guarded(self, read, *args):
+        try:
+            data = read(*args)
+        except (socket.timeout, TimeoutError):
+            raise RequestTimeout(f"No data received for {self._idle_timeout} seconds.")
+        self._received += len(data)
+
+        elapsed = time.monotonic() - self._started
+        if elapsed > self._total_timeout:
+            raise RequestTimeout("The upload took too long.")
+        if data and elapsed > self._grace and self._received / elapsed < self._min_rate:
+            raise RequestTimeout("The connection is too slow to finish this upload.")
+        return data
+
+    def read(self, *args):
+        return self._guarded(self._stream.read, *args)
+
+    def readline(self, *args):
+        return self._guarded(self._stream.readline, *args)
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+    def restore_socket(self):
+        if self._sock is not None:
+            try:
+                self._sock.settimeout(None)
+            except OSError:
+                pass
+
+
+def _upload_options():
+    if request.method != 'POST':
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, 'upload_endpoint', None)
+
+
+def _reject(options, status, reason, message, retry_after=None):
+    UPLOAD_REJECTIONS.inc(endpoint=request.endpoint or 'unmatched', reason=reason)
+    if options and options['json']:
+        response = jsonify({'error': message})
+        response.status_code = status
+    else:
+        response = current_app.response_class(message, status, mimetype='text/plain')
+    if retry_after:
+        response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def _admit_upload():
+    """
+    Runs before an upload view touches the body: checks the declared size,
+    takes one of the worker's upload slots and guards the socket read.
+    """
+    options = _upload_options()
+    if options is None:
+        return None
+    config = current_app.config
+
+    max_request = config['UPLOAD_MAX_REQUEST_SIZE']
+    if request.content_length is not None and request.content_length > max_request:
+        return _reject(options, 413, 'request_too_large',
+                       f"Uploads are limited to {format_size(max_request)} per request.")
+
+    slots = current_app.extensions['upload_slots']
+    if not slots.acquire(blocking=False):
+        retry_after = config['UPLOAD_RETRY_AFTER']
+        return _reject(options, 503, 'busy',
+                       f"Too many uploads in progress. Please try again in {retry_after} seconds.", retry_after)
+    g.upload_slot = slots
+    UPLOADS_IN_FLIGHT.inc()
+
+    request.max_content_length = max_request
+    request.max_file_size = config['UPLOAD_MAX_FILE_SIZE']
+    guard = SlowClientGuard(
+        request.environ['wsgi.input'], request.environ.get('gunicorn.socket'),
+        idle_timeout=config['UPLOAD_IDLE_TIMEOUT'], total_timeout=config['UPLOAD_READ_TIMEOUT'],
+        min_rate=config['UPLOAD_MIN_RATE'], grace=config['UPLOAD_MIN_RATE_GRACE'],
+    )
+    request.environ['wsgi.input'] = guard
+    g.upload_guard = guard
+    return None
+
+
+def _release_upload(exc=None):
+    slots = g.pop('upload_slot', None)
+    if slots is not None:
+        slots.release()
+        UPLOADS_IN_FLIGHT.dec()
+    guard = g.pop('upload_guard', None)
+    if guard is not None:
+        guard.restore_socket()
+
+
+def _too_large(e):
+    options = _upload_options()
+    if options is None:
+        return e
+    return _reject(options, 413, 'file_too_large', e.description)
+
+
+def _too_slow(e):
+    options = _upload_options()
+    if options is None:
+        return e
+    return _reject(options, 408, 'slow_client', e.description)
+
+
+def init_upload_admission(app):
+    """
+    Admission control for views marked with @upload_endpoint: size limits
+    checked before the body is read (and per file while it is parsed), a
+    cap of UPLOAD_MAX_CONCURRENT uploads per worker (503 + Retry-After
+    beyond it) and a slow-client read timeout.
+    """
+    app.request_class = UploadRequest
+    app.extensions['upload_slots'] = threading.BoundedSemaphore(app.config['UPLOAD_MAX_CONCURRENT'])
+    app.before_request(_admit_upload)
+    app.teardown_request(_release_upload)
+    app.register_error_handler(RequestEntityTooLarge, _too_large)
+    app.register_error_handler(RequestTimeout, _too_slow)
@@ -0,0 +1,208 @@
+import csv
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import String, cast, delete, exists, func, literal, or_, select, update
+
+from app.models.application import Application
+from app.models.application_archive import ArchivedApplication
+from app.models.funnel import FunnelEvent, FunnelUser
+from app.models.user import User
+from utils.document_utils import DOCUMENT_KINDS, remove_unreferenced_documents
+from utils.draft_utils import DRAFT_FIELDS
+from utils.metrics_utils import Counter
+from utils.write_queue_utils import run_write
+
+
+USER_LIFECYCLE = Counter(
+    'user_lifecycle_total', 'Users removed by the bulk lifecycle commands', ['action']
+)
+
+# Anonymized accounts get an address on a reserved domain: they can never log
+# in or receive mail, and re-runs recognise them as done.
+ANONYMIZED_DOMAIN = 'anonymized.invalid'
+ANONYMIZED_NAME = 'Anonymized applicant'
+UNUSABLE_PASSWORD = '!'  # not a werkzeug hash, so check_password_hash() is always False
+
+# Application fields that identify a person; status and dates stay for reporting
+PERSONAL_FIELDS = ('phone_number', 'date_of_birth', 'education_level', 'occupation', 'marital_status')
+EMAIL_CHUNK = 10000
+DOCUMENT_COLUMNS = tuple(getattr(Application, column) for column in DOCUMENT_KINDS.values())
+ARCHIVED_DOCUMENT_COLUMNS = tuple(getattr(ArchivedApplication, column) for column in DOCUMENT_KINDS.values())
+
+
+def read_email_file(path):
+    """Emails from a CSV with an `email` column, or from its first column"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        rows = list(csv.reader(f))
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    if 'email' in header:
+        column = header.index('email')
+        rows = rows[1:]
+    else:
+        column = 0
+    return [row[column].strip() for row in rows if len(row) > column and row[column].strip()]
+
+
+def select_users(emails=None, submitted=None, approved=None, idle_days=None,
+                 without_application=False, include_admins=False):
+    """
+    SELECT of the user ids matching every given criterion. Accounts that were
+    anonymized already never match, so an interrupted run can simply be
+    started again.
+    """
+    statement = select(User.id).where(~User.email.like(f'%@{ANONYMIZED_DOMAIN}'))
+    has_application = exists().where(Application.user_id == User.id)
+    has_archived_application = exists().where(ArchivedApplication.user_id == User.id)
+
+    if emails is not None:
+        # Addresses are stored as typed at registration
+        statement = statement.where(func.lower(User.email).in_({email.lower() for email in emails}))
+    if not include_admins:
+        statement = statement.where(User.is_admin.isnot(True))
+    if without_application:
+        statement = statement.where(~has_application, ~has_archived_application)
+    if submitted is not None:
+        statement = statement.where(has_application.where(Application.submitted.is_(submitted)))
+    if approved is not None:
+        statement = statement.where(has_application.where(Application.approved.is_(approved)))
+    if idle_days is not None:
+        cutoff = datetime.utcnow() - timedelta(days=idle_days)
+        statement = statement.where(~exists().where(
+            Application.user_id == User.id,
+            or_(Application.updated_at.is_(None), Application.updated_at >= cutoff),
+        ))
+    return statement.order_by(User.id)
+
+
+def user_id_batches(batch_size, emails=None, **criteria):
+    """
+    Yields lists of matching user ids, walking the id order (emails are
+    looked up in chunks, under SQLite's parameter limit). Each batch is
+    read in a fresh transaction, so it sees the batches before it committed.
+    """
+    from app.extensions import db
+
+    email_chunks = [None] if emails is None else [
+        emails[start:start + EMAIL_CHUNK] for start in range(0, len(emails), EMAIL_CHUNK)
+    ]
+    for chunk in email_chunks:
+        last_id = 0
+        while True:
+            user_ids = db.session.execute(
+                select_users(emails=chunk, **criteria).where(User.id > last_id).limit(batch_size)
+            ).scalars().all()
+            db.session.rollback()  # end the read snapshot before the batch is written
+            if not user_ids:
+                break
+            yield user_ids
+            last_id = user_ids[-1]
+
+
+def _document_names(rows):
+    return {name for row in rows for name in row if name}
+
+
+def _discard_drafts(user_ids):
+    drafts = current_app.extensions.get('drafts')
+    if drafts is None:
+        return
+    for user_id in user_ids:
+        for step in DRAFT_FIELDS:
+            drafts.discard(user_id, step)
+
+
+def delete_users(user_ids):
+    """
+    Deletes a batch of users with their applications (live and archived)
+    in one transaction, then their drafts and any document no other
+    application shares.
+    Returns (users deleted, documents removed).
+    """
+    user_ids = list(user_ids)
+
+    def purge_users(session):
+        documents = session.execute(
+            delete(Application).where(Application.user_id.in_(user_ids)).returning(*DOCUMENT_COLUMNS)
+        ).all()
+        documents += session.execute(
+            delete(ArchivedApplication).where(ArchivedApplication.user_id.in_(user_ids))
+            .returning(*ARCHIVED_DOCUMENT_COLUMNS)
+        ).all()
+        # Admins being deleted give their review claims back to the queue
+        session.execute(
+            update(Application).where(Application.claimed_by.in_(user_ids))
+            .values(claimed_by=None, claimed_at=None, updated_at=Application.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        session.execute(
+            update(Application).where(Application.skipped_by.in_(user_ids))
+            .values(skipped_by=None, skipped_at=None, updated_at=Application.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        # Their funnel history goes too; the daily aggregates hold no user ids
+        session.execute(delete(FunnelEvent).where(FunnelEvent.user_id.in_(user_ids)))
+        session.execute(delete(FunnelUser).where(FunnelUser.user_id.in_(user_ids)))
+        deleted = session.execute(delete(User).where(User.id.in_(user_ids))).rowcount
+        return deleted, _document_names(documents)
+
+    deleted, documents = run_write(purge_users, name='users_delete')
+    _discard_drafts(user_ids)
+    removed = remove_unreferenced_documents(documents)
+    USER_LIFECYCLE.inc(deleted, action='delete')
+    return deleted, len(removed)
+
+
+def anonymize_users(user_ids):
+    """
+    Replaces a batch of users' identity with placeholders and strips their
+    applications (live and archived) of personal details and documents; the
+    application rows stay so approval statistics keep adding up.
+    Returns (users anonymized, documents removed).
+    """
+    user_ids = list(user_ids)
+
+    def scrub_users(session):
+        # RETURNING would give the new (cleared) values, so read the file names first
+        documents = session.execute(
+            select(*DOCUMENT_COLUMNS).where(Application.user_id.in_(user_ids))
+        ).all() + session.execute(
+            select(*ARCHIVED_DOCUMENT_COLUMNS).where(ArchivedApplication.user_id.in_(user_ids))
+        ).all()
+        session.execute(
+            update(ArchivedApplication).where(ArchivedApplication.user_id.in_(user_ids))
+            .values(
+                **{field: None for field in PERSONAL_FIELDS},
+                **{column: None for column in DOCUMENT_KINDS.values()},
+            )
+            .execution_options(synchronize_session=False)
+        )
+        session.execute(
+            update(Application).where(Application.user_id.in_(user_ids))
+            .values(
+                **{field: None for field in PERSONAL_FIELDS},
+                **{column: None for column in DOCUMENT_KINDS.values()},
+                claimed_by=None, claimed_at=None,
+                version_id=Application.version_id + 1,  # invalidates cached pages and ETags
+            )
+            .execution_options(synchronize_session=False)
+        )
+        anonymized = session.execute(
+            update(User).where(User.id.in_(user_ids))
+            .values(
+                email=literal('anonymized-') + cast(User.id, String) + literal(f'@{ANONYMIZED_DOMAIN}'),
+                full_name=ANONYMIZED_NAME,
+                password_hash=UNUSABLE_PASSWORD,
+                is_admin=False,
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        return anonymized, _document_names(documents)
+
+    anonymized, documents = run_write(scrub_users, name='users_anonymize')
+    _discard_drafts(user_ids)
+    removed = remove_unreferenced_documents(documents)
+    USER_LIFECYCLE.inc(anonymized, action='anonymize')
+    return anonymized, len(removed)
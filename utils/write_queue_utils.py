@@ -0,0 +1,255 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from flask import current_app
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from utils.metrics_utils import Counter, Histogram, ScopeStats, current_scope
+from utils.tracing_utils import span
+
+
+WRITE_BATCH_SIZE = Histogram(
+    'db_write_batch_size', 'Units of work committed together by the writer',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+WRITE_UNITS = Counter('db_write_units_total', 'Write units of work by outcome', ['unit', 'outcome'])
+WRITE_QUEUE_WAIT = Histogram(
+    'db_write_queue_wait_seconds', 'Time a unit of work waited for the writer',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+WRITE_COMMIT_TIME = Histogram(
+    'db_write_commit_duration_seconds', 'COMMIT time per batch',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+
+
+class WriteCoordinator:
+    """
+    One writer thread per worker process. Callers hand it a unit of work
+    (a callable taking a SQLAlchemy Session); units that arrive within
+    `window` seconds of each other run in one IMMEDIATE transaction and
+    share a single COMMIT. Each unit runs in its own SAVEPOINT, so a unit
+    that raises is rolled back alone and its caller gets the exception.
+    """
+
+    def __init__(self, app, url, window=0.002, max_batch=64, timeout=30.0):
+        self.app = app
+        self.window = window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.engine = self._create_engine(url, timeout)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self._contended = False
+        self._session = None  # the open batch's session, for units submitted from the writer itself
+
+    @staticmethod
+    def _create_engine(url, timeout):
+        engine = create_engine(url, connect_args={'timeout': timeout, 'check_same_thread': False})
+
+        # pysqlite's own BEGIN handling breaks SAVEPOINTs; issue BEGIN IMMEDIATE ourselves
+        # so the batch takes the write lock up front instead of failing on upgrade.
+        @event.listens_for(engine, 'connect')
+        def _connect(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+            # WAL lets request threads keep reading while a batch is being written
+            dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+        @event.listens_for(engine, 'begin')
+        def _begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+        return engine
+
+    # ---------------------- CALLER SIDE ----------------------
+    def run(self, unit, name=None):
+        """
+        Runs `unit(session)` on the writer and returns its result once
+        committed. If the writer has not reached the unit within `timeout`,
+        it is withdrawn and TimeoutError raised; once it has started, the
+        caller waits for its real outcome instead of guessing.
+        """
+        name = name or getattr(unit, '__name__', 'unit')
+        if threading.current_thread() is self._thread and self._session is not None:
+            return self._run_unit(self._session, unit, name)  # nested: join the open batch
+
+        if self._closed:
+            return run_inline(unit, name)
+
+        future = Future()
+        self._ensure_started()
+        self._queue.put((unit, name, future, time.perf_counter()))
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            if future.cancel():  # still queued: the writer will skip it
+                WRITE_UNITS.inc(unit=name, outcome='timeout')
+                raise
+            return future.result()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid is not None:  # forked after start: the parent's thread and pool are gone
+                self._queue = queue.Queue()
+                self.engine.dispose(close=False)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name='db-writer', daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Commits whatever is queued and stops the writer thread"""
+        self._closed = True
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join(self.timeout)
+
+    # ---------------------- WRITER THREAD ----------------------
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, stop = [item], False
+
+            # Group everything already queued; while writes are contending (the last
+            # batch had company) also wait out the window for more to arrive.
+            # A lone writer is committed straight away.
+            window = self.window if self._contended else 0
+            deadline = time.perf_counter() + window
+            while len(batch) < self.max_batch:
+                try:
+                    remaining = deadline - time.perf_counter()
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._contended = len(batch) > 1
+            self._commit_batch(batch)
+            if stop:
+                return
+
+    def _commit_batch(self, batch):
+        token = current_scope.set(ScopeStats('write_queue'))
+        done = []
+        try:
+            with self.app.app_context():
+                session = Session(self.engine, expire_on_commit=False)
+                self._session = session
+                try:
+                    started = time.perf_counter()
+                    for unit, name, future, enqueued in batch:
+                        WRITE_QUEUE_WAIT.observe(started - enqueued)
+                        if not future.set_running_or_notify_cancel():
+                            continue  # its caller gave up waiting before it started
+                        try:
+                            done.append((future, name, self._run_unit(session, unit, name)))
+                        except Exception as e:
+                            WRITE_UNITS.inc(unit=name, outcome='error')
+                            future.set_exception(e)
+
+                    if done:
+                        commit_start = time.perf_counter()
+                        session.commit()
+                        WRITE_COMMIT_TIME.observe(time.perf_counter() - commit_start)
+                        WRITE_BATCH_SIZE.observe(len(done))
+                except Exception as e:
+                    # The shared COMMIT failed: nothing in this batch was written
+                    session.rollback()
+                    current_app.logger.error(f"❌ Write batch of {len(done)} failed: {str(e)}")
+                    for future, name, _ in done:
+                        WRITE_UNITS.inc(unit=name, outcome='error')
+                        future.set_exception(e)
+                    done = []
+                finally:
+                    self._session = None
+                    session.close()
+        except Exception as e:  # never let the writer thread die
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            done = []
+        finally:
+            current_scope.reset(token)
+
+        for future, name, result in done:
+            WRITE_UNITS.inc(unit=name, outcome='committed')
+            future.set_result(result)
+
+    @staticmethod
+    def _run_unit(session, unit, name):
+        with session.begin_nested():  # SAVEPOINT: a failing unit leaves the rest of the batch alone
+            return unit(session)
+
+
+def run_inline(unit, name=None):
+    """Runs `unit` in the request's own session and commits it straight away"""
+    from app.extensions import db
+
+    name = name or getattr(unit, '__name__', 'unit')
+    try:
+        result = unit(db.session)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        WRITE_UNITS.inc(unit=name, outcome='error')
+        raise
+    WRITE_UNITS.inc(unit=name, outcome='committed')
+    return result
+
+
+def init_write_queue(app):
+    """
+    Starts a WriteCoordinator for the app's SQLite database. In-memory
+    databases (tests) and WRITE_QUEUE_ENABLED=False commit inline instead:
+    a second engine would not see the same in-memory database.
+    """
+    app.extensions['write_queue'] = None
+    if not app.config.get('WRITE_QUEUE_ENABLED', True):
+        return None
+
+    with app.app_context():
+        url = app.extensions['sqlalchemy'].engine.url
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+
+    coordinator = WriteCoordinator(
+        app, url,
+        window=app.config.get('WRITE_QUEUE_WINDOW', 0.002),
+        max_batch=app.config.get('WRITE_QUEUE_MAX_BATCH', 64),
+        timeout=app.config.get('WRITE_QUEUE_TIMEOUT', 30.0),
+    )
+    app.extensions['write_queue'] = coordinator
+    atexit.register(coordinator.close)
+    return coordinator
+
+
+def run_write(unit, name=None):
+    """
+    Runs a write unit of work — `unit(session)`, returning anything — and
+    commits it, through the app's writer when there is one. Units must use
+    the session they are given and should return plain values (ids,
+    flags), not ORM objects, since they may run in another thread.
+    """
+    coordinator = current_app.extensions.get('write_queue')
+    name = name or getattr(unit, '__name__', 'unit')
+    # Covers the wait for the writer, the unit itself and the COMMIT of its batch
+    with span(f'db.write {name}', **{'db.system': 'sqlite', 'db.write.queued': coordinator is not None}):
+        if coordinator is None:
+            return run_inline(unit, name)
+        return coordinator.run(unit, name)